@@ -0,0 +1,105 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = int(os.getenv('BULK_UPSERT_CHUNK_SIZE', '250'))
+
+
+def ensure_unique_key(connection, table, key_name, key_columns):
+    """Create the unique index used by ON DUPLICATE KEY UPDATE if the table doesn't have it yet"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+            """,
+            (table, key_name)
+        )
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"ALTER TABLE {table} ADD UNIQUE KEY {key_name} ({', '.join(key_columns)})")
+            connection.commit()
+            logger.info(f"Added unique key {key_name} on {table}({', '.join(key_columns)})")
+    finally:
+        cursor.close()
+
+def ensure_index(connection, table, key_name, key_columns):
+    """Create a (non-unique) index if the table doesn't have it yet"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+            """,
+            (table, key_name)
+        )
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"ALTER TABLE {table} ADD INDEX {key_name} ({', '.join(key_columns)})")
+            connection.commit()
+            logger.info(f"Added index {key_name} on {table}({', '.join(key_columns)})")
+    finally:
+        cursor.close()
+
+def ensure_column(connection, table, column, definition):
+    """Add a column (e.g. `TIMESTAMP DEFAULT CURRENT_TIMESTAMP`) if the table doesn't have it yet"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+            """,
+            (table, column)
+        )
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            connection.commit()
+            logger.info(f"Added column {column} to {table}")
+    finally:
+        cursor.close()
+
+def dataframe_rows(df):
+    """Convert a DataFrame to DB-ready tuples in one pass (NaN/NaT -> None, numpy -> Python scalars)"""
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+def build_upsert_query(table, columns, row_count, key_columns=()):
+    """Multi-row INSERT ... ON DUPLICATE KEY UPDATE for `row_count` rows"""
+    row_placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    update_columns = [col for col in columns if col not in key_columns]
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ', '.join([row_placeholder] * row_count)
+    if update_columns:
+        query += " ON DUPLICATE KEY UPDATE " + ', '.join(f"{col} = VALUES({col})" for col in update_columns)
+    return query
+
+def bulk_upsert(connection, table, df, key_columns=(), chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Write a DataFrame with chunked multi-row upserts, committing after every chunk.
+
+    A failed chunk is rolled back and re-raised; chunks before it stay committed.
+    Returns the number of rows written.
+    """
+    if df is None or len(df) == 0:
+        return 0
+
+    columns = list(df.columns)
+    rows = dataframe_rows(df)
+    queries = {}  # every chunk but the last has the same size, so the SQL is built at most twice
+
+    cursor = connection.cursor()
+    try:
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            if len(chunk) not in queries:
+                queries[len(chunk)] = build_upsert_query(table, columns, len(chunk), key_columns)
+
+            cursor.execute(queries[len(chunk)], [value for row in chunk for value in row])
+            connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return len(rows)
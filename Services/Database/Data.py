@@ -224,6 +224,57 @@ def get_emails(connection, credentials):
             connection.close()
 
 
+# Shared by get_client_data and get_inventory_units so the two unit queries cannot drift apart:
+# occupancy from the latest two deals, and units joined to their address, portfolio,
+# latest two deals (d1, d2) and most recent note
+UNIT_STATUS_SQL = """CASE
+    WHEN u.unit_status LIKE '%DNR%' THEN 'DNR'
+    WHEN (
+        (d1.move_in IS NOT NULL AND d1.move_out IS NOT NULL AND CURRENT_DATE BETWEEN d1.move_in AND d1.move_out)
+        OR
+        (d2.move_in IS NOT NULL AND d2.move_out IS NOT NULL AND CURRENT_DATE BETWEEN d2.move_in AND d2.move_out)
+        OR
+        (d1.move_in IS NOT NULL AND d1.move_out IS NULL AND CURRENT_DATE >= d1.move_in)
+    ) THEN 'Occupied'
+    ELSE 'Vacant'
+END"""
+
+UNIT_DEALS_FROM_SQL = """FROM units u
+LEFT JOIN addresses a ON u.address_id = a.address_id
+LEFT JOIN entities e ON a.entity_id = e.entity_id
+LEFT JOIN portfolios p ON e.portfolio_id = p.portfolio_id
+LEFT JOIN (
+    SELECT *
+    FROM (
+        SELECT
+            d.*,
+            ROW_NUMBER() OVER (PARTITION BY d.unit_id ORDER BY d.created_at DESC) as rn
+        FROM deals d
+    ) ranked
+    WHERE ranked.rn = 1
+) d1 ON u.unit_id = d1.unit_id
+LEFT JOIN (
+    SELECT *
+    FROM (
+        SELECT
+            d.*,
+            ROW_NUMBER() OVER (PARTITION BY d.unit_id ORDER BY d.created_at DESC) as rn
+        FROM deals d
+    ) ranked
+    WHERE ranked.rn = 2
+) d2 ON u.unit_id = d2.unit_id
+LEFT JOIN (
+    SELECT n1.*
+    FROM notes n1
+    INNER JOIN (
+        SELECT target_id, MAX(created_at) AS max_created
+        FROM notes
+        WHERE target_type = 'units'
+        GROUP BY target_id
+    ) n2 ON n1.target_id = n2.target_id AND n1.created_at = n2.max_created
+    WHERE n1.target_type = 'units'
+) note ON note.target_id = u.unit_id"""
+
 queries = {
     'all_leads': """
         SELECT *
@@ -237,7 +288,7 @@ queries = {
         FROM addresses a    
         WHERE 1=1       
     """,
-    'get_client_data': """
+    'get_client_data': f"""
         select * from(
             SELECT
                 a.address,
@@ -247,17 +298,7 @@ queries = {
                 u.beds,
                 u.baths,
                 u.sqft,
-                CASE
-                    WHEN u.unit_status LIKE '%DNR%' THEN 'DNR'
-                    WHEN (
-                        (d1.move_in IS NOT NULL AND d1.move_out IS NOT NULL AND CURRENT_DATE BETWEEN d1.move_in AND d1.move_out)
-                        OR
-                        (d2.move_in IS NOT NULL AND d2.move_out IS NOT NULL AND CURRENT_DATE BETWEEN d2.move_in AND d2.move_out)
-                        OR
-                        (d1.move_in IS NOT NULL AND d1.move_out IS NULL AND CURRENT_DATE >= d1.move_in)
-                    ) THEN 'Occupied'
-                    ELSE 'Vacant'
-                END AS unit_status,
+                {UNIT_STATUS_SQL} AS unit_status,
                 d1.deal_status,
                 d1.gross,
                 d2.gross AS previous_gross,
@@ -292,46 +333,38 @@ queries = {
                 CONCAT(per.first_name, ' ', per.last_name) AS creator_full_name,
                 u.rentable,
                 p.portfolio
-            FROM units u
-            LEFT JOIN addresses a ON u.address_id = a.address_id
-            LEFT JOIN entities e ON a.entity_id = e.entity_id
-            LEFT JOIN portfolios p ON e.portfolio_id = p.portfolio_id
-            LEFT JOIN (
-                SELECT *
-                FROM (
-                    SELECT
-                        d.*,
-                        ROW_NUMBER() OVER (PARTITION BY d.unit_id ORDER BY d.created_at DESC) as rn
-                    FROM deals d
-                ) ranked
-                WHERE ranked.rn = 1
-            ) d1 ON u.unit_id = d1.unit_id
-            LEFT JOIN (
-                SELECT *
-                FROM (
-                    SELECT
-                        d.*,
-                        ROW_NUMBER() OVER (PARTITION BY d.unit_id ORDER BY d.created_at DESC) as rn
-                    FROM deals d
-                ) ranked
-                WHERE ranked.rn = 2
-            ) d2 ON u.unit_id = d2.unit_id
-            LEFT JOIN (
-                SELECT n1.*
-                FROM notes n1
-                INNER JOIN (
-                    SELECT target_id, MAX(created_at) AS max_created
-                    FROM notes
-                    WHERE target_type = 'units'
-                    GROUP BY target_id
-                ) n2 ON n1.target_id = n2.target_id AND n1.created_at = n2.max_created
-                WHERE n1.target_type = 'units'
-            ) note ON note.target_id = u.unit_id
+            {UNIT_DEALS_FROM_SQL}
             LEFT JOIN persons per ON note.creator_id = per.person_id
             WHERE 1=1
         ) subquery
         WHERE 1=1
     """,
+    # Inventory page: only the printed columns, only units with a future move-out (see get_inventory_units)
+    'get_inventory_units': f"""
+        select subquery.*, COUNT(*) OVER () AS total_count from(
+            SELECT
+                a.address,
+                u.unit,
+                u.beds,
+                u.baths,
+                u.sqft,
+                {UNIT_STATUS_SQL} AS unit_status,
+                d1.lease_type,
+                d1.deal_status,
+                d1.gross,
+                d1.actual_rent,
+                d1.concession,
+                d1.term,
+                d1.move_in,
+                d1.move_out,
+                note.note AS most_recent_note,
+                u.rentable,
+                p.portfolio
+            {UNIT_DEALS_FROM_SQL}
+            WHERE d1.move_out > CURRENT_DATE
+        ) subquery
+        WHERE 1=1
+    """,
     'get_notes': """
         select * from (
         SELECT n.*, a.address, 
@@ -440,6 +473,8 @@ queries = {
         SUBSTRING_INDEX(GROUP_CONCAT(IFNULL(status, '') ORDER BY run_date DESC), ',', 1) as current_status,
         SUBSTRING_INDEX(GROUP_CONCAT(IFNULL(days_on_market, '') ORDER BY run_date DESC), ',', 1) as current_days_on_market,
         SUBSTRING_INDEX(GROUP_CONCAT(IFNULL(listed_at, '') ORDER BY run_date DESC), ',', 1) as listed_at,
+        SUBSTRING_INDEX(GROUP_CONCAT(IFNULL(calc_dom, '') ORDER BY run_date DESC), ',', 1) as calc_dom,
+        SUBSTRING_INDEX(GROUP_CONCAT(IFNULL(ctr, '') ORDER BY run_date DESC), ',', 1) as ctr,
         
         -- Price history - most recent price_history JSON field (contains historical prices)
         
@@ -770,7 +805,23 @@ def create_report_record(connection, credentials, name, status='pending'):
             'message': f'Error creating report record: {str(e)}'
         }
 
-def update_report_record(connection, credentials, report_id, status=None, file_path=None):
+def ensure_report_timings_column(connection):
+    """Add the reports.timings JSON column (per-stage seconds) if it doesn't exist yet"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'reports' AND COLUMN_NAME = 'timings'
+            """
+        )
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("ALTER TABLE reports ADD COLUMN timings JSON NULL")
+            connection.commit()
+    finally:
+        cursor.close()
+
+def update_report_record(connection, credentials, report_id, status=None, file_path=None, timings=None):
     """Update an existing report record"""
     try:
         cursor = connection.cursor(dictionary=True)
@@ -786,6 +837,11 @@ def update_report_record(connection, credentials, report_id, status=None, file_p
         if file_path:
             updates.append("file_path = %s")
             params.append(file_path)
+
+        if timings is not None:
+            ensure_report_timings_column(connection)
+            updates.append("timings = %s")
+            params.append(json.dumps(timings))
             
         if not updates:
             return {'status': 'error', 'message': 'No updates provided'}
@@ -809,6 +865,56 @@ def update_report_record(connection, credentials, report_id, status=None, file_p
             'message': f'Error updating report record: {str(e)}'
         }
 
+def get_report_record(connection, credentials, report_id):
+    """Fetch one report record (status, file_path, timings) by id"""
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM reports WHERE report_id = %s", (report_id,))
+        record = cursor.fetchone()
+        cursor.close()
+
+        if not record:
+            return {'status': 'error', 'message': f'Report {report_id} not found'}
+
+        if isinstance(record.get('timings'), str):
+            record['timings'] = json.loads(record['timings'])
+        return {'status': 'success', 'report': record}
+
+    except Exception as e:
+        return {
+            'status': 'error',
+            'message': f'Error fetching report record: {str(e)}'
+        }
+
+def get_inventory_units(connection, credentials, limit=None):
+    """
+    Units with a future move-out, soonest first, for the inventory page. The date filter,
+    ordering and limit run in SQL; total_count (a window count) is every matching unit, before the limit.
+    """
+    cursor = None
+    try:
+        query = queries['get_inventory_units']
+        params = []
+        for column, value in (credentials or {}).get("data_filters", []):
+            if value and value not in ["Any", "", "undefined", "-", "0", " "] and column is not None and 'Any' not in value:
+                query += f" AND subquery.{column} = %s"
+                params.append(value)
+
+        query += " ORDER BY subquery.move_out, subquery.address, subquery.unit"
+        if limit:
+            query += " LIMIT %s"
+            params.append(int(limit))
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(query, params)
+        data = cursor.fetchall()
+        return {'status': 'success', 'data': data, 'total_count': data[0]['total_count'] if data else 0}
+
+    except Exception as e:
+        return {'status': 'error', 'message': f'Error fetching inventory units: {str(e)}'}
+    finally:
+        if cursor:
+            cursor.close()
+
 @data_bp.route('/reports/create', methods=['POST'])
 @with_db_connection
 def create_report_endpoint(connection, credentials):
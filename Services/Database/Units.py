@@ -0,0 +1,113 @@
+import os
+import re
+import logging
+from collections import Counter
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Rules applied to both sides of a match; override per call or with UNIT_MATCH_<RULE>=0/1
+DEFAULT_RULES = {
+    'casefold': True,              # "Apt 2e" == "APT 2E"
+    'collapse_whitespace': True,   # "123  Main St" == "123 Main St"; inside units "2 E" == "2E"
+    'strip_hash': True,            # "#2E" == "2E"
+    'strip_apt': True,             # "Apt 2E" / "Unit 2E" / "Apartment 2E" == "2E"
+    'strip_leading_zeros': True,   # "02E" == "2E"
+}
+
+_APT_PREFIX = re.compile(r'^(?:apt|apartment|unit|ste|suite)\.?\s*', re.IGNORECASE)
+
+
+def get_rules(**overrides):
+    rules = {rule: os.getenv(f'UNIT_MATCH_{rule.upper()}', '1' if default else '0') == '1' for rule, default in DEFAULT_RULES.items()}
+    rules.update(overrides)
+    return rules
+
+def normalize_addresses(addresses, rules):
+    addresses = pd.Series(addresses, dtype=object)
+    addresses = addresses.astype(str).where(addresses.notna(), '')
+    if rules['collapse_whitespace']:
+        addresses = addresses.str.replace(r'\s+', ' ', regex=True).str.strip()
+    if rules['casefold']:
+        addresses = addresses.str.lower()
+    return addresses
+
+def normalize_units(units, rules):
+    units = pd.Series(units, dtype=object)
+    units = units.astype(str).where(units.notna(), '')
+    if rules['strip_hash']:
+        units = units.str.replace('#', '', regex=False)
+    units = units.str.strip()
+    if rules['strip_apt']:
+        units = units.str.replace(_APT_PREFIX, '', regex=True)
+    if rules['collapse_whitespace']:
+        units = units.str.replace(r'\s+', '', regex=True)
+    if rules['strip_leading_zeros']:
+        units = units.str.lstrip('0')
+    if rules['casefold']:
+        units = units.str.lower()
+    return units
+
+def build_unit_index(unit_df, rules=None):
+    """
+    Hash index of units keyed by normalized (address, unit).
+
+    Returns a dict with the lookup table ('keys'), the rules it was built with, keys
+    that more than one unit normalizes to ('duplicates', first unit_id wins) and a
+    Counter of keys that failed to resolve ('unmatched').
+    """
+    rules = rules or get_rules()
+    keys = list(zip(normalize_addresses(unit_df['address'], rules), normalize_units(unit_df['unit'], rules)))
+
+    lookup = {}
+    duplicates = set()
+    for key, unit_id in zip(keys, unit_df['unit_id']):
+        if key in lookup:
+            duplicates.add(key)
+            continue
+        lookup[key] = unit_id
+
+    if duplicates:
+        logger.warning(f"{len(duplicates)} unit keys are shared by more than one unit_id; the first one is used")
+
+    return {'keys': lookup, 'rules': rules, 'duplicates': duplicates, 'unmatched': Counter()}
+
+def load_unit_index(connection, rules=None):
+    """Load every unit once and index it (see build_unit_index)"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT unit_id, address, unit FROM units")
+        unit_df = pd.DataFrame(cursor.fetchall(), columns=['unit_id', 'address', 'unit'])
+    finally:
+        cursor.close()
+
+    print(f"Retrieved {len(unit_df)} units from database")
+    return build_unit_index(unit_df, rules)
+
+def resolve_units(index, addresses, units):
+    """unit_id (or None) for each (address, unit) pair; misses are counted in index['unmatched']"""
+    keys = zip(normalize_addresses(addresses, index['rules']), normalize_units(units, index['rules']))
+    lookup = index['keys']
+
+    unit_ids = []
+    for key in keys:
+        unit_id = lookup.get(key)
+        if unit_id is None:
+            index['unmatched'][key] += 1
+        unit_ids.append(unit_id)
+    return unit_ids
+
+def resolve_unit(index, address, unit):
+    return resolve_units(index, [address], [unit])[0]
+
+def unmatched_report(index, limit=25):
+    """Summary of keys that didn't resolve, most frequent first"""
+    return {
+        'unmatched_keys': len(index['unmatched']),
+        'unmatched_rows': sum(index['unmatched'].values()),
+        'top_unmatched': [
+            {'address': address, 'unit': unit, 'count': count}
+            for (address, unit), count in index['unmatched'].most_common(limit)
+        ],
+    }
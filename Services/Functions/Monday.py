@@ -7,6 +7,7 @@ import json
 import os
 from dotenv import load_dotenv
 from Services.Database.Connect import get_db_connection
+from Services.Database.Units import load_unit_index, resolve_units, unmatched_report
 
 load_dotenv()
 
@@ -127,18 +128,15 @@ def update_deals_from_monday():
 	connection = db_result["connection"]
 	cursor = connection.cursor(dictionary=True)
 
-	# Get units
-	cursor.execute("SELECT * FROM units")
-	units = cursor.fetchall()
-	unit_df = pd.DataFrame(units)[['unit_id', 'address', 'unit']]
+	# Resolve every Monday row to a unit_id in one pass over the unit index
+	unit_index = load_unit_index(connection)
+	df['unit_id'] = pd.Series(resolve_units(unit_index, df['Address'], df['Unit']), index=df.index, dtype=object)
 
 	total_uploaded = 0
 
 	for idx, row in df.iterrows():
-		# Get unit_id
-		try:
-			unit_id = unit_df[(unit_df.address == row['Address']) & (unit_df.unit == row['Unit'])].unit_id.values[0]
-		except Exception:
+		unit_id = row['unit_id']
+		if unit_id is None:
 			continue
 
 		# Clean up and prepare values
@@ -216,6 +214,10 @@ def update_deals_from_monday():
 	connection.commit()
 	cursor.close()
 	connection.close()
+
+	report = unmatched_report(unit_index)
+	if report['unmatched_keys']:
+		print(f"⚠️ {report['unmatched_rows']} Monday rows matched no unit: {report['top_unmatched']}")
 	print(f"✅ Done! {total_uploaded} deals uploaded or updated successfully.")
 
 if __name__ == "__main__":
@@ -0,0 +1,110 @@
+import json
+import sys
+import time
+
+from .comp_cache import load_comp_data
+from .sections import compute_sections
+from .data_processor import AMENITY_SEGMENTS, address_segments, segment_label
+
+
+def _notify(progresses, stage, stopped):
+    """Tell each report a shared stage is starting; a report whose callback raises (e.g. cancelled) is dropped"""
+    for i, progress in enumerate(progresses):
+        if progress and i not in stopped:
+            try:
+                progress(stage)
+            except Exception as e:
+                stopped[i] = e
+
+def report_segments(address_filters):
+    return address_segments(address_filters) if address_filters else AMENITY_SEGMENTS
+
+def compute_batch_data(comp_data, report_specs, workers=None):
+    """
+    Section data for every report in the batch from one sections pass.
+
+    Comparison tables, weekly trends, general metrics and inventory don't depend on the
+    address filters, so they are computed once. The YTD PPSF charts are computed once for
+    the union of every report's segments (one rent history, one groupby) and each report
+    picks its own charts back out. Returns ([data per report], timings).
+    """
+    per_report = [report_segments(spec.get('address_filters')) for spec in report_specs]
+    union = list({segment_label(segment): segment for segments in per_report for segment in segments}.values())
+
+    shared, timings = compute_sections(comp_data, workers, ytd_segments=union)
+    charts_by_label = {segment_label(segment): chart for segment, chart in zip(union, shared['ytd_ppsf']['charts'])}
+
+    batch_data = []
+    for segments in per_report:
+        data = dict(shared)
+        charts = []
+        for segment in segments:
+            chart = dict(charts_by_label[segment_label(segment)])
+            chart['title'] = segment['title']
+            charts.append(chart)
+        data['ytd_ppsf'] = {'charts': charts, 'months': shared['ytd_ppsf']['months']}
+        batch_data.append(data)
+    return batch_data, timings
+
+def generate_reports(report_specs, report_ids=None, progresses=None, workers=None):
+    """
+    Generate one report per spec ({'report_name': ..., 'address_filters': [...]}) from a
+    single comp data load and sections pass. report_ids/progresses optionally line up with
+    report_specs (see jobs.submit_batch). Returns per-report results and reports per minute.
+    """
+    from .generate_report import generate_report
+
+    batch_start = time.perf_counter()
+    report_ids = report_ids or [None] * len(report_specs)
+    progresses = progresses or [None] * len(report_specs)
+
+    stopped = {}
+    _notify(progresses, 'load_data', stopped)
+    stage_start = time.perf_counter()
+    comp_data = load_comp_data()
+    load_seconds = round(time.perf_counter() - stage_start, 3)
+
+    _notify(progresses, 'sections', stopped)
+    batch_data, section_timings = compute_batch_data(comp_data, report_specs, workers)
+    shared_seconds = round(time.perf_counter() - batch_start, 3)
+    print(f"Batch of {len(report_specs)} reports: shared data ready in {shared_seconds}s")
+
+    results = []
+    for i, (spec, report_id, progress, data) in enumerate(zip(report_specs, report_ids, progresses, batch_data)):
+        report_start = time.perf_counter()
+        result = {'report_name': spec['report_name'], 'report_id': report_id, 'file_path': None, 'error': None}
+        if i in stopped:
+            result.update({'error': str(stopped[i]), 'exception': type(stopped[i]).__name__, 'seconds': 0.0})
+            results.append(result)
+            continue
+        try:
+            result['file_path'] = generate_report(
+                spec['report_name'], spec.get('address_filters'),
+                report_id=report_id, progress=progress, data=data,
+            )
+        except Exception as e:
+            print(f"Batch report '{spec['report_name']}' failed: {e}")
+            result['error'] = str(e)
+            result['exception'] = type(e).__name__
+        result['seconds'] = round(time.perf_counter() - report_start, 3)
+        results.append(result)
+
+    total_seconds = time.perf_counter() - batch_start
+    summary = {
+        'reports': results,
+        'load_data_seconds': load_seconds,
+        'shared_seconds': shared_seconds,
+        'section_timings': section_timings,
+        'total_seconds': round(total_seconds, 3),
+        'reports_per_minute': round(len(report_specs) / total_seconds * 60, 2) if total_seconds else None,
+    }
+    print(f"Batch finished: {len(report_specs)} reports in {summary['total_seconds']}s ({summary['reports_per_minute']} reports/min)")
+    return summary
+
+if __name__ == "__main__":
+    # python3 -m Services.Reports.batch batch.json
+    # batch.json: [{"report_name": "...", "address_filters": [{"name": "...", "filter": {...}}, ...]}, ...]
+    with open(sys.argv[1]) as f:
+        specs = json.load(f)
+    summary = generate_reports(specs)
+    print(json.dumps({key: value for key, value in summary.items() if key != 'section_timings'}, default=str))
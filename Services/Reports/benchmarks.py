@@ -0,0 +1,453 @@
+import gc
+import json
+import sys
+import time
+import contextlib
+import io
+import os
+import subprocess
+import tempfile
+import platform
+import multiprocessing
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from . import charts
+from . import pdf_renderer
+from .data_processor import (
+    AMENITY_SEGMENTS, add_amenity_flags, apply_segment, process_streeteasy_rent_history,
+    daily_ppsf_records, monthly_ppsf_by_segment, report_rent_history, get_ytd_ppsf_data, get_weekly_trends,
+    typed_streeteasy_frame, create_comp_data, preprocess_df, calculate_general_metrics, get_comparison_tables,
+    process_all_data,
+)
+from .market_cube import build_market_cube
+from .pipeline import peak_rss_mb, reset_peak_rss
+from .sections import compute_sections, REPORT_WORKERS
+from .synthetic import synthetic_streeteasy_listings
+
+AMENITY_CHOICES = ['[]', '["balcony"]', '["washer_dryer"]', '["terrace", "washer_dryer"]', '["dishwasher"]']
+
+# Market sizes for the scale benchmark: today's sample up to all of NYC
+SCALE_SIZES = [10000, 100000, 1000000]
+
+# A function this much slower than the baseline run is reported by compare_scale
+SCALE_TOLERANCE = float(os.getenv('BENCH_SCALE_TOLERANCE', '0.25'))
+
+
+def synthetic_comp_data(listings=50000, months=14, seed=0):
+    """A preprocessed-looking comp frame: listings spread evenly over the last `months` months"""
+    rng = np.random.default_rng(seed)
+    bedrooms = rng.integers(0, 5, listings).astype(float)
+    now = pd.Timestamp.now().normalize()
+    df = pd.DataFrame({
+        'bedrooms': bedrooms,
+        'size_sqft': (450 + bedrooms * 250 + rng.normal(0, 60, listings)).round(),
+        'listed_price': (2800 + bedrooms * 900 + rng.normal(0, 300, listings)).round(),
+        'created_at': now - pd.to_timedelta(rng.integers(0, months * 30, listings), unit='D'),
+        'amenities': rng.choice(AMENITY_CHOICES, listings),
+    })
+    return add_amenity_flags(df)
+
+def legacy_create_comp_data(df):
+    """create_comp_data before typed loading: object columns, a copy, then two filtered copies"""
+    comp_data = df.copy()
+    comp_data = comp_data[comp_data['bedrooms'] != '']
+    return comp_data[comp_data['bedrooms'].astype(float) <= 4]
+
+def legacy_preprocess_df(comp_data):
+    """preprocess_df before typed loading: a full copy up front, then per-column to_numeric"""
+    comp_data = comp_data.copy()
+    for old_col, new_col in {'current_listed_price': 'listed_price', 'current_days_on_market': 'days_on_market', 'current_status': 'status'}.items():
+        if old_col in comp_data.columns:
+            comp_data[new_col] = comp_data[old_col]
+    for col in ['listed_price', 'size_sqft', 'bedrooms', 'net_rent', 'current_listed_price']:
+        comp_data[col] = pd.to_numeric(comp_data[col], errors='coerce')
+    comp_data = comp_data[(comp_data['current_listed_price'] > 0) & (comp_data['size_sqft'] > 0)]
+    comp_data = comp_data[comp_data['bedrooms'].notnull()].copy()
+    comp_data['ppsf'] = comp_data['current_listed_price'] / comp_data['size_sqft']
+    comp_data['npsf'] = comp_data['net_rent'] / comp_data['size_sqft']
+    comp_data['year'] = pd.to_datetime(comp_data['listed_at'], errors='coerce').dt.year
+    comp_data['month'] = pd.to_datetime(comp_data['listed_at'], errors='coerce').dt.month
+    return add_amenity_flags(comp_data)
+
+def legacy_load_comp_data(records):
+    return legacy_preprocess_df(legacy_create_comp_data(pd.DataFrame(records)))
+
+def typed_load_comp_data(records):
+    return preprocess_df(create_comp_data(typed_streeteasy_frame(records)))
+
+def _measure_load(loader_name, listings, seed):
+    """Run in a fresh process: peak RSS of one comp data load from synthetic query rows"""
+    records = synthetic_streeteasy_listings(listings, seed=seed).to_dict('records')
+    gc.collect()
+    reset_peak_rss()
+    before = peak_rss_mb()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        comp_data = LOADERS[loader_name](records)
+        seconds = time.perf_counter() - start
+    return {
+        'rows': len(comp_data),
+        'seconds': round(seconds, 3),
+        'rss_before_mb': round(before, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'frame_mb': round(comp_data.memory_usage(deep=True).sum() / 2**20, 1),
+    }
+
+LOADERS = {'legacy': legacy_load_comp_data, 'typed': typed_load_comp_data}
+
+def bench_comp_memory(listings=100000, seed=0):
+    """Peak RSS and frame size of the comp data load, object columns vs typed_streeteasy_frame"""
+    context = multiprocessing.get_context('spawn')  # each loader starts from a clean interpreter
+    result = {'benchmark': 'comp_memory', 'listings': listings}
+    for name in LOADERS:
+        with context.Pool(1) as pool:
+            result[name] = pool.apply(_measure_load, (name, listings, seed))
+    result['peak_rss_saved_mb'] = round(result['legacy']['peak_rss_mb'] - result['typed']['peak_rss_mb'], 1)
+    result['frame_ratio'] = round(result['legacy']['frame_mb'] / result['typed']['frame_mb'], 1)
+    print(json.dumps(result))
+    return result
+
+def legacy_segment_ppsf(historical_df, filtered_comp_data):
+    """The pre-vectorized path: iterrows over every day and bedroom, re-filtering for the avg sqft"""
+    historical_df = historical_df.reset_index()
+    historical_df['year'] = historical_df['date'].dt.year
+    historical_df['month'] = historical_df['date'].dt.month
+
+    ppsf_records = []
+    for _, row in historical_df.iterrows():
+        for bed_col in historical_df.columns:
+            if isinstance(bed_col, (int, float)) and bed_col in [0, 1, 2, 3, 4]:
+                price = row[bed_col]
+                if pd.notnull(price) and price > 0:
+                    bed_data = filtered_comp_data[filtered_comp_data['bedrooms'] == bed_col]
+                    if not bed_data.empty:
+                        avg_sqft = bed_data['size_sqft'].mean()
+                        if pd.notnull(avg_sqft) and avg_sqft > 0:
+                            ppsf_records.append({'year': row['year'], 'month': row['month'], 'ppsf': price / avg_sqft})
+    return pd.DataFrame(ppsf_records)
+
+def legacy_monthly_ppsf(comp_data):
+    monthly = {}
+    for i, segment in enumerate(AMENITY_SEGMENTS):
+        filtered = apply_segment(comp_data, segment)
+        ppsf_df = legacy_segment_ppsf(process_streeteasy_rent_history(filtered), filtered)
+        for month in range(1, 13):
+            for year in ppsf_df['year'].unique():
+                value = ppsf_df[(ppsf_df['year'] == year) & (ppsf_df['month'] == month)]['ppsf'].mean()
+                if pd.notnull(value):
+                    monthly[(i, year, month)] = value
+    return pd.Series(monthly)
+
+def vectorized_monthly_ppsf(comp_data):
+    segment_ppsf = []
+    for i, segment in enumerate(AMENITY_SEGMENTS):
+        filtered = apply_segment(comp_data, segment)
+        ppsf_df = daily_ppsf_records(process_streeteasy_rent_history(filtered), filtered)
+        ppsf_df['segment'] = i
+        segment_ppsf.append(ppsf_df)
+    return monthly_ppsf_by_segment(segment_ppsf)
+
+def bench_ytd_ppsf(listings=50000, months=14, seed=0):
+    """Monthly PPSF for all segments, legacy loop vs melt/groupby (chart rendering excluded)"""
+    comp_data = synthetic_comp_data(listings, months, seed)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        legacy = legacy_monthly_ppsf(comp_data)
+        legacy_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorized = vectorized_monthly_ppsf(comp_data)
+        vectorized_seconds = time.perf_counter() - start
+
+    legacy.index.names = vectorized.index.names
+    legacy = legacy.sort_index()
+    result = {
+        'benchmark': 'ytd_ppsf',
+        'listings': listings,
+        'months': months,
+        'segments': len(AMENITY_SEGMENTS),
+        'legacy_seconds': round(legacy_seconds, 4),
+        'vectorized_seconds': round(vectorized_seconds, 4),
+        'speedup': round(legacy_seconds / vectorized_seconds, 1) if vectorized_seconds else None,
+        'matches': bool(legacy.index.equals(vectorized.index) and np.allclose(legacy.to_numpy(), vectorized.to_numpy())),
+    }
+    print(json.dumps(result))
+    return result
+
+def bench_charts(listings=20000, runs=3):
+    """Chart sections of a report run `runs` times against an empty chart cache: the first run renders, the rest reuse"""
+    comp_data = synthetic_comp_data(listings)
+    original_dir = charts.CHART_CACHE_DIR
+    run_seconds = []
+    with tempfile.TemporaryDirectory() as cache_dir, contextlib.redirect_stdout(io.StringIO()):
+        charts.CHART_CACHE_DIR = cache_dir
+        try:
+            rent_history = report_rent_history(comp_data)
+            for _ in range(runs):
+                start = time.perf_counter()
+                get_ytd_ppsf_data(comp_data, rent_history=rent_history)
+                get_weekly_trends(comp_data, rent_history=rent_history)
+                run_seconds.append(time.perf_counter() - start)
+        finally:
+            charts.CHART_CACHE_DIR = original_dir
+            charts.shutdown_chart_pool()
+
+    result = {
+        'benchmark': 'charts',
+        'listings': listings,
+        'chart_workers': charts.CHART_WORKERS,
+        'first_run_seconds': round(run_seconds[0], 4),
+        'repeat_run_seconds': [round(seconds, 4) for seconds in run_seconds[1:]],
+    }
+    print(json.dumps(result))
+    return result
+
+def detect_pdf_engine():
+    """Same preference as generate_report.get_pdf_generator: pdfkit/wkhtmltopdf, then WeasyPrint"""
+    try:
+        import pdfkit
+        pdfkit.configuration()
+        return 'pdfkit'
+    except (ImportError, OSError):
+        pass
+    try:
+        import weasyprint  # noqa: F401
+        return 'weasyprint'
+    except (ImportError, OSError):
+        return None
+
+def legacy_render_pdf(engine, html, html_path, pdf_path, base_url):
+    """The per-report path before the renderer pool: fresh engine state and an X server per report"""
+    if engine == 'weasyprint':
+        from weasyprint import HTML
+        HTML(string=html, base_url=base_url).write_pdf(pdf_path)
+    else:
+        import pdfkit
+        config = None
+        if subprocess.run(['which', 'xvfb-run'], capture_output=True).returncode == 0:
+            config = pdfkit.configuration(wkhtmltopdf='xvfb-run -a wkhtmltopdf')
+        pdfkit.from_file(html_path, pdf_path, options=pdf_renderer.PDFKIT_OPTIONS, configuration=config)
+
+def bench_pdf(html_path=None, reports=5):
+    """Per-report PDF seconds for an existing report HTML: legacy per-report startup vs the warm renderer"""
+    html_path = html_path or os.path.join(charts.OUTPUT_DIR, 'Full_Market_Report_SMK_debug.html')
+    engine = detect_pdf_engine()
+    if engine is None:
+        result = {'benchmark': 'pdf', 'error': 'Neither pdfkit/wkhtmltopdf nor WeasyPrint is installed'}
+        print(json.dumps(result))
+        return result
+
+    with open(html_path) as f:
+        html = f.read()
+    base_url = os.path.dirname(os.path.abspath(html_path))
+
+    legacy_seconds = []
+    warm_seconds = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        for i in range(reports):
+            start = time.perf_counter()
+            legacy_render_pdf(engine, html, html_path, os.path.join(out_dir, f'legacy_{i}.pdf'), base_url)
+            legacy_seconds.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        pdf_renderer.start_renderer(engine)
+        pdf_renderer.render_pdf(engine, os.path.join(out_dir, 'warmup.pdf'), html=html, html_path=html_path, base_url=base_url)
+        first_warm = time.perf_counter() - start
+        try:
+            for i in range(reports):
+                start = time.perf_counter()
+                pdf_renderer.render_pdf(engine, os.path.join(out_dir, f'warm_{i}.pdf'), html=html, html_path=html_path, base_url=base_url)
+                warm_seconds.append(time.perf_counter() - start)
+        finally:
+            pdf_renderer.shutdown_renderer()
+
+    result = {
+        'benchmark': 'pdf',
+        'engine': engine,
+        'reports': reports,
+        'legacy_seconds_per_report': round(sum(legacy_seconds) / reports, 3),
+        'renderer_startup_seconds': round(first_warm, 3),
+        'warm_seconds_per_report': round(sum(warm_seconds) / reports, 3),
+    }
+    print(json.dumps(result))
+    return result
+
+@contextlib.contextmanager
+def _fresh_chart_cache():
+    """Point the chart cache at an empty directory, so every chart is drawn as after a new scrape"""
+    original_dir = charts.CHART_CACHE_DIR
+    with tempfile.TemporaryDirectory() as cache_dir:
+        charts.CHART_CACHE_DIR = cache_dir
+        try:
+            yield
+        finally:
+            charts.CHART_CACHE_DIR = original_dir
+            charts.shutdown_chart_pool()  # the next measurement starts from a cold pool
+
+def _timed(func, *args, **kwargs):
+    """(result, {'seconds', 'peak_rss_mb'}) of one call with cold charts and its prints swallowed"""
+    gc.collect()
+    with _fresh_chart_cache(), contextlib.redirect_stdout(io.StringIO()):
+        reset_peak_rss()
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+    return result, {'seconds': round(seconds, 3), 'peak_rss_mb': round(peak_rss_mb(), 1)}
+
+def _time_report(raw, report_name, pdf=False):
+    """
+    generate_report's stages on the synthetic rows: load, sections (worker pool), HTML and
+    optionally the PDF. The inventory page reads live deal data, not listings, so it is empty here.
+    """
+    from .generate_report import render_report_html, render_report_pdf, debug_html_path, get_pdf_generator
+
+    stages = {}
+    gc.collect()
+    with _fresh_chart_cache(), contextlib.redirect_stdout(io.StringIO()):
+        reset_peak_rss()
+        report_start = time.perf_counter()
+
+        start = time.perf_counter()
+        comp_data = preprocess_df(create_comp_data(typed_streeteasy_frame(raw)))
+        stages['load_data'] = round(time.perf_counter() - start, 3)
+
+        start = time.perf_counter()
+        sections, section_timings = compute_sections(comp_data, include_inventory=False)
+        stages['sections'] = round(time.perf_counter() - start, 3)
+
+        start = time.perf_counter()
+        html = render_report_html(sections, {'units': [], 'total_count': 0}, datetime.now().strftime('%B %d, %Y'))
+        stages['render_html'] = round(time.perf_counter() - start, 3)
+
+        if pdf:
+            start = time.perf_counter()
+            html_path = debug_html_path(report_name)
+            with open(html_path, 'w') as f:
+                f.write(html['full'])
+            pdf_path = render_report_pdf(html, report_name, get_pdf_generator())
+            stages['pdf'] = round(time.perf_counter() - start, 3)
+            for path in {html_path, pdf_path} - {None}:
+                if os.path.exists(path):
+                    os.remove(path)
+
+        stages['total'] = round(time.perf_counter() - report_start, 3)
+    stages['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    stages['section_timings'] = section_timings
+    return stages
+
+def bench_scale_size(listings, seed=0, pdf=False):
+    """Seconds and peak RSS of each data_processor step and of a whole report for one market size"""
+    start = time.perf_counter()
+    raw = synthetic_streeteasy_listings(listings, seed=seed)
+    generate_seconds = time.perf_counter() - start
+
+    functions = {}
+    typed, functions['typed_streeteasy_frame'] = _timed(typed_streeteasy_frame, raw)
+    comp_data, functions['create_comp_data'] = _timed(create_comp_data, typed)
+    comp_data, functions['preprocess_df'] = _timed(preprocess_df, comp_data)
+    rent_history, functions['report_rent_history'] = _timed(report_rent_history, comp_data)
+    _, functions['calculate_general_metrics'] = _timed(calculate_general_metrics, comp_data.copy())  # it rewrites columns
+    _, functions['get_comparison_tables'] = _timed(get_comparison_tables, comp_data)
+    _, functions['get_ytd_ppsf_data'] = _timed(get_ytd_ppsf_data, comp_data, rent_history=rent_history)
+    _, functions['get_weekly_trends'] = _timed(get_weekly_trends, comp_data, rent_history=rent_history)
+    _, functions['process_all_data'] = _timed(process_all_data, typed)
+    _, functions['build_market_cube'] = _timed(build_market_cube, comp_data)
+    comp_rows = len(comp_data)
+    del typed, comp_data, rent_history
+
+    result = {
+        'listings': listings,
+        'comp_rows': comp_rows,
+        'generate_seconds': round(generate_seconds, 3),
+        'functions': functions,
+        'report': _time_report(raw, f'benchmark_{listings}', pdf),
+    }
+    print(json.dumps({'listings': listings, 'report_total': result['report']['total'],
+                      'functions': {name: timing['seconds'] for name, timing in functions.items()}}))
+    return result
+
+def bench_scale(sizes=None, seed=0, output=None, pdf=False):
+    """
+    bench_scale_size for each market size (default SCALE_SIZES) on synthetic StreetEasy
+    listings; the results are written to `output` as JSON for compare_scale.
+    """
+    result = {
+        'benchmark': 'scale',
+        'run_at': datetime.now().isoformat(timespec='seconds'),
+        'seed': seed,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'cpus': os.cpu_count(),
+        'report_workers': REPORT_WORKERS,
+        'chart_workers': charts.CHART_WORKERS,
+        'sizes': [bench_scale_size(listings, seed, pdf) for listings in (sizes or SCALE_SIZES)],
+    }
+    if output:
+        with open(output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Scale benchmark written to {output}")
+    return result
+
+def compare_scale(baseline, current, tolerance=SCALE_TOLERANCE):
+    """
+    Per-function slowdown of a bench_scale result against a baseline one (dicts or JSON paths),
+    for the market sizes both ran. Returns the entries more than `tolerance` slower.
+    """
+    runs = []
+    for run in (baseline, current):
+        if isinstance(run, str):
+            with open(run) as f:
+                run = json.load(f)
+        runs.append({size['listings']: size for size in run['sizes']})
+    baseline, current = runs
+
+    regressions = []
+    for listings in sorted(set(baseline) & set(current)):
+        before = {name: timing['seconds'] for name, timing in baseline[listings]['functions'].items()}
+        after = {name: timing['seconds'] for name, timing in current[listings]['functions'].items()}
+        before['report_total'] = baseline[listings]['report']['total']
+        after['report_total'] = current[listings]['report']['total']
+        for name in [name for name in before if name in after]:
+            ratio = after[name] / before[name] if before[name] else None
+            print(f"{listings:>9} {name:<26} {before[name]:>9.3f}s -> {after[name]:>9.3f}s" + (f"  x{ratio:.2f}" if ratio else ''))
+            if ratio is not None and ratio > 1 + tolerance:
+                regressions.append({'listings': listings, 'function': name, 'baseline_seconds': before[name],
+                                    'seconds': after[name], 'ratio': round(ratio, 2)})
+    print(json.dumps({'regressions': regressions}))
+    return regressions
+
+if __name__ == "__main__":
+    # python3 -m Services.Reports.benchmarks ytd_ppsf [listings] [months]
+    # python3 -m Services.Reports.benchmarks charts [listings]
+    # python3 -m Services.Reports.benchmarks comp_memory [listings]
+    # python3 -m Services.Reports.benchmarks pdf [report.html] [reports]
+    # python3 -m Services.Reports.benchmarks scale [10000,100000,1000000] [results.json] [pdf]
+    # python3 -m Services.Reports.benchmarks compare baseline.json results.json
+    command = sys.argv[1] if len(sys.argv) > 1 else 'ytd_ppsf'
+    if command == 'scale':
+        bench_scale(
+            sizes=[int(size) for size in sys.argv[2].split(',')] if len(sys.argv) > 2 else None,
+            output=sys.argv[3] if len(sys.argv) > 3 else None,
+            pdf=len(sys.argv) > 4 and sys.argv[4] == 'pdf',
+        )
+    elif command == 'compare':
+        sys.exit(1 if compare_scale(sys.argv[2], sys.argv[3]) else 0)
+    elif command == 'comp_memory':
+        bench_comp_memory(listings=int(sys.argv[2]) if len(sys.argv) > 2 else 100000)
+    elif command == 'charts':
+        bench_charts(listings=int(sys.argv[2]) if len(sys.argv) > 2 else 20000)
+    elif command == 'pdf':
+        bench_pdf(
+            html_path=sys.argv[2] if len(sys.argv) > 2 else None,
+            reports=int(sys.argv[3]) if len(sys.argv) > 3 else 5,
+        )
+    elif command == 'ytd_ppsf':
+        bench_ytd_ppsf(
+            listings=int(sys.argv[2]) if len(sys.argv) > 2 else 50000,
+            months=int(sys.argv[3]) if len(sys.argv) > 3 else 14,
+        )
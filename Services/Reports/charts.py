@@ -0,0 +1,359 @@
+import os
+import glob
+import json
+import hashlib
+import base64
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from matplotlib.ticker import FuncFormatter
+import pandas as pd
+
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), 'output')
+
+# Rendered images are named by the hash of their spec, so an unchanged chart is never redrawn
+CHART_CACHE_DIR = os.getenv('REPORT_CHART_DIR', os.path.join(OUTPUT_DIR, 'charts'))
+
+# Bump when the drawing code changes so cached images are re-rendered
+CHART_VERSION = 1
+
+# Newest images kept per chart kind; charts a report reuses are touched, so they stay recent
+CHART_CACHE_KEEP = int(os.getenv('REPORT_CHART_KEEP', '200'))
+
+# CHART_WORKERS=0 renders in the calling process
+CHART_WORKERS = int(os.getenv('CHART_WORKERS', '2'))
+
+CHART_STYLES = {
+    'weekly_trends': {
+        'figsize': [20, 6], 'dpi': 150,
+        'colors': ['#7FB3D3', '#5B9BD5', '#4472C4', '#2F528F'],
+    },
+    'ppsf': {
+        'figsize': [6, 2.5], 'dpi': 150,
+        'current_color': '#2563eb', 'prior_color': '#f59e0b',
+    },
+    'price_trends': {
+        'figsize': [20, 6], 'dpi': 150,
+        'colors': ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b'],
+    },
+}
+
+_pool = {'executor': None}
+_figures = {}
+
+# The per-kind figures and pyplot's style state are process-global; section threads and
+# concurrent report jobs draw one chart at a time through this lock
+_draw_lock = threading.Lock()
+_pool_lock = threading.Lock()
+
+
+def chart_key(spec):
+    """Content hash of a chart spec (series, labels and style)"""
+    payload = json.dumps({'version': CHART_VERSION, 'spec': spec}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+def chart_file(spec):
+    return os.path.join(CHART_CACHE_DIR, f"{spec['kind']}_{chart_key(spec)}.png")
+
+def chart_relpath(path):
+    """Path as the report templates reference it, relative to the output directory"""
+    return os.path.relpath(path, OUTPUT_DIR)
+
+def _figure(kind, style):
+    # One figure per chart kind per process, cleared and redrawn instead of rebuilt
+    plt.style.use('default')
+    fig = _figures.get(kind)
+    if fig is None:
+        fig = _figures[kind] = plt.figure(figsize=style['figsize'])
+    fig.clf()
+    fig.set_size_inches(style['figsize'])
+    return fig, fig.add_subplot()
+
+def draw_weekly_trends(spec):
+    style = spec['style']
+    fig, ax = _figure(spec['kind'], style)
+    colors = style['colors']
+    dates = pd.to_datetime(spec['dates'])
+
+    for i, series in enumerate(spec['series']):
+        color = colors[i % len(colors)]
+        y_data = [float('nan') if y is None else y for y in series['values']]
+        ax.plot(dates, y_data,
+               color=color,
+               linewidth=3,
+               marker='o',
+               markersize=6,
+               label=series['label'],
+               markerfacecolor=color,
+               markeredgecolor='white',
+               markeredgewidth=1)
+        for x, y in zip(dates, y_data):
+            if pd.notnull(y):
+                ax.annotate(f"${y:,.0f}",
+                           (x, y),
+                           textcoords="offset points",
+                           xytext=(0, 6),
+                           ha='center',
+                           fontsize=8,
+                           color=color,
+                           fontweight='bold')
+    ax.set_xlabel('')
+    ax.set_ylabel('')
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'${x:,.0f}'))
+    ax.tick_params(axis='y', labelsize=10, colors='#666666')
+    ax.set_xticks(dates)
+    ax.set_xticklabels([d.strftime('%b-%d') for d in dates],
+                       fontsize=10,
+                       color='#666666',
+                       rotation=0)
+    ax.grid(True, alpha=0.3, linestyle='-', linewidth=0.5, color='#E5E5E5')
+    ax.set_axisbelow(True)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['left'].set_color('#E5E5E5')
+    ax.spines['bottom'].set_color('#E5E5E5')
+    ax.set_facecolor('white')
+    fig.patch.set_facecolor('white')
+    ax.legend(loc='center left',
+              bbox_to_anchor=(1.01, 0.5),
+              frameon=False,
+              fontsize=10,
+              labelcolor='#333333')
+    fig.subplots_adjust(right=0.88)
+    fig.tight_layout()
+    return fig, {'bbox_inches': 'tight', 'facecolor': 'white'}
+
+def draw_ppsf(spec):
+    style = spec['style']
+    fig, ax = _figure(spec['kind'], style)
+    fig.patch.set_facecolor('white')
+    months = spec['months']
+    x_positions = list(range(len(months)))
+
+    # Drop missing/zero months so the lines only connect real points
+    current_valid = [(i, val) for i, val in enumerate(spec['current']) if val is not None and pd.notnull(val) and val > 0]
+    prior_valid = [(i, val) for i, val in enumerate(spec['prior']) if val is not None and pd.notnull(val) and val > 0]
+
+    lines = [
+        (current_valid, style['current_color'], spec['current_year'], 'o', '-', 0.9),
+        (prior_valid, style['prior_color'], spec['prior_year'], 's', '--', 0.8),
+    ]
+
+    if not current_valid and not prior_valid:
+        ax.text(0.5, 0.5, 'No Data Available',
+                horizontalalignment='center', verticalalignment='center',
+                transform=ax.transAxes, fontsize=14, color='#6b7280',
+                fontweight='500')
+        ax.set_xlim(0, len(months)-1)
+        ax.set_ylim(0, 10)
+    else:
+        for points, color, year, marker, linestyle, alpha in lines:
+            if not points:
+                continue
+            x_data = [point[0] for point in points]
+            y_data = [point[1] for point in points]
+            ax.plot(x_data, y_data,
+                   color=color,
+                   linewidth=3,
+                   marker=marker,
+                   markersize=6,
+                   label=f'{year}',
+                   linestyle=linestyle,
+                   markerfacecolor=color,
+                   markeredgecolor='white',
+                   markeredgewidth=2,
+                   alpha=alpha)
+            for x, y in zip(x_data, y_data):
+                ax.annotate(f"${y:.1f}",
+                           (x, y),
+                           textcoords="offset points",
+                           xytext=(0, 8),
+                           ha='center',
+                           fontsize=8,
+                           color=color,
+                           fontweight='bold')
+
+    ax.set_xlabel('')
+    ax.set_ylabel('')
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'${x:.1f}'))
+    ax.tick_params(axis='y', labelsize=9, colors='#374151', labelcolor='#374151')
+    ax.set_xticks(x_positions)
+    ax.set_xticklabels(months, fontsize=9, color='#374151')
+    ax.grid(True, alpha=0.2, linestyle='-', linewidth=1, color='#e5e7eb')
+    ax.set_axisbelow(True)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['left'].set_color('#e5e7eb')
+    ax.spines['bottom'].set_color('#e5e7eb')
+    ax.spines['left'].set_linewidth(1)
+    ax.spines['bottom'].set_linewidth(1)
+    ax.set_facecolor('#fafafa')
+
+    if current_valid or prior_valid:
+        legend = ax.legend(fontsize=9,
+                          frameon=True,
+                          loc='upper left',
+                          fancybox=True,
+                          shadow=False,
+                          framealpha=0.9,
+                          edgecolor='#e5e7eb',
+                          facecolor='white')
+        legend.get_frame().set_linewidth(1)
+
+    # Padding above/below so the value labels fit
+    all_values = [point[1] for point in current_valid + prior_valid]
+    if all_values:
+        min_val = min(all_values)
+        max_val = max(all_values)
+        padding = (max_val - min_val) * 0.15
+        ax.set_ylim(max(0, min_val - padding), max_val + padding)
+
+    fig.tight_layout(pad=0.2)
+    return fig, {'bbox_inches': 'tight', 'facecolor': 'white', 'edgecolor': 'none', 'pad_inches': 0.05}
+
+def draw_price_trends(spec):
+    style = spec['style']
+    fig, ax = _figure(spec['kind'], style)
+    colors = style['colors']
+
+    for i, series in enumerate(spec['series']):
+        ax.plot(pd.to_datetime(series['dates']), series['values'],
+                color=colors[i % len(colors)],
+                linewidth=2,
+                marker='o',
+                markersize=4,
+                label=series['label'])
+
+    ax.set_title(spec['title'], fontsize=16, fontweight='bold', pad=20)
+    ax.set_xlabel('Date', fontsize=12)
+    ax.set_ylabel('Average Rent ($)', fontsize=12)
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'${x:,.0f}'))
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%b'))
+    ax.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
+    ax.grid(True, alpha=0.3, linestyle='--')
+    ax.legend(loc='upper right', frameon=True, fancybox=True, shadow=True, fontsize=10)
+    fig.tight_layout()
+    return fig, {'bbox_inches': 'tight', 'facecolor': 'white', 'edgecolor': 'none'}
+
+DRAWERS = {
+    'weekly_trends': draw_weekly_trends,
+    'ppsf': draw_ppsf,
+    'price_trends': draw_price_trends,
+}
+
+def render_chart_file(spec, path=None):
+    """Draw a spec and write it to its content-addressed file (no-op if it already exists)"""
+    path = path or chart_file(spec)
+    if os.path.exists(path):
+        return path
+
+    with _draw_lock:
+        if os.path.exists(path):
+            return path  # another thread drew it while this one waited
+        fig, save_kwargs = DRAWERS[spec['kind']](spec)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            fig.savefig(tmp_path, format='png', dpi=spec['style']['dpi'], **save_kwargs)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return path
+
+def _init_worker():
+    # Pay for the pyplot/font setup once per worker rather than once per chart
+    plt.style.use('default')
+    _figure('ppsf', CHART_STYLES['ppsf'])
+
+def _executor():
+    # forkserver: workers fork from a clean single-threaded server that has imported this module,
+    # never from the (multithreaded) web worker, where fork can copy a lock another thread holds
+    with _pool_lock:
+        if _pool['executor'] is None:
+            context = None
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload([__name__])
+            _pool['executor'] = ProcessPoolExecutor(max_workers=CHART_WORKERS, mp_context=context, initializer=_init_worker)
+        return _pool['executor']
+
+def shutdown_chart_pool():
+    with _pool_lock:
+        executor, _pool['executor'] = _pool['executor'], None
+    if executor is not None:
+        executor.shutdown()
+
+def prune_chart_cache(kinds=None):
+    """Keep the CHART_CACHE_KEEP newest images of each chart kind; returns the number removed"""
+    removed = 0
+    for kind in kinds or DRAWERS:
+        try:
+            images = sorted(glob.glob(os.path.join(CHART_CACHE_DIR, f'{kind}_*.png')), key=os.path.getmtime, reverse=True)
+        except OSError:
+            continue  # an image vanished mid-listing (another process pruning); next render retries
+        for old_path in images[CHART_CACHE_KEEP:]:
+            try:
+                os.remove(old_path)
+                removed += 1
+            except OSError:
+                pass  # another process pruned it first
+    return removed
+
+def render_charts(specs):
+    """
+    Render chart specs, returning output-relative image paths in the same order.
+
+    Cached images are returned without drawing anything; misses go to the chart worker
+    pool, or are drawn in-process when CHART_WORKERS=0 or when already running inside a
+    worker process.
+    """
+    paths = [chart_file(spec) for spec in specs]
+    misses = {}
+    for path, spec in zip(paths, specs):
+        try:
+            os.utime(path)  # a hit: mark it recently used so pruning keeps it
+        except OSError:
+            misses[path] = spec
+
+    if misses:
+        in_worker = multiprocessing.parent_process() is not None
+        if CHART_WORKERS <= 0 or in_worker or len(misses) == 1 and _pool['executor'] is None:
+            for spec in misses.values():
+                render_chart_file(spec)
+        else:
+            try:
+                list(_executor().map(render_chart_file, misses.values(), misses.keys()))
+            except Exception as e:
+                print(f"Chart pool failed ({e}), rendering in-process")
+                shutdown_chart_pool()
+                for spec in misses.values():
+                    render_chart_file(spec)
+
+        prune_chart_cache({spec['kind'] for spec in misses.values()})
+
+    return [chart_relpath(path) for path in paths]
+
+def render_chart(spec):
+    return render_charts([spec])[0]
+
+def chart_base64(spec):
+    """Rendered chart as a base64 PNG string, for charts embedded inline in the HTML"""
+    render_chart(spec)
+    with open(chart_file(spec), 'rb') as f:
+        return base64.b64encode(f.read()).decode()
+
+def clear_chart_cache():
+    if not os.path.isdir(CHART_CACHE_DIR):
+        return 0
+    removed = 0
+    for name in os.listdir(CHART_CACHE_DIR):
+        if name.endswith('.png'):
+            os.remove(os.path.join(CHART_CACHE_DIR, name))
+            removed += 1
+    return removed
@@ -0,0 +1,134 @@
+import os
+import glob
+import time
+import threading
+
+import pandas as pd
+
+from Services.Database.Connect import get_db_connection
+from .data_processor import get_streeteasy_data, create_comp_data, preprocess_df
+
+CACHE_DIR = os.getenv('REPORT_CACHE_DIR', os.path.join(os.path.dirname(__file__), 'cache'))
+
+# Bump when create_comp_data/preprocess_df change shape so stale files aren't reused
+CACHE_FORMAT = 3
+
+# How long a looked-up data version is trusted before asking the DB again
+VERSION_CHECK_SECONDS = int(os.getenv('REPORT_CACHE_CHECK_SECONDS', '60'))
+
+_cache = {'version': None, 'comp_data': None, 'checked_at': 0.0, 'latest_version': None}
+_cache_lock = threading.Lock()
+
+
+def get_data_version():
+    """
+    Version of the streeteasy_units data as 'YYYY-MM-DD_YYYYMMDDHHMMSS' (MAX(run_date) and
+    MAX(updated_at)), so a second scrape on the same day is a new version. Both columns are
+    indexed by save_to_db, so this is two index lookups. Tables without updated_at fall back
+    to the run_date alone. None if the DB can't be reached.
+    """
+    db_result = get_db_connection()
+    if db_result["status"] != "connected":
+        return None
+
+    connection = db_result["connection"]
+    cursor = connection.cursor()
+    try:
+        try:
+            cursor.execute("SELECT MAX(run_date), MAX(updated_at) FROM streeteasy_units")
+            latest, updated_at = cursor.fetchone()
+        except Exception:
+            cursor.execute("SELECT MAX(run_date) FROM streeteasy_units")
+            latest, updated_at = cursor.fetchone()[0], None
+        if latest is None:
+            return None
+        return f"{latest}_{updated_at:%Y%m%d%H%M%S}" if updated_at is not None else str(latest)
+    finally:
+        cursor.close()
+        connection.close()
+
+def version_run_date(version):
+    """The scrape run_date part of a get_data_version string"""
+    return version.split('_')[0] if version else None
+
+def _latest_version():
+    now = time.time()
+    if _cache['latest_version'] is None or now - _cache['checked_at'] > VERSION_CHECK_SECONDS:
+        try:
+            _cache['latest_version'] = get_data_version()
+        except Exception as e:
+            print(f"Could not check latest StreetEasy data version: {e}")
+            _cache['latest_version'] = None
+        _cache['checked_at'] = now
+    return _cache['latest_version']
+
+def _cache_path(version):
+    return os.path.join(CACHE_DIR, f'comp_data_v{CACHE_FORMAT}_{version}.parquet')
+
+def _read_disk(version):
+    path = _cache_path(version)
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception as e:
+        print(f"Could not read comp cache {path}: {e}")
+        return None
+
+def _write_disk(version, comp_data):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_path(version)
+    tmp_path = f'{path}.tmp'
+    try:
+        comp_data.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Could not write comp cache {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+
+    for old_path in glob.glob(os.path.join(CACHE_DIR, 'comp_data_v*.parquet')):
+        if old_path != path:
+            os.remove(old_path)
+
+def build_comp_data():
+    df = get_streeteasy_data()
+    comp_data = create_comp_data(df)  # Filter to no fee + required amenities
+    return preprocess_df(comp_data)  # Preprocess the filtered data
+
+def load_comp_data(force_refresh=False):
+    """
+    The preprocessed comp frame, rebuilt only when a newer scrape has landed.
+
+    Versions are keyed by get_data_version (the latest run_date and write): memory first, then the
+    Parquet file in CACHE_DIR, then the full get_streeteasy_data aggregation. Callers
+    get their own copy, since some report sections modify the frame they are given.
+    The frame's attrs['version'] is the version it was built for (market_cube keys on it).
+    """
+    with _cache_lock:
+        version = _latest_version()
+
+        if not force_refresh and _cache['comp_data'] is not None and version in (None, _cache['version']):
+            print(f"Comp data cache hit (memory, version {_cache['version']})")
+            return _cache['comp_data'].copy()
+
+        comp_data = None if force_refresh or version is None else _read_disk(version)
+        if comp_data is not None:
+            print(f"Comp data cache hit (disk, version {version})")
+        else:
+            print(f"Comp data cache miss (version {version}), loading from database")
+            comp_data = build_comp_data()
+            if version is not None and len(comp_data):
+                _write_disk(version, comp_data)
+
+        comp_data.attrs['version'] = version
+        if len(comp_data):
+            _cache['version'] = version
+            _cache['comp_data'] = comp_data
+        return comp_data.copy()
+
+def clear_comp_cache():
+    """Drop the cached frame and force the next load to re-check the data version"""
+    with _cache_lock:
+        _cache.update({'version': None, 'comp_data': None, 'checked_at': 0.0, 'latest_version': None})
@@ -1,16 +1,147 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 from datetime import datetime, timedelta
 import json
-import base64
-import io
 from collections import defaultdict
 from Services.Database.Connect import get_db_connection
-from Services.Database.Data import run_query_system
+from Services.Database.Data import run_query_system, get_inventory_units
 from calendar import month_abbr
 import os
+from Services.Database.Units import get_rules, normalize_addresses
+from .charts import CHART_STYLES, render_chart, render_charts, chart_base64
+
+# Units printed on the inventory page; 0 prints every unit with a future move-out
+INVENTORY_UNIT_LIMIT = int(os.getenv('REPORT_INVENTORY_LIMIT', '30'))
+
+# Days of rent history behind the weekly trend and YTD PPSF charts (~14 months)
+RENT_HISTORY_DAYS = 425
+
+# Column dtypes for the get_streeteasy_data frame. The query returns every scalar as a string
+# (SUBSTRING_INDEX(GROUP_CONCAT(...))), so they are parsed once on load instead of being
+# astype'd as object columns in every step. Columns not listed stay as strings.
+STREETEASY_DTYPES = {
+    'areaName': 'category',
+    'current_status': 'category',
+    'source': 'category',
+    'bedrooms': 'Int8',
+    'is_no_fee': 'Int8',
+    'is_vector': 'Int8',
+    'bathrooms': 'float32',
+    'size_sqft': 'float32',
+    'current_listed_price': 'float32',
+    'net_rent': 'float32',
+    'free_months': 'float32',
+    'lease_term': 'float32',
+    'current_days_on_market': 'float32',
+    'calc_dom': 'float32',
+    'ctr': 'float32',
+    'featured_days_count': 'float32',
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'created_at': 'datetime64[ns]',
+    'listed_at': 'datetime64[ns]',
+    'last_run_date': 'datetime64[ns]',
+}
+
+# Amenity flags parsed once in preprocess_df: flag column -> amenity names it matches
+# (substring match on the lowercased amenities text, as the old per-row checks did)
+AMENITY_FLAGS = {
+    'has_outdoor': ['balcony', 'terrace'],
+    'has_laundry_unit': ['washer_dryer'],
+}
+
+# Report segments: each 'require' maps a flag to the value it must have.
+# Add a segment here (and a flag above if needed) - no new filter functions required.
+AMENITY_SEGMENTS = [
+    {'title': 'Comp Data (No Fee + Building Amenities)', 'require': {}},
+    {'title': 'Outdoor Space w/o Laundry in Unit', 'require': {'has_outdoor': True, 'has_laundry_unit': False}},
+    {'title': 'Laundry in Unit w/o Outdoor Space', 'require': {'has_laundry_unit': True, 'has_outdoor': False}},
+    {'title': 'Outdoor Space + Laundry in Unit', 'require': {'has_outdoor': True, 'has_laundry_unit': True}},
+]
+
+def add_amenity_flags(df, copy=True):
+    """
+    Add one boolean column per AMENITY_FLAGS entry plus an amenity_mask bitmask (bit i = i-th flag).
+    copy=False adds them to df itself, for a frame the caller already owns.
+    """
+    if copy:
+        df = df.copy()
+    amenities_col = 'amenities' if 'amenities' in df.columns else 'building_amenities'
+    if amenities_col in df.columns:
+        text = df[amenities_col].astype(str).str.lower().where(df[amenities_col].notna(), '')
+    else:
+        text = pd.Series('', index=df.index)
+
+    amenity_mask = np.zeros(len(df), dtype='int8')
+    for bit, (flag, names) in enumerate(AMENITY_FLAGS.items()):
+        matches = pd.Series(False, index=df.index)
+        for name in names:
+            matches |= text.str.contains(name, regex=False)
+        df[flag] = matches
+        amenity_mask |= matches.to_numpy(dtype='int8') << bit
+    df['amenity_mask'] = amenity_mask
+    return df
+
+def segment_mask(df, segment):
+    """
+    Boolean mask of the rows in a segment spec: {'require': {flag: bool}}, {'areas': [...]},
+    {'no_fee': bool} and/or {'addresses': [...]} / {'exclude_addresses': [...]} (see address_segments)
+    """
+    mask = np.ones(len(df), dtype=bool)
+    if segment.get('require'):
+        if any(flag not in df.columns for flag in AMENITY_FLAGS):
+            df = add_amenity_flags(df)
+        for flag, wanted in segment['require'].items():
+            mask &= (df[flag].to_numpy() == wanted)
+    if 'areas' in segment:
+        mask &= df['areaName'].isin(segment['areas']).to_numpy() if 'areaName' in df.columns else False
+    if 'no_fee' in segment:
+        no_fee = pd.to_numeric(df['is_no_fee'], errors='coerce').fillna(0).to_numpy() == 1 if 'is_no_fee' in df.columns else False
+        mask &= no_fee == bool(segment['no_fee'])
+
+    if 'addresses' in segment or 'exclude_addresses' in segment:
+        rules = get_rules()
+        addresses = normalize_addresses(df['address'], rules).to_numpy() if 'address' in df.columns else np.full(len(df), '')
+        if 'addresses' in segment:
+            mask &= np.isin(addresses, normalize_addresses(segment['addresses'], rules).to_numpy())
+        if 'exclude_addresses' in segment:
+            mask &= ~np.isin(addresses, normalize_addresses(segment['exclude_addresses'], rules).to_numpy())
+    return mask
+
+def segment_label(segment):
+    """Key a segment is stored under in the shared rent history (titles can repeat across filter sets)"""
+    return segment.get('label', segment['title'])
+
+def address_segments(address_filters):
+    """
+    Segments for generate_report's address_filters: {'filter': {}} is the whole market,
+    {'filter': {'address': 'Other'}} is every address not named elsewhere in the same set.
+    """
+    named = [f['filter']['address'] for f in address_filters if f.get('filter', {}).get('address') not in (None, 'Other')]
+    segments = []
+    for address_filter in address_filters:
+        address = address_filter.get('filter', {}).get('address')
+        if address is None:
+            segment = {'title': address_filter['name'], 'require': {}}
+        elif address == 'Other':
+            segment = {'title': address_filter['name'], 'exclude_addresses': named}
+        else:
+            segment = {'title': address_filter['name'], 'addresses': [address]}
+        segment['label'] = json.dumps({key: value for key, value in segment.items() if key != 'title'}, sort_keys=True)
+        segments.append(segment)
+    return segments
+
+def segment_matches_all(segment):
+    """Whether a segment spec filters nothing (e.g. {'require': {}}), i.e. is the whole frame"""
+    if 'filter_func' in segment or any(key in segment for key in ('areas', 'no_fee', 'addresses')):
+        return False
+    return not segment.get('require') and not segment.get('exclude_addresses')
+
+def apply_segment(df, segment):
+    """Rows of df in a segment; legacy {'filter_func': callable} definitions are still accepted"""
+    if 'filter_func' in segment:
+        return segment['filter_func'](df)
+    return df[segment_mask(df, segment)]
 
 def get_streeteasy_data():
     """Fetch StreetEasy data from database"""
@@ -43,7 +174,7 @@ def get_streeteasy_data():
         
         if response_data and response_data.get('status') == 'success':
             data = response_data.get('data', [])
-            return pd.DataFrame(data)
+            return typed_streeteasy_frame(data)
         else:
             return pd.DataFrame()
             
@@ -51,18 +182,34 @@ def get_streeteasy_data():
         print(f"Error fetching StreetEasy data: {e}")
         return pd.DataFrame()
 
-def create_comp_data(df):
-    
-    comp_data = df.copy()
+def typed_streeteasy_frame(records):
+    """StreetEasy rows as a DataFrame with STREETEASY_DTYPES applied ('' and unparseable values -> missing)"""
+    df = pd.DataFrame(records)
+    for col, dtype in STREETEASY_DTYPES.items():
+        if col not in df.columns:
+            continue
+        values = df[col].replace('', None)
+        if dtype == 'category':
+            df[col] = values.astype('category')
+        elif dtype.startswith('datetime'):
+            df[col] = pd.to_datetime(values, errors='coerce', format='ISO8601')
+        elif dtype == 'Int8':
+            df[col] = pd.to_numeric(values, errors='coerce').round().astype(dtype)
+        else:
+            df[col] = pd.to_numeric(values, errors='coerce').astype(dtype)
+    return df
 
-    comp_data = comp_data[comp_data['bedrooms'] != '']
-   
-    # Filter: bedrooms <= 4
-    if 'bedrooms' in comp_data.columns:
-        before_count = len(comp_data)
-        comp_data = comp_data[comp_data['bedrooms'].astype(float) <= 4]
-        print(f"COMP DEBUG: After bedrooms <= 4 filter: {len(comp_data)} rows (removed {before_count - len(comp_data)})")
+def create_comp_data(df):
+    """Comp rows (bedrooms 0-4) with bedrooms as int8; returns a new frame, df is left as is"""
+    # Filter: bedrooms <= 4 (rows with no bedrooms are dropped as well)
+    if 'bedrooms' in df.columns:
+        bedrooms = pd.to_numeric(df['bedrooms'].replace('', None), errors='coerce')
+        keep = np.flatnonzero((bedrooms.notna() & (bedrooms <= 4)).to_numpy(dtype=bool))
+        comp_data = df.take(keep)  # take() is the one copy; it isn't flagged as a view of df
+        comp_data['bedrooms'] = bedrooms.take(keep).astype('int8')
+        print(f"COMP DEBUG: After bedrooms <= 4 filter: {len(comp_data)} rows (removed {len(df) - len(comp_data)})")
     else:
+        comp_data = df.copy()
         print("COMP DEBUG: Warning - 'bedrooms' column not found")
     
     # # Filter 1: is_no_fee = 1
@@ -184,7 +331,7 @@ def process_streeteasy_rent_history(comp_data):
    
     # Create date range (last 14 months)
     end_date = datetime.now().date()
-    start_date = end_date - timedelta(days=425)  # ~14 months
+    start_date = end_date - timedelta(days=RENT_HISTORY_DAYS)
     date_range = pd.date_range(start_date, end_date, freq='D')
     print(f"RENT DEBUG: Target date range: {start_date} to {end_date}, {len(date_range)} days")
     
@@ -200,7 +347,7 @@ def process_streeteasy_rent_history(comp_data):
         return pd.DataFrame()
     
     # Group by date and bedroom, taking average price for each day/bedroom combination
-    daily_averages = valid_data.groupby(['date', 'bedrooms'])['listed_price'].mean().reset_index()
+    daily_averages = valid_data['listed_price'].astype('float64').groupby([valid_data['date'], valid_data['bedrooms']]).mean().reset_index()
     
     print(f"RENT DEBUG: Daily averages: {len(daily_averages)} records")
     
@@ -233,66 +380,25 @@ def create_price_chart(rent_df, bedroom_filter=[0, 1, 2, 3], title="Weekly Rent
     if not available_bedrooms:
         return "<div>No data available for selected bedroom counts</div>"
     
-    # Create matplotlib figure
-    plt.style.use('default')
-    fig, ax = plt.subplots(figsize=(20, 6))  # Increased width to 20 for 100% page width
-    
-    # Color palette for different bedroom counts
-    colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b']
-    
-    traces_added = 0
-    for i, bedrooms in enumerate(sorted(available_bedrooms)):
+    series = []
+    for bedrooms in sorted(available_bedrooms):
         bedroom_data = weekly_df[bedrooms].dropna()
         
         if bedroom_data.empty:
             continue
             
-        bedroom_label = f"Studio" if bedrooms == 0 else f"{int(bedrooms)} BR"
-        
-        ax.plot(bedroom_data.index, bedroom_data.values, 
-                color=colors[i % len(colors)], 
-                linewidth=2, 
-                marker='o', 
-                markersize=4,
-                label=bedroom_label)
-        traces_added += 1
+        series.append({
+            'label': f"Studio" if bedrooms == 0 else f"{int(bedrooms)} BR",
+            'dates': [d.isoformat() for d in bedroom_data.index],
+            'values': [float(v) for v in bedroom_data.values],
+        })
     
-    if traces_added == 0:
+    if not series:
         return "<div>No valid data found for chart generation</div>"
     
-    # Customize the chart
-    ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
-    ax.set_xlabel('Date', fontsize=12)
-    ax.set_ylabel('Average Rent ($)', fontsize=12)
-    
-    # Format y-axis to show currency
-    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:,.0f}'))
-    
-    # Format x-axis dates - show month names and years
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%b'))
-    ax.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
-    
-    # Add grid
-    ax.grid(True, alpha=0.3, linestyle='--')
-    
-    # Add legend
-    ax.legend(loc='upper right', frameon=True, fancybox=True, shadow=True, fontsize=10)
-    
-    # Adjust layout
-    plt.tight_layout()
-    
+    spec = {'kind': 'price_trends', 'title': title, 'series': series, 'style': CHART_STYLES['price_trends']}
     try:
-        # Save to bytes buffer
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight', 
-                   facecolor='white', edgecolor='none')
-        img_buffer.seek(0)
-        
-        # Convert to base64
-        img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
-        
-        # Close the plot to free memory
-        plt.close(fig)
+        img_base64 = chart_base64(spec)
         
         # Create simple HTML with embedded image
         chart_html = f'''<img src="data:image/png;base64,{img_base64}" alt="{title}" style="width: 100%; height: auto; max-width: 100%; display: block;">'''
@@ -300,132 +406,68 @@ def create_price_chart(rent_df, bedroom_filter=[0, 1, 2, 3], title="Weekly Rent
         return chart_html
         
     except Exception as e:
-        plt.close(fig)
         return f"<div>Chart error: {str(e)}</div>"
 
-def get_comparison_tables(comp_data, custom_filters=None):
-    """
-    Generate comparison tables with dynamic filtering
-    
-    Args:
-        comp_data: Base filtered dataset 
-        custom_filters: List of filter definitions, each with 'title' and 'filter_func'
-                       If None, creates default amenities-based filters
-    """
-    def generate_table_rows(df):
-        if 'bedrooms' not in df.columns or df.empty:
-            return []
-        grouped = df.groupby('bedrooms')
-        table_rows = []
-        for bedrooms, group in grouped:
-            try:
-                # Handle both old and new column names
-                price_col = 'current_listed_price' if 'current_listed_price' in group.columns else 'listed_price'
-                avg_price = group[price_col].mean()
-                avg_sqft = group['size_sqft'].mean()
-                avg_ppsf = group['ppsf'].mean()
-                count = len(group)
-                row = {
-                    'Market': int(bedrooms) if pd.notnull(bedrooms) else '-',
-                    'Avg Price': f"${avg_price:,.0f}" if pd.notnull(avg_price) else '-',
-                    'Avg SqFt': f"{avg_sqft:,.0f}" if pd.notnull(avg_sqft) else '-',
-                    'Avg PSf': f"${avg_ppsf:,.2f}" if pd.notnull(avg_ppsf) and np.isfinite(avg_ppsf) else '-',
-                    'Count': int(count) if pd.notnull(count) else '-',
-                }
-            except Exception:
-                row = {'Market': bedrooms, 'Avg Price': '-', 'Avg SqFt': '-', 'Avg PSf': '-', 'Count': '-'}
-            table_rows.append(row)
-        table_rows = sorted(table_rows, key=lambda x: (x['Market'] if isinstance(x['Market'], int) else 99))
-        return table_rows
-
-    def add_variance_columns(filtered_rows, market_rows):
-        market_map = {row['Market']: row for row in market_rows}
-        for row in filtered_rows:
-            m = market_map.get(row['Market'])
-            if not m or m['Avg Price'] in ('-', 0) or row['Avg Price'] in ('-', 0):
-                row['Price Variance'] = '-'
-                row['Avg SqFt Var'] = '-'
-                row['Avg PSf Var'] = '-'
-                continue
-            def pct(var, base):
-                try:
-                    return f"{((var-base)/base)*100:+.2f}%"
-                except Exception:
-                    return '-'
-            def to_num(s): return float(str(s).replace('$','').replace(',','')) if s not in ('-', None) else 0
-            row['Price Variance'] = pct(to_num(row['Avg Price']), to_num(m['Avg Price']))
-            row['Avg SqFt Var'] = pct(to_num(row['Avg SqFt']), to_num(m['Avg SqFt']))
-            row['Avg PSf Var'] = pct(to_num(row['Avg PSf']), to_num(m['Avg PSf']))
-        return filtered_rows
+def bedroom_stats(df):
+    """Average price, sqft and PPSF plus listing count per bedroom count, for one segment's rows"""
+    if 'bedrooms' not in df.columns or df.empty:
+        return pd.DataFrame(columns=['avg_price', 'avg_sqft', 'avg_ppsf', 'count'])
+    # Handle both old and new column names
+    price_col = 'current_listed_price' if 'current_listed_price' in df.columns else 'listed_price'
+    grouped = df.groupby('bedrooms')
+    return pd.DataFrame({
+        'avg_price': grouped[price_col].mean(),
+        'avg_sqft': grouped['size_sqft'].mean(),
+        'avg_ppsf': grouped['ppsf'].mean(),
+        'count': grouped.size(),
+    })
 
-    # Create default amenities-based filters if none provided
-    if custom_filters is None:
-        # Debug: Print all unique amenities in alphabetical order
-        amenities_col = 'amenities' if 'amenities' in comp_data.columns else 'building_amenities'
-        if amenities_col in comp_data.columns:
-            all_amenities = set()
-            for amenities_str in comp_data[amenities_col].dropna():
-                if isinstance(amenities_str, str):
-                    amenities_list = [amenity.strip().lower() for amenity in amenities_str.split(',')]
-                    all_amenities.update(amenities_list)
-            sorted_amenities = sorted(all_amenities)
-            print(f"DEBUG: All unique amenities (alphabetical): {', '.join(sorted_amenities)}")
-        else:
-            print(f"DEBUG: {amenities_col} column not found in comp_data")
-        
-        def has_outdoor_no_laundry_unit(amenities_str):
-            """Has balcony or terrace, but NOT washer_dryer"""
-            if pd.isna(amenities_str):
-                return False
-            amenities_str = str(amenities_str).lower()
-            has_outdoor = 'balcony' in amenities_str or 'terrace' in amenities_str
-            has_laundry_unit = 'washer_dryer' in amenities_str
-            return has_outdoor and not has_laundry_unit
-        
-        def has_laundry_unit_no_outdoor(amenities_str):
-            """Has washer_dryer, but NOT balcony or terrace"""
-            if pd.isna(amenities_str):
-                return False
-            amenities_str = str(amenities_str).lower()
-            has_outdoor = 'balcony' in amenities_str or 'terrace' in amenities_str
-            has_laundry_unit = 'washer_dryer' in amenities_str
-            return has_laundry_unit and not has_outdoor
-        
-        def has_both_outdoor_and_laundry_unit(amenities_str):
-            """Has both (balcony or terrace) AND washer_dryer"""
-            if pd.isna(amenities_str):
-                return False 
-            amenities_str = str(amenities_str).lower()
-            has_outdoor = 'balcony' in amenities_str or 'terrace' in amenities_str
-            has_laundry_unit = 'washer_dryer' in amenities_str
-            return has_outdoor and has_laundry_unit
-        
-        # Determine which amenities column to use
-        amenities_col = 'amenities' if 'amenities' in comp_data.columns else 'building_amenities'
-        
-        custom_filters = [
-            {
-                'title': 'Comp Data (No Fee + Building Amenities)', 
-                'filter_func': lambda df: df  # No additional filtering - use comp_data as is
-            },
-            {
-                'title': 'Outdoor Space w/o Laundry in Unit',
-                'filter_func': lambda df: df[df[amenities_col].apply(has_outdoor_no_laundry_unit)] if amenities_col in df.columns else df.iloc[0:0]
-            },
-            {
-                'title': 'Laundry in Unit w/o Outdoor Space', 
-                'filter_func': lambda df: df[df[amenities_col].apply(has_laundry_unit_no_outdoor)] if amenities_col in df.columns else df.iloc[0:0]
-            },
-            {
-                'title': 'Outdoor Space + Laundry in Unit',
-                'filter_func': lambda df: df[df[amenities_col].apply(has_both_outdoor_and_laundry_unit)] if amenities_col in df.columns else df.iloc[0:0]
+def comparison_table_rows(stats):
+    """Formatted comparison table rows from bedroom_stats (or the same columns from the market cube)"""
+    table_rows = []
+    for bedrooms, avg_price, avg_sqft, avg_ppsf, count in zip(stats.index, stats['avg_price'], stats['avg_sqft'], stats['avg_ppsf'], stats['count']):
+        try:
+            row = {
+                'Market': int(bedrooms) if pd.notnull(bedrooms) else '-',
+                'Avg Price': f"${avg_price:,.0f}" if pd.notnull(avg_price) else '-',
+                'Avg SqFt': f"{avg_sqft:,.0f}" if pd.notnull(avg_sqft) else '-',
+                'Avg PSf': f"${avg_ppsf:,.2f}" if pd.notnull(avg_ppsf) and np.isfinite(avg_ppsf) else '-',
+                'Count': int(count) if pd.notnull(count) else '-',
             }
-        ]
+        except Exception:
+            row = {'Market': bedrooms, 'Avg Price': '-', 'Avg SqFt': '-', 'Avg PSf': '-', 'Count': '-'}
+        table_rows.append(row)
+    table_rows = sorted(table_rows, key=lambda x: (x['Market'] if isinstance(x['Market'], int) else 99))
+    return table_rows
 
+def add_variance_columns(filtered_rows, market_rows):
+    market_map = {row['Market']: row for row in market_rows}
+    for row in filtered_rows:
+        m = market_map.get(row['Market'])
+        if not m or m['Avg Price'] in ('-', 0) or row['Avg Price'] in ('-', 0):
+            row['Price Variance'] = '-'
+            row['Avg SqFt Var'] = '-'
+            row['Avg PSf Var'] = '-'
+            continue
+        def pct(var, base):
+            try:
+                return f"{((var-base)/base)*100:+.2f}%"
+            except Exception:
+                return '-'
+        def to_num(s): return float(str(s).replace('$','').replace(',','')) if s not in ('-', None) else 0
+        row['Price Variance'] = pct(to_num(row['Avg Price']), to_num(m['Avg Price']))
+        row['Avg SqFt Var'] = pct(to_num(row['Avg SqFt']), to_num(m['Avg SqFt']))
+        row['Avg PSf Var'] = pct(to_num(row['Avg PSf']), to_num(m['Avg PSf']))
+    return filtered_rows
+
+def build_comparison_tables(custom_filters, segment_stats):
+    """
+    Comparison tables for a list of segments; segment_stats(segment) returns that segment's
+    bedroom_stats. The first segment is the baseline the others get variance columns against.
+    """
     # Generate the first table (baseline - usually comp_data with no additional filtering)
     baseline_filter = custom_filters[0]
-    baseline_data = baseline_filter['filter_func'](comp_data)
-    market_rows = generate_table_rows(baseline_data)
+    market_rows = comparison_table_rows(segment_stats(baseline_filter))
     
     tables = [{
         'title': baseline_filter['title'],
@@ -436,10 +478,7 @@ def get_comparison_tables(comp_data, custom_filters=None):
     # Generate remaining tables with variance columns
     for filter_def in custom_filters[1:]:
         try:
-            filtered_data = filter_def['filter_func'](comp_data)
-            print(f"COMP DEBUG: {filter_def['title']} filtered to {len(filtered_data)} rows")
-            
-            rows = generate_table_rows(filtered_data)
+            rows = comparison_table_rows(segment_stats(filter_def))
             rows = add_variance_columns(rows, market_rows)
             
             tables.append({
@@ -458,11 +497,136 @@ def get_comparison_tables(comp_data, custom_filters=None):
     
     return tables
 
-def get_weekly_trends(comp_data, title="Weekly Rent Price Trends", bedroom_filter=None):
+def get_comparison_tables(comp_data, custom_filters=None):
+    """
+    Generate comparison tables with dynamic filtering
+    
+    Args:
+        comp_data: Base filtered dataset 
+        custom_filters: List of segment definitions, each with 'title' and 'require'
+                       (see AMENITY_SEGMENTS) or a legacy 'filter_func'.
+                       If None, uses AMENITY_SEGMENTS
+    """
+    # Create default amenities-based filters if none provided
+    if custom_filters is None:
+        # Debug: Print all unique amenities in alphabetical order
+        amenities_col = 'amenities' if 'amenities' in comp_data.columns else 'building_amenities'
+        if amenities_col in comp_data.columns:
+            all_amenities = set()
+            for amenities_str in comp_data[amenities_col].dropna():
+                if isinstance(amenities_str, str):
+                    amenities_list = [amenity.strip().lower() for amenity in amenities_str.split(',')]
+                    all_amenities.update(amenities_list)
+            sorted_amenities = sorted(all_amenities)
+            print(f"DEBUG: All unique amenities (alphabetical): {', '.join(sorted_amenities)}")
+        else:
+            print(f"DEBUG: {amenities_col} column not found in comp_data")
+        
+        custom_filters = AMENITY_SEGMENTS
+
+    def segment_stats(filter_def):
+        filtered_data = apply_segment(comp_data, filter_def)
+        if filter_def is not custom_filters[0]:
+            print(f"COMP DEBUG: {filter_def['title']} filtered to {len(filtered_data)} rows")
+        return bedroom_stats(filtered_data)
+
+    return build_comparison_tables(custom_filters, segment_stats)
+
+def label_segments(comp_data, segments=None, baseline='all'):
+    """
+    Stack the rows of every segment (plus the whole frame as `baseline`) with a 'segment'
+    label column; a listing in several segments appears once per segment. Segments that
+    filter nothing are not stacked again: attrs['segment_aliases'] maps them to `baseline`.
+    """
+    if segments is None:
+        segments = AMENITY_SEGMENTS
+    columns = [col for col in ['listed_price', 'created_at', 'bedrooms'] if col in comp_data.columns]
+    frames = [comp_data[columns].assign(segment=baseline)]
+    aliases = {}
+    for label, segment in {segment_label(segment): segment for segment in segments}.items():
+        if segment_matches_all(segment):
+            aliases[label] = baseline
+            continue
+        frames.append(apply_segment(comp_data, segment)[columns].assign(segment=label))
+    labelled = pd.concat(frames, ignore_index=True)
+    # Categorical so empty segments are still known to the rent history
+    labels = list(dict.fromkeys([baseline] + [segment_label(segment) for segment in segments]))
+    labelled['segment'] = pd.Categorical(labelled['segment'], categories=labels)
+    labelled.attrs['segment_aliases'] = aliases
+    return labelled
+
+def process_segment_rent_history(labelled_data, segment_col='segment'):
+    """
+    process_streeteasy_rent_history for every segment at once: one groupby over
+    (date, segment, bedrooms) and one RENT_HISTORY_DAYS reindex. Columns are (segment, bedrooms);
+    slice a segment out with segment_rent_history.
+    """
+    labels = []
+    if segment_col in labelled_data.columns:
+        segment_labels = labelled_data[segment_col]
+        labels = list(segment_labels.cat.categories if isinstance(segment_labels.dtype, pd.CategoricalDtype) else pd.unique(segment_labels))
+    if not all(col in labelled_data.columns for col in ['listed_price', 'created_at', 'bedrooms']):
+        print("RENT DEBUG: Missing required columns: listed_price, created_at, or bedrooms")
+        return pd.DataFrame()
+
+    created_at = pd.to_datetime(labelled_data['created_at'])
+    valid = (
+        labelled_data['listed_price'].notna() &
+        (labelled_data['listed_price'] > 0) &
+        labelled_data['bedrooms'].notna() &
+        created_at.notna()
+    )
+
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=RENT_HISTORY_DAYS)
+    dates = created_at.dt.normalize()
+    valid &= (dates >= pd.Timestamp(start_date)) & (dates <= pd.Timestamp(end_date))
+
+    # Prices are stored as float32; the daily averages are taken in float64
+    valid_data = labelled_data.loc[valid, [segment_col, 'bedrooms', 'listed_price']].assign(
+        date=dates[valid], listed_price=labelled_data.loc[valid, 'listed_price'].astype('float64'))
+    if valid_data.empty:
+        print("RENT DEBUG: No data in target date range")
+        pivot_data = pd.DataFrame()
+        pivot_data.attrs['segments'] = labels
+        pivot_data.attrs['segment_aliases'] = labelled_data.attrs.get('segment_aliases', {})
+        return pivot_data
+
+    daily_averages = valid_data.groupby(['date', segment_col, 'bedrooms'], observed=True)['listed_price'].mean()
+    pivot_data = daily_averages.unstack([segment_col, 'bedrooms'])
+
+    pivot_data = pivot_data.reindex(pd.date_range(start_date, end_date, freq='D')).ffill()
+    pivot_data.index.name = 'date'
+    pivot_data.attrs['segments'] = labels
+    pivot_data.attrs['segment_aliases'] = labelled_data.attrs.get('segment_aliases', {})
+
+    print(f"RENT DEBUG: Segment rent history {pivot_data.shape} for {len(labels)} segments")
+    return pivot_data
+
+def segment_rent_history(rent_history, label):
+    """
+    One segment's date x bedrooms price frame (the process_streeteasy_rent_history shape),
+    or None when rent_history wasn't computed for that label.
+    """
+    if label not in rent_history.attrs.get('segments', []):
+        return None
+    label = rent_history.attrs.get('segment_aliases', {}).get(label, label)
+    if rent_history.empty or label not in rent_history.columns.get_level_values(0):
+        return pd.DataFrame()
+    history = rent_history[label].dropna(axis=1, how='all')
+    return history[sorted(history.columns)]
+
+def report_rent_history(comp_data, segments=None):
+    """Rent history for the whole comp frame ('all') and each amenity segment, computed once per report"""
+    return process_segment_rent_history(label_segments(comp_data, segments))
+
+def get_weekly_trends(comp_data, title="Weekly Rent Price Trends", bedroom_filter=None, rent_history=None):
     if bedroom_filter is None:
         bedroom_filter = [0, 1, 2, 3]
         
-    rent_df = process_streeteasy_rent_history(comp_data)
+    rent_df = segment_rent_history(rent_history, 'all') if rent_history is not None else None
+    if rent_df is None:
+        rent_df = process_streeteasy_rent_history(comp_data)
     if 'date' not in rent_df.columns:
         rent_df = rent_df.reset_index()
     rent_df = rent_df.sort_values('date')
@@ -514,138 +678,108 @@ def get_weekly_trends(comp_data, title="Weekly Rent Price Trends", bedroom_filte
             else:
                 color_map[(row['Bed'], w)] = 'wow-na'
 
-    # --- Generate clean line chart (unchanged) ---
-    plt.style.use('default')
-    fig, ax = plt.subplots(figsize=(20, 6))
-    colors = ['#7FB3D3', '#5B9BD5', '#4472C4', '#2F528F']
-    for i, bed in enumerate(available_bedrooms):
-        if bed in rent_df.columns:
-            x_data = rent_df['date']
-            y_data = rent_df[bed]
-            ax.plot(x_data, y_data, 
-                   color=colors[i % len(colors)], 
-                   linewidth=3, 
-                   marker='o', 
-                   markersize=6,
-                   label=bed_labels.get(bed, str(bed)),
-                   markerfacecolor=colors[i % len(colors)],
-                   markeredgecolor='white',
-                   markeredgewidth=1)
-            for x, y in zip(x_data, y_data):
-                if pd.notnull(y):
-                    ax.annotate(f"${y:,.0f}", 
-                               (x, y), 
-                               textcoords="offset points", 
-                               xytext=(0, 6), 
-                               ha='center', 
-                               fontsize=8, 
-                               color=colors[i % len(colors)],
-                               fontweight='bold')
-    ax.set_xlabel('')
-    ax.set_ylabel('')
-    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:,.0f}'))
-    ax.tick_params(axis='y', labelsize=10, colors='#666666')
-    ax.set_xticks(rent_df['date'])
-    ax.set_xticklabels([d.strftime('%b-%d') for d in rent_df['date']], 
-                       fontsize=10, 
-                       color='#666666',
-                       rotation=0)
-    ax.grid(True, alpha=0.3, linestyle='-', linewidth=0.5, color='#E5E5E5')
-    ax.set_axisbelow(True)
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    ax.spines['left'].set_color('#E5E5E5')
-    ax.spines['bottom'].set_color('#E5E5E5')
-    ax.set_facecolor('white')
-    fig.patch.set_facecolor('white')
-    legend = ax.legend(loc='center left', 
-                      bbox_to_anchor=(1.01, 0.5),
-                      frameon=False, 
-                      fontsize=10,
-                      labelcolor='#333333')
-    plt.subplots_adjust(right=0.88)
-    plt.tight_layout()
-    OUTPUT_DIR = os.path.join(os.path.dirname(__file__), 'output')
-    chart_path = os.path.join(OUTPUT_DIR, 'weekly_trends_chart.png')
-    fig.savefig(chart_path, format='png', bbox_inches='tight', facecolor='white', dpi=150)
-    plt.close(fig)
+    # --- Line chart, rendered (or reused) by the chart service ---
+    chart_spec = {
+        'kind': 'weekly_trends',
+        'dates': [d.isoformat() for d in rent_df['date']],
+        'series': [
+            {'label': bed_labels.get(bed, str(bed)), 'values': [None if pd.isnull(y) else float(y) for y in rent_df[bed]]}
+            for bed in available_bedrooms
+        ],
+        'style': CHART_STYLES['weekly_trends'],
+    }
+    chart_path = render_chart(chart_spec)
 
     return {
         'table_rows': table_rows,
         'week_cols': week_cols,
         'table_columns': ['Bed'] + week_cols + ['Avg WoW'],
-        'chart_path': 'weekly_trends_chart.png',
+        'chart_path': chart_path,
         'chart_title': title,
         'bedroom_filter': available_bedrooms,
         'color_map': color_map
     }
 
-def get_ytd_ppsf_data(comp_data, custom_filters=None):
+def daily_ppsf_records(historical_df, filtered_comp_data):
+    """
+    Long frame of daily PPSF (date, year, month, bedrooms, price, sqft, ppsf) for one segment.
+
+    historical_df is the date x bedrooms price pivot from process_streeteasy_rent_history;
+    each bedroom's price is divided by that bedroom type's average sqft in the segment.
+    """
+    avg_sqft = filtered_comp_data.groupby('bedrooms')['size_sqft'].mean()
+    avg_sqft = avg_sqft[avg_sqft.index.isin([0, 1, 2, 3, 4]) & avg_sqft.notnull() & (avg_sqft > 0)]
+
+    bedroom_cols = [col for col in historical_df.columns if isinstance(col, (int, float)) and col in avg_sqft.index]
+    long_df = (
+        historical_df[bedroom_cols]
+        .rename_axis('date')
+        .reset_index()
+        .melt(id_vars='date', var_name='bedrooms', value_name='price')
+    )
+    long_df = long_df[long_df['price'].notnull() & (long_df['price'] > 0)]
+    long_df['date'] = pd.to_datetime(long_df['date'])
+    long_df['year'] = long_df['date'].dt.year
+    long_df['month'] = long_df['date'].dt.month
+    long_df['sqft'] = long_df['bedrooms'].map(avg_sqft)
+    long_df['ppsf'] = long_df['price'] / long_df['sqft']
+    return long_df[['date', 'year', 'month', 'bedrooms', 'price', 'sqft', 'ppsf']]
+
+def monthly_ppsf_by_segment(segment_ppsf):
+    """Mean PPSF per (segment, year, month) across all bedrooms and days, for every segment at once"""
+    if not segment_ppsf:
+        return pd.Series(dtype=float, index=pd.MultiIndex.from_arrays([[], [], []], names=['segment', 'year', 'month']))
+    ppsf_df = pd.concat(segment_ppsf, ignore_index=True)
+    return ppsf_df.groupby(['segment', 'year', 'month'])['ppsf'].mean()
+
+def get_ytd_ppsf_data(comp_data, custom_filters=None, rent_history=None):
     """
     Generate YTD PPSF data for 4 charts using historical price data from comp_data
     
     Args:
         comp_data: Filtered StreetEasy data (no fee + required amenities)
-        custom_filters: List of filter definitions, each with 'title' and 'filter_func'
-                       If None, uses same default amenities-based filters as comparison tables
+        custom_filters: List of segment definitions (see get_comparison_tables)
+                       If None, uses AMENITY_SEGMENTS like the comparison tables
+        rent_history: Optional report_rent_history result; segments found in it are
+                      sliced out instead of recomputed
+    """
+    # Same segments as the comparison tables
+    if custom_filters is None:
+        custom_filters = AMENITY_SEGMENTS
+
+    # Daily PPSF for every segment, stacked with a segment number, then one groupby for all months
+    segment_ppsf = []
+    for i, filter_def in enumerate(custom_filters):
+        try:
+            filtered_comp_data = apply_segment(comp_data, filter_def)
+            print(f"YTD PPSF DEBUG: {filter_def['title']} filtered to {len(filtered_comp_data)} rows")
+            if filtered_comp_data.empty:
+                continue
+
+            historical_df = segment_rent_history(rent_history, segment_label(filter_def)) if rent_history is not None else None
+            if historical_df is None:
+                historical_df = process_streeteasy_rent_history(filtered_comp_data)
+            if historical_df.empty:
+                continue
+
+            ppsf_df = daily_ppsf_records(historical_df, filtered_comp_data)
+            ppsf_df['segment'] = i
+            segment_ppsf.append(ppsf_df)
+        except Exception as e:
+            print(f"Error processing filter '{filter_def['title']}': {e}")
+
+    return ytd_ppsf_charts(monthly_ppsf_by_segment(segment_ppsf), custom_filters)
+
+def ytd_ppsf_charts(monthly_ppsf, custom_filters):
+    """
+    Current vs prior year PPSF chart and table per segment from a (segment number, year, month)
+    PPSF series (monthly_ppsf_by_segment, or market_cube.cube_monthly_ppsf)
     """
     this_year = datetime.now().year
     last_year = this_year - 1
     months = [month_abbr[m] for m in range(1, datetime.now().month+1)]
-    
-    # Create default amenities-based filters if none provided (same as comparison tables)
-    if custom_filters is None:
-        def has_outdoor_no_laundry_unit(amenities_str):
-            """Has balcony or terrace, but NOT washer_dryer"""
-            if pd.isna(amenities_str):
-                return False
-            amenities_str = str(amenities_str).lower()
-            has_outdoor = 'balcony' in amenities_str or 'terrace' in amenities_str
-            has_laundry_unit = 'washer_dryer' in amenities_str
-            return has_outdoor and not has_laundry_unit
-        
-        def has_laundry_unit_no_outdoor(amenities_str):
-            """Has washer_dryer, but NOT balcony or terrace"""
-            if pd.isna(amenities_str):
-                return False
-            amenities_str = str(amenities_str).lower()
-            has_outdoor = 'balcony' in amenities_str or 'terrace' in amenities_str
-            has_laundry_unit = 'washer_dryer' in amenities_str
-            return has_laundry_unit and not has_outdoor
-        
-        def has_both_outdoor_and_laundry_unit(amenities_str):
-            """Has both (balcony or terrace) AND washer_dryer"""
-            if pd.isna(amenities_str):
-                return False
-            amenities_str = str(amenities_str).lower()
-            has_outdoor = 'balcony' in amenities_str or 'terrace' in amenities_str
-            has_laundry_unit = 'washer_dryer' in amenities_str
-            return has_outdoor and has_laundry_unit
-        
-        # Determine which amenities column to use
-        amenities_col = 'amenities' if 'amenities' in comp_data.columns else 'building_amenities'
-        
-        custom_filters = [
-            {
-                'title': 'Comp Data (No Fee + Building Amenities)', 
-                'filter_func': lambda df: df  # No additional filtering - use comp_data as is
-            },
-            {
-                'title': 'Outdoor Space w/o Laundry in Unit',
-                'filter_func': lambda df: df[df[amenities_col].apply(has_outdoor_no_laundry_unit)] if amenities_col in df.columns else df.iloc[0:0]
-            },
-            {
-                'title': 'Laundry in Unit w/o Outdoor Space', 
-                'filter_func': lambda df: df[df[amenities_col].apply(has_laundry_unit_no_outdoor)] if amenities_col in df.columns else df.iloc[0:0]
-            },
-            {
-                'title': 'Outdoor Space + Laundry in Unit',
-                'filter_func': lambda df: df[df[amenities_col].apply(has_both_outdoor_and_laundry_unit)] if amenities_col in df.columns else df.iloc[0:0]
-            }
-        ]
 
     charts_data = []
-    
     for i, filter_def in enumerate(custom_filters):
         chart_info = {
             'title': filter_def['title'],
@@ -653,91 +787,21 @@ def get_ytd_ppsf_data(comp_data, custom_filters=None):
             'table_rows': [],
             'months': months
         }
-        
-        # Apply the filter to get filtered dataset FIRST
-        try:
-            filtered_comp_data = filter_def['filter_func'](comp_data)
-            print(f"YTD PPSF DEBUG: {filter_def['title']} filtered to {len(filtered_comp_data)} rows")
-            
-            if filtered_comp_data.empty:
-                chart_info['chart_path'] = None
-                charts_data.append(chart_info)
-                continue
-            
-            # NOW process historical rent data for this specific filtered dataset
-            historical_df = process_streeteasy_rent_history(filtered_comp_data)
-            if historical_df.empty:
-                chart_info['chart_path'] = None
-                charts_data.append(chart_info)
-                continue
-            
-            # Reset index to make date a column
-            if 'date' not in historical_df.columns:
-                historical_df = historical_df.reset_index()
-            
-            # Add year/month columns to historical data
-            historical_df['year'] = historical_df['date'].dt.year
-            historical_df['month'] = historical_df['date'].dt.month
-            
-            # Convert historical rent data to PPSF data for this specific filter
-            ppsf_records = []
-            for idx, row in historical_df.iterrows():
-                date = row['date']
-                year = row['year']
-                month = row['month']
-                
-                for bed_col in historical_df.columns:
-                    if isinstance(bed_col, (int, float)) and bed_col in [0, 1, 2, 3, 4]:  # bedroom columns
-                        price = row[bed_col]
-                        if pd.notnull(price) and price > 0:
-                            # Use average sqft by bedroom type from current filtered listings
-                            bed_data = filtered_comp_data[filtered_comp_data['bedrooms'] == bed_col]
-                            if not bed_data.empty:
-                                avg_sqft = bed_data['size_sqft'].mean()
-                                if pd.notnull(avg_sqft) and avg_sqft > 0:
-                                    ppsf = price / avg_sqft
-                                    ppsf_records.append({
-                                        'date': date,
-                                        'year': year,
-                                        'month': month,
-                                        'bedrooms': bed_col,
-                                        'price': price,
-                                        'sqft': avg_sqft,
-                                        'ppsf': ppsf
-                                    })
-            
-            if not ppsf_records:
-                chart_info['chart_path'] = None
-                charts_data.append(chart_info)
-                continue
-            
-            ppsf_df = pd.DataFrame(ppsf_records)
-            
-        except Exception as e:
-            print(f"Error processing filter '{filter_def['title']}': {e}")
+
+        if i not in monthly_ppsf.index.get_level_values('segment'):
             chart_info['chart_path'] = None
             charts_data.append(chart_info)
             continue
-        
+
         # Generate chart data - aggregate all bedrooms for each dataset
         chart_data = {}
         table_rows = []
-        
-        # Current year and prior year data
-        current_year_data = []
-        prior_year_data = []
-        
-        for month in range(1, datetime.now().month + 1):
-            # Current year - properly average all PPSF values for the month
-            current_data = ppsf_df[(ppsf_df['year'] == this_year) & (ppsf_df['month'] == month)]
-            current_ppsf = current_data['ppsf'].mean()
-            current_year_data.append(current_ppsf if pd.notnull(current_ppsf) else np.nan)
-            
-            # Prior year - properly average all PPSF values for the month  
-            prior_data = ppsf_df[(ppsf_df['year'] == last_year) & (ppsf_df['month'] == month)]
-            prior_ppsf = prior_data['ppsf'].mean()
-            prior_year_data.append(prior_ppsf if pd.notnull(prior_ppsf) else np.nan)
-        
+
+        # Current year and prior year data, one value per month so far
+        month_numbers = range(1, datetime.now().month + 1)
+        current_year_data = [monthly_ppsf.get((i, this_year, month), np.nan) for month in month_numbers]
+        prior_year_data = [monthly_ppsf.get((i, last_year, month), np.nan) for month in month_numbers]
+
         # Store chart data
         chart_data['all_current'] = current_year_data
         chart_data['all_prior'] = prior_year_data
@@ -769,197 +833,80 @@ def get_ytd_ppsf_data(comp_data, custom_filters=None):
                 variance_row[month] = '-'
         table_rows.append(variance_row)
         
-        # Generate chart image with value labels
-        chart_path = generate_ppsf_chart_with_labels(chart_data, months, f"{filter_def['title']}_{i+1}", this_year, last_year)
-        chart_info['chart_path'] = chart_path
+        # Chart image is rendered below, together with the other segments
+        chart_info['chart_spec'] = ppsf_chart_spec(chart_data, months, this_year, last_year)
         chart_info['table_rows'] = table_rows
         
         charts_data.append(chart_info)
+
+    # All segment charts in one batch so cache misses render side by side
+    pending = [chart_info for chart_info in charts_data if 'chart_spec' in chart_info]
+    for chart_info, chart_path in zip(pending, render_charts([chart_info.pop('chart_spec') for chart_info in pending])):
+        chart_info['chart_path'] = chart_path
     
     return {
         'charts': charts_data,
         'months': months
     }
 
+def ppsf_chart_spec(chart_data, months, current_year, prior_year):
+    """Chart service spec for a YTD PPSF current vs prior year chart"""
+    def clean(values):
+        return [None if pd.isnull(val) else float(val) for val in values]
+
+    return {
+        'kind': 'ppsf',
+        'months': list(months),
+        'current': clean(chart_data.get('all_current', [])),
+        'prior': clean(chart_data.get('all_prior', [])),
+        'current_year': current_year,
+        'prior_year': prior_year,
+        'style': CHART_STYLES['ppsf'],
+    }
+
 def generate_ppsf_chart_with_labels(chart_data, months, title, current_year, prior_year):
-    """Generate a modern, clean line chart for PPSF data with value labels like the weekly chart"""
+    """Render a PPSF line chart with value labels; returns its path relative to the output dir"""
     if not chart_data:
         return None
-        
-    # Use clean, modern styling
-    plt.style.use('default')
-    # Wider aspect ratio to fit the quadrant layout better
-    fig, ax = plt.subplots(figsize=(6, 2.5), facecolor='white')
-    
-    # Create month positions for x-axis
-    x_positions = list(range(len(months)))
-    
-    # Get and clean data - remove NaN values completely
-    current_data = chart_data.get('all_current', [])
-    prior_data = chart_data.get('all_prior', [])
-    
-    # Filter out NaN values and create valid data points
-    current_valid = [(i, val) for i, val in enumerate(current_data) if pd.notnull(val) and val > 0]
-    prior_valid = [(i, val) for i, val in enumerate(prior_data) if pd.notnull(val) and val > 0]
-    
-    # Modern color palette - clean blues like the weekly chart
-    current_color = '#2563eb'  # Modern blue
-    prior_color = '#f59e0b'    # Modern amber
-    
-    # If no valid data, create a placeholder chart
-    if not current_valid and not prior_valid:
-        ax.text(0.5, 0.5, 'No Data Available', 
-                horizontalalignment='center', verticalalignment='center',
-                transform=ax.transAxes, fontsize=14, color='#6b7280',
-                fontweight='500')
-        ax.set_xlim(0, len(months)-1)
-        ax.set_ylim(0, 10)
-    else:
-        # Plot current year line if we have data
-        if current_valid:
-            current_x = [point[0] for point in current_valid]
-            current_y = [point[1] for point in current_valid]
-            ax.plot(current_x, current_y, 
-                   color=current_color, 
-                   linewidth=3, 
-                   marker='o', 
-                   markersize=6,
-                   label=f'{current_year}',
-                   linestyle='-',
-                   markerfacecolor=current_color,
-                   markeredgecolor='white',
-                   markeredgewidth=2,
-                   alpha=0.9)
-            
-            # Add value labels above each point - like the weekly chart
-            for x, y in zip(current_x, current_y):
-                ax.annotate(f"${y:.1f}", 
-                           (x, y), 
-                           textcoords="offset points", 
-                           xytext=(0, 8), 
-                           ha='center', 
-                           fontsize=8, 
-                           color=current_color,
-                           fontweight='bold')
-        
-        # Plot prior year line if we have data
-        if prior_valid:
-            prior_x = [point[0] for point in prior_valid]
-            prior_y = [point[1] for point in prior_valid]
-            ax.plot(prior_x, prior_y, 
-                   color=prior_color, 
-                   linewidth=3, 
-                   marker='s', 
-                   markersize=6,
-                   label=f'{prior_year}',
-                   linestyle='--',
-                   markerfacecolor=prior_color,
-                   markeredgecolor='white',
-                   markeredgewidth=2,
-                   alpha=0.8)
-            
-            # Add value labels above each point - like the weekly chart
-            for x, y in zip(prior_x, prior_y):
-                ax.annotate(f"${y:.1f}", 
-                           (x, y), 
-                           textcoords="offset points", 
-                           xytext=(0, 8), 
-                           ha='center', 
-                           fontsize=8, 
-                           color=prior_color,
-                           fontweight='bold')
-    
-    # Modern styling - clean like the weekly chart
-    ax.set_xlabel('')
-    ax.set_ylabel('')
-    
-    # Format y-axis with decimals - more modern formatting
-    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:.1f}'))
-    ax.tick_params(axis='y', labelsize=9, colors='#374151', labelcolor='#374151')
-    
-    # Format x-axis
-    ax.set_xticks(x_positions)
-    ax.set_xticklabels(months, fontsize=9, color='#374151')
-    
-    # Modern grid styling - subtle like the weekly chart
-    ax.grid(True, alpha=0.2, linestyle='-', linewidth=1, color='#e5e7eb')
-    ax.set_axisbelow(True)
-    
-    # Clean, minimal spines - like the weekly chart
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    ax.spines['left'].set_color('#e5e7eb')
-    ax.spines['bottom'].set_color('#e5e7eb')
-    ax.spines['left'].set_linewidth(1)
-    ax.spines['bottom'].set_linewidth(1)
-    
-    # Set clean background
-    ax.set_facecolor('#fafafa')
-    fig.patch.set_facecolor('white')
-    
-    # Add modern legend if we have data - positioned like the weekly chart
-    if current_valid or prior_valid:
-        legend = ax.legend(fontsize=9, 
-                          frameon=True, 
-                          loc='upper left',
-                          fancybox=True,
-                          shadow=False,
-                          framealpha=0.9,
-                          edgecolor='#e5e7eb',
-                          facecolor='white')
-        legend.get_frame().set_linewidth(1)
-    
-    # Set reasonable y-axis limits with padding
-    all_values = [point[1] for point in current_valid + prior_valid]
-    if all_values:
-        min_val = min(all_values)
-        max_val = max(all_values)
-        padding = (max_val - min_val) * 0.15  # More generous padding for labels
-        ax.set_ylim(max(0, min_val - padding), max_val + padding)
-    
-    # Tight layout for better fit - minimal padding for max stretch
-    plt.tight_layout(pad=0.2)
-    
-    # Save chart with high quality
-    OUTPUT_DIR = os.path.join(os.path.dirname(__file__), 'output')
-    # Properly sanitize filename - remove/replace problematic characters
-    safe_title = title.replace(' ', '_').replace('.', '').replace(',', '').replace('&', 'and').replace('/', '_').replace('\\', '_').replace('(', '').replace(')', '').replace('+', 'plus')
-    chart_path = os.path.join(OUTPUT_DIR, f'ppsf_chart_{safe_title}.png')
-    fig.savefig(chart_path, format='png', bbox_inches='tight', 
-               facecolor='white', dpi=150, edgecolor='none', pad_inches=0.05)
-    plt.close(fig)
-    
-    # Return relative path for WeasyPrint
-    return f'ppsf_chart_{safe_title}.png'
+    return render_chart(ppsf_chart_spec(chart_data, months, current_year, prior_year))
 
 def preprocess_df(comp_data):
-    comp_data = comp_data.copy()
-    
+    """
+    Numeric columns, valid-row filter, PPSF/NPSF, year/month and amenity flags.
+    Returns a new frame (one row take, no whole-frame copies); comp_data is left as is.
+    """
     # Map new column names from grouped query to expected names for compatibility
     column_mapping = {
         'current_listed_price': 'listed_price',
         'current_days_on_market': 'days_on_market',
         'current_status': 'status'
     }
-    
+
+    # Convert columns to numeric (a no-op for columns typed_streeteasy_frame already parsed)
+    numeric = {
+        col: pd.to_numeric(comp_data[col], errors='coerce')
+        for col in ['listed_price', 'size_sqft', 'bedrooms', 'net_rent', 'current_listed_price']
+        if col in comp_data.columns
+    }
+
+    # Only use rows with valid, positive price and sqft and bedrooms
+    price_col = 'current_listed_price' if 'current_listed_price' in comp_data.columns else 'listed_price'
+    keep = pd.Series(True, index=comp_data.index)
+    if price_col in numeric and 'size_sqft' in numeric:
+        keep &= (numeric[price_col] > 0) & (numeric['size_sqft'] > 0)
+    if 'bedrooms' in numeric:
+        keep &= numeric['bedrooms'].notnull()
+    rows = np.flatnonzero(keep.to_numpy(dtype=bool))
+
+    comp_data = comp_data.take(rows)
+    for col, values in numeric.items():
+        comp_data[col] = values.take(rows)
+
     # Rename columns if they exist
     for old_col, new_col in column_mapping.items():
         if old_col in comp_data.columns:
             comp_data[new_col] = comp_data[old_col]
-    
-    # Convert columns to numeric
-    for col in ['listed_price', 'size_sqft', 'bedrooms', 'net_rent', 'current_listed_price']:
-        if col in comp_data.columns:
-            comp_data[col] = pd.to_numeric(comp_data[col], errors='coerce')
-    
-    # Only use rows with valid, positive price and sqft and bedrooms
-    price_col = 'current_listed_price' if 'current_listed_price' in comp_data.columns else 'listed_price'
-    if price_col in comp_data.columns and 'size_sqft' in comp_data.columns:
-        comp_data = comp_data[(comp_data[price_col] > 0) & (comp_data['size_sqft'] > 0)]
-    
-    if 'bedrooms' in comp_data.columns:
-        comp_data = comp_data[comp_data['bedrooms'].notnull()]
-    
+
     # Calculate PPSF and NPSF
     if price_col in comp_data.columns and 'size_sqft' in comp_data.columns:
         comp_data['ppsf'] = comp_data[price_col] / comp_data['size_sqft']
@@ -987,6 +934,9 @@ def preprocess_df(comp_data):
     else:
         comp_data['year'] = datetime.now().year
         comp_data['month'] = datetime.now().month
+
+    # Parse amenities once so report segments are plain mask operations
+    comp_data = add_amenity_flags(comp_data, copy=False)
     
     return comp_data
 
@@ -994,11 +944,12 @@ def process_all_data(df):
     # Create comp data first
     comp_data = create_comp_data(df)
     comp_data = preprocess_df(comp_data)
+    rent_history = report_rent_history(comp_data)
     
     return {
         'comparison_tables': get_comparison_tables(comp_data),
-        'ytd_ppsf': get_ytd_ppsf_data(comp_data),
-        'weekly_trends': get_weekly_trends(comp_data),
+        'ytd_ppsf': get_ytd_ppsf_data(comp_data, rent_history=rent_history),
+        'weekly_trends': get_weekly_trends(comp_data, rent_history=rent_history),
         'general_metrics': calculate_general_metrics(comp_data),
     }
 
@@ -1045,12 +996,52 @@ def get_template_data(template_name, processed_data, **kwargs):
     
     return result_data
 
-def get_inventory_data(limit_units=''):
-    """Fetch client data for inventory report - units with future move-out dates
-    
+def _display_text(series, default='-'):
+    """Column as display strings, with missing/''/'-' values shown as default"""
+    missing = series.isna() | series.isin(['', '-'])
+    return series.astype(str).where(~missing, default)
+
+def _display_date(series):
+    dates = pd.to_datetime(series, errors='coerce')
+    return dates.dt.strftime('%m/%d/%y').where(dates.notna(), '-')
+
+def format_inventory_units(df, now=None):
+    """Inventory rows (already filtered and ordered) as the dicts inventory_report.html prints"""
+    now = now or pd.Timestamp.now()
+    columns = ['address', 'unit', 'beds', 'baths', 'sqft', 'unit_status', 'deal_status', 'gross',
+               'actual_rent', 'concession', 'term', 'move_in', 'move_out', 'most_recent_note']
+    df = df.reindex(columns=columns)
+
+    units = pd.DataFrame({
+        'address': _display_text(df['address']),
+        'unit': _display_text(df['unit']),
+        'beds': pd.to_numeric(df['beds'], errors='coerce').fillna(0).astype(int),
+        'baths': pd.to_numeric(df['baths'], errors='coerce').fillna(0.0).astype(float),
+        'sqft': pd.to_numeric(df['sqft'], errors='coerce').fillna(0).astype(int),
+        'unit_status': _display_text(df['unit_status']),
+        'deal_status': _display_text(df['deal_status']),
+        'gross': _display_text(df['gross']),
+        'actual_rent': _display_text(df['actual_rent']),
+        'concession': _display_text(df['concession']),
+        'term': _display_text(df['term']),
+        'move_in': _display_date(df['move_in']),
+        'move_out': _display_date(df['move_out']),
+        'tenant_names': '',
+        'most_recent_note': _display_text(df['most_recent_note']),
+        'days_until_vacant': (pd.to_datetime(df['move_out'], errors='coerce') - now).dt.days.fillna(0).astype(int),
+    }, index=df.index)
+    return units.to_dict('records')
+
+def get_inventory_data(limit_units=None):
+    """Fetch client data for inventory report - units with future move-out dates, soonest first
+
     Args:
-        limit_units: Optional integer to limit number of units returned (default 30)
+        limit_units: Optional integer to limit number of units returned
+            (default INVENTORY_UNIT_LIMIT; 0 returns every unit)
     """
+    if limit_units is None:
+        limit_units = INVENTORY_UNIT_LIMIT
+    connection = None
     try:
         db_result = get_db_connection()
         
@@ -1059,145 +1050,23 @@ def get_inventory_data(limit_units=''):
         
         connection = db_result["connection"]
         credentials = db_result.get("credentials", {}) or {}
-        
-        result = run_query_system(
-            connection=connection,
-            credentials=credentials,
-            query_id='get_client_data',
-            target_type=None,
-            target_id=None,
-            unit_id=None,
-            filters={}
-        )
-        
-        # Handle response
-        if hasattr(result, 'get_json'):
-            response_data = result.get_json()
-        elif isinstance(result, dict):
-            response_data = result
-        else:
-            response_data = result
-        
-        if response_data and response_data.get('status') == 'success':
-            data = response_data.get('data', [])
-            df = pd.DataFrame(data)
-            
-            if df.empty:
-                return {'units': [], 'total_count': 0}
-            
-            # Filter for units with future move-out dates only
-            if 'move_out' in df.columns:
-                # Convert move_out to datetime and filter for future dates
-                # Handle both formatted dates (MM/dd/yy) and other formats
-                def parse_move_out_date(date_str):
-                    if pd.isna(date_str) or date_str == '-' or date_str == '':
-                        return pd.NaT
-                    try:
-                        # Try to parse MM/dd/yy format first
-                        return pd.to_datetime(date_str, format='%m/%d/%y', errors='coerce')
-                    except:
-                        # Fallback to general parsing
-                        return pd.to_datetime(date_str, errors='coerce')
-                
-                df['move_out_parsed'] = df['move_out'].apply(parse_move_out_date)
-                current_date = pd.Timestamp.now()
-                
-                # Only show units where move_out is in the future (unit will become available)
-                future_moveouts = df[
-                    df['move_out_parsed'].notna() & 
-                    (df['move_out_parsed'] > current_date)
-                ].copy()
-                
-                if future_moveouts.empty:
-                    return {'units': [], 'total_count': 0}
-                
-              
-                # Format the data for display
-                formatted_units = []
-                for _, row in future_moveouts.iterrows():
-                    # Format dates - keep original format if it's already formatted correctly
-                    def format_date(date_val):
-                        if pd.isna(date_val) or date_val == '-' or date_val == '':
-                            return "-"
-                        # If it's already in MM/dd/yy format, keep it
-                        if isinstance(date_val, str) and '/' in date_val:
-                            return date_val
-                        try:
-                            if isinstance(date_val, str):
-                                date_obj = pd.to_datetime(date_val)
-                            else:
-                                date_obj = date_val
-                            return date_obj.strftime('%m/%d/%y')
-                        except:
-                            return str(date_val) if date_val != '-' else "-"
-                    
-                    # Handle currency and other values that may already be formatted
-                    def safe_format_value(val, default='-'):
-                        if pd.isna(val) or val == '' or val == '-':
-                            return default
-                        return str(val)
-                    
-                    # Handle numeric values with proper conversion
-                    def safe_numeric(val, default_val=0):
-                        if pd.isna(val) or val == '' or val == '-':
-                            return default_val
-                        try:
-                            return int(float(val))
-                        except:
-                            return default_val
-                    
-                    def safe_float(val, default_val=0.0):
-                        if pd.isna(val) or val == '' or val == '-':
-                            return default_val
-                        try:
-                            return float(val)
-                        except:
-                            return default_val
-                    
-                    # Calculate days until vacant
-                    days_until_vacant = 0
-                    if pd.notna(row.get('move_out_parsed')):
-                        days_until_vacant = (row['move_out_parsed'] - current_date).days
-                    elif pd.notna(row.get('days_until_vacant')):
-                        try:
-                            days_until_vacant = int(row['days_until_vacant'])
-                        except:
-                            days_until_vacant = 0
-                    
-                    unit_data = {
-                        'address': safe_format_value(row.get('address')),
-                        'unit': safe_format_value(row.get('unit')),
-                        'beds': safe_numeric(row.get('beds')),
-                        'baths': safe_float(row.get('baths')),
-                        'sqft': safe_numeric(row.get('sqft')),
-                        'unit_status': safe_format_value(row.get('unit_status')),
-                        'deal_status': safe_format_value(row.get('deal_status')),
-                        'gross': safe_format_value(row.get('gross')),
-                        'actual_rent': safe_format_value(row.get('actual_rent')),
-                        'concession': safe_format_value(row.get('concession')),
-                        'term': safe_format_value(row.get('term')),
-                        'move_in': format_date(row.get('move_in')),
-                        'move_out': format_date(row.get('move_out')),
-                        'tenant_names': safe_format_value(row.get('tenant_names'), ''),
-                        'most_recent_note': safe_format_value(row.get('most_recent_note')),
-                        'days_until_vacant': days_until_vacant
-                    }
-                    formatted_units.append(unit_data)
-                
-                # Sort by move_out date (soonest first)
-                formatted_units.sort(key=lambda x: x['days_until_vacant'])
-                
-             
-                return {
-                    'units': formatted_units,
-                    'total_count': len(formatted_units)
-                }
-            else:
-                return {'units': [], 'total_count': 0}
-                
-        else:
+
+        # Future move-outs, ordering and the limit are applied in SQL, so only printed rows come back
+        result = get_inventory_units(connection, credentials, limit=limit_units)
+        if result['status'] != 'success':
+            print(result['message'])
             return {'units': [], 'total_count': 0}
-            
+        if not result['data']:
+            return {'units': [], 'total_count': 0}
+
+        return {
+            'units': format_inventory_units(pd.DataFrame(result['data'])),
+            'total_count': result['total_count']
+        }
+
     except Exception as e:
         print(f"Error fetching inventory data: {e}")
         return {'units': [], 'total_count': 0}
+    finally:
+        if connection is not None:
+            connection.close()
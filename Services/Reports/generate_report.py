@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 from datetime import datetime
 import matplotlib.pyplot as plt
 import pandas as pd
@@ -37,7 +38,15 @@ def get_pdf_generator():
             WEASYPRINT = None
             return WEASYPRINT
 
-from .data_processor import get_streeteasy_data, create_comp_data, get_comparison_tables, get_ytd_ppsf_data, get_weekly_trends, calculate_general_metrics, preprocess_df, get_inventory_data
+from .comp_cache import load_comp_data
+from .sections import compute_sections
+from .data_processor import address_segments, get_inventory_data
+from .pdf_renderer import render_pdf
+from .pipeline import new_run, run_stage, provide
+from .jobs import REPORT_STAGES
+
+# REPORT_PDF_DEBUG=1 also renders the inventory page and the report without it as separate PDFs
+REPORT_PDF_DEBUG = os.getenv('REPORT_PDF_DEBUG', '0') == '1'
 
 # Add the Services directory to the path so we can import modules
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -63,89 +72,47 @@ env = Environment(
     autoescape=select_autoescape(['html', 'xml'])
 )
 
-def generate_report(report_name, address_filters=None):
-    """
-    Generate a PDF report
-    
-    Args:
-        report_name: Name of the report
-        address_filters: Optional list of address filters for YTD PPSF charts
-                        Format: [
-                            {'name': 'Full Market Data', 'filter': {}},
-                            {'name': '3 Sutton Place', 'filter': {'address': '3 Sutton Place'}},
-                            {'name': '5 Sutton Place', 'filter': {'address': '5 Sutton Place'}},
-                            {'name': 'Other Buildings', 'filter': {'address': 'Other'}}
-                        ]
-                        If None, uses default market breakdown for testing
-    """
-    # Step 1: Create DB record
-    report_id = None
-    connection = None
-    try:
-        db_result = get_db_connection()
-        if db_result["status"] == "connected":
-            connection = db_result["connection"]
-            result = create_report_record(connection, None, report_name, 'generating')
-            if result['status'] == 'success':
-                report_id = result['report_id']
-                print(f"Created report record with ID: {report_id}")
-            else:
-                print(f"Failed to create report record: {result['message']}")
-    except Exception as e:
-        print(f"Failed to connect to database: {e}")
+PAGE_BREAK = '<div style="page-break-after: always;"></div>'
 
-    # Step 2: Load StreetEasy data and create comp_data
-    df = get_streeteasy_data()
-    comp_data = create_comp_data(df)  # Filter to no fee + required amenities
-    comp_data = preprocess_df(comp_data)  # Preprocess the filtered data
-
-    
-    
-    # Step 3: Process comp_data with dynamic address filters
-    data = {
-        'comparison_tables': get_comparison_tables(comp_data),
-        'ytd_ppsf': get_ytd_ppsf_data(comp_data),  # Now uses same amenity filters as comparison tables
-        'weekly_trends': get_weekly_trends(comp_data),
-        'general_metrics': calculate_general_metrics(comp_data),
-        'inventory_data': get_inventory_data()  # Default to 30 units with compact layout
-    }
-
-    # Step 4: Generate chart images (YTD PPSF and Weekly Trends)
-    # (You can add chart image generation here if needed, or do it in data_processor)
+def charts_exist(sections):
+    """A memoized sections output is only reused while the chart images it points to are on disk"""
+    paths = [chart['chart_path'] for chart in sections['ytd_ppsf'].get('charts', [])]
+    paths.append(sections['weekly_trends'].get('chart_path'))
+    return all(os.path.exists(os.path.join(OUTPUT_DIR, path)) for path in paths if path)
 
+def render_report_html(sections, inventory_data, report_date):
+    """Render the report pages; returns the page HTML plus the report with and without the inventory page"""
     # Step 5: Render HTML pages
     intro_html = env.get_template('intro.html').render(
         title='NYC Rental Market Comp Report',
         subtitle='Comprehensive Market Analysis',
-        date=datetime.now().strftime('%B %d, %Y')
+        date=report_date
     )
     comparison_html = env.get_template('comparison_tables.html').render(
-        tables=data['comparison_tables'],
-        page_title=f'Comp Report {datetime.now().strftime("%B %d, %Y")}',
+        tables=sections['comparison_tables'],
+        page_title=f'Comp Report {report_date}',
         subtitle='No Fee Listings, Laundry in Building, Virtual Doorman, Live-In Super',
     )
     
     ytd_ppsf_html = env.get_template('ytd_ppsf_trends.html').render(
-        **data['ytd_ppsf']
+        **sections['ytd_ppsf']
     )
     
     chart_table_html = env.get_template('chart_table.html').render(
-        **data['weekly_trends']
+        **sections['weekly_trends']
     )
     
     # Render inventory page (5th page) with error handling
     inventory_html = ""
     try:
-        print(f"Inventory data loaded: {data['inventory_data']['total_count']} units")
-        print(f"Inventory data keys: {data['inventory_data'].keys()}")
+        print(f"Inventory data loaded: {inventory_data['total_count']} units")
         
         inventory_html = env.get_template('inventory_report.html').render(
-            **data['inventory_data'],
+            **inventory_data,
             report_title='Inventory Report',
-            date=datetime.now().strftime('%B %d, %Y')
+            date=report_date
         )
-        print("Inventory HTML rendered successfully")
-        print(f"Inventory HTML length: {len(inventory_html)} characters")
+        print(f"Inventory HTML rendered: {len(inventory_html)} characters")
         
     except Exception as e:
         print(f"Error rendering inventory HTML: {e}")
@@ -156,47 +123,31 @@ def generate_report(report_name, address_filters=None):
         <div style="text-align: center; padding: 50px;">
             <h1>Inventory Report</h1>
             <p>Error loading inventory data: {str(e)}</p>
-            <p>Total units available: {data['inventory_data'].get('total_count', 'Unknown')}</p>
+            <p>Total units available: {inventory_data.get('total_count', 'Unknown')}</p>
         </div>
         """
 
-    # Step 6: Concatenate HTML - try without inventory first to test
-    try:
-        # First test without inventory
-        basic_html = (intro_html + 
-                    '<div style="page-break-after: always;"></div>' + 
-                    comparison_html + 
-                    '<div style="page-break-after: always;"></div>' + 
-                    ytd_ppsf_html + 
-                    '<div style="page-break-after: always;"></div>' + 
-                    chart_table_html)
-        
-        print("Basic HTML concatenation successful")
-        
-        # Now add inventory
-        full_html = (basic_html + 
-                    '<div style="page-break-after: always;"></div>' + 
-                    inventory_html)
-        
-        print("Full HTML with inventory concatenation successful")
-        print(f"Full HTML length: {len(full_html)} characters")
-        
-    except Exception as e:
-        print(f"Error in HTML concatenation: {e}")
-        # Fall back to basic HTML without inventory
-        full_html = basic_html
+    # Step 6: Concatenate HTML - the report without inventory is kept for the PDF fallbacks
+    basic_html = PAGE_BREAK.join([intro_html, comparison_html, ytd_ppsf_html, chart_table_html])
+    full_html = basic_html + PAGE_BREAK + inventory_html
+    print(f"Full HTML length: {len(full_html)} characters")
+    return {'basic': basic_html, 'inventory': inventory_html, 'full': full_html}
 
-    html_path = os.path.join(OUTPUT_DIR, f'{report_name}_debug.html')
-    with open(html_path, 'w') as f:
-        f.write(full_html)
-    print(f"Debug HTML saved to: {html_path}")
+def debug_html_path(report_name):
+    return os.path.join(OUTPUT_DIR, f'{report_name}_debug.html')
 
-    # Step 7: Convert HTML to PDF with error handling
+def render_report_pdf(html, report_name, pdf_engine):
+    """
+    Convert the report HTML to a PDF on the warm renderer, falling back to the report without
+    the inventory page. Returns the PDF path, the HTML path if no PDF engine is installed,
+    or None if every attempt failed.
+    """
+    html_path = debug_html_path(report_name)
+    basic_html = html['basic']
+    full_html = html['full']
     pdf_path = os.path.join(OUTPUT_DIR, f"{report_name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.pdf")
     
-    pdf_generator = get_pdf_generator()
-    
-    if pdf_generator is None:
+    if pdf_engine is None:
         print("ERROR: No PDF generation libraries available")
         print("Please install WeasyPrint: pip install weasyprint")
         print("Or install wkhtmltopdf for pdfkit")
@@ -204,48 +155,39 @@ def generate_report(report_name, address_filters=None):
         return html_path
     
     try:
-        if pdf_generator == 'weasyprint':
+        if pdf_engine == 'weasyprint':
             try:
-                from weasyprint import HTML as WeasyHTML
                 print("Using WeasyPrint for PDF conversion...")
                 
-                # Test: Generate inventory page standalone to check for issues
-                try:
-                    print("Testing inventory page standalone...")
-                    inventory_test_path = os.path.join(OUTPUT_DIR, f"inventory_test_{datetime.now().strftime('%Y%m%d-%H%M%S')}.pdf")
-                    WeasyHTML(string=inventory_html, base_url=OUTPUT_DIR).write_pdf(inventory_test_path)
-                    inventory_size = os.path.getsize(inventory_test_path)
-                    print(f"Standalone inventory PDF created: {inventory_size} bytes")
-                except Exception as inv_error:
-                    print(f"Standalone inventory PDF failed: {inv_error}")
-                    
-                # Test: Generate basic report without inventory
-                try:
-                    print("Testing basic report without inventory...")
-                    basic_test_html = (intro_html + 
-                                    '<div style="page-break-after: always;"></div>' + 
-                                    comparison_html + 
-                                    '<div style="page-break-after: always;"></div>' + 
-                                    ytd_ppsf_html + 
-                                    '<div style="page-break-after: always;"></div>' + 
-                                    chart_table_html)
-                    basic_test_path = os.path.join(OUTPUT_DIR, f"basic_test_{datetime.now().strftime('%Y%m%d-%H%M%S')}.pdf")
-                    WeasyHTML(string=basic_test_html, base_url=OUTPUT_DIR).write_pdf(basic_test_path)
-                    basic_size = os.path.getsize(basic_test_path)
-                    print(f"Basic report PDF created: {basic_size} bytes")
-                except Exception as basic_error:
-                    print(f"Basic report PDF failed: {basic_error}")
+                if REPORT_PDF_DEBUG:
+                    # Diagnostic renders of the inventory page and of the report without it
+                    try:
+                        print("Testing inventory page standalone...")
+                        inventory_test_path = os.path.join(OUTPUT_DIR, f"inventory_test_{datetime.now().strftime('%Y%m%d-%H%M%S')}.pdf")
+                        render_pdf('weasyprint', inventory_test_path, html=html['inventory'], base_url=OUTPUT_DIR)
+                        inventory_size = os.path.getsize(inventory_test_path)
+                        print(f"Standalone inventory PDF created: {inventory_size} bytes")
+                    except Exception as inv_error:
+                        print(f"Standalone inventory PDF failed: {inv_error}")
+
+                    try:
+                        print("Testing basic report without inventory...")
+                        basic_test_path = os.path.join(OUTPUT_DIR, f"basic_test_{datetime.now().strftime('%Y%m%d-%H%M%S')}.pdf")
+                        render_pdf('weasyprint', basic_test_path, html=basic_html, base_url=OUTPUT_DIR)
+                        basic_size = os.path.getsize(basic_test_path)
+                        print(f"Basic report PDF created: {basic_size} bytes")
+                    except Exception as basic_error:
+                        print(f"Basic report PDF failed: {basic_error}")
                 
-                # Now try the full report
-                WeasyHTML(string=full_html, base_url=OUTPUT_DIR).write_pdf(pdf_path)
+                # Full report on the warm renderer
+                render_pdf('weasyprint', pdf_path, html=full_html, base_url=OUTPUT_DIR)
                 
             except Exception as weasy_error:
                 print(f"WeasyPrint failed due to system dependencies: {weasy_error}")
                 print("Falling back to pdfkit...")
                 # Fall back to pdfkit
                 try:
-                    import pdfkit
-                    pdfkit.from_file(html_path, pdf_path)
+                    render_pdf('pdfkit', pdf_path, html_path=html_path)
                 except OSError as e:
                     if "wkhtmltopdf" in str(e):
                         print("ERROR: wkhtmltopdf not found and WeasyPrint system deps missing")
@@ -259,38 +201,8 @@ def generate_report(report_name, address_filters=None):
         else:  # pdfkit
             print("Using pdfkit for PDF conversion...")
             try:
-                import pdfkit
-                
-                # Configure pdfkit options for better PDF quality
-                options = {
-                    'page-size': 'A4',
-                    'orientation': 'Landscape',
-                    'margin-top': '0in',
-                    'margin-right': '0in',
-                    'margin-bottom': '0in',
-                    'margin-left': '0in',
-                    'encoding': "UTF-8",
-                    'no-outline': None,
-                    'enable-local-file-access': None,
-                    'print-media-type': None
-                }
-                
-                # Use xvfb-run on Linux for headless operation if available
-                config = None
-                try:
-                    import subprocess
-                    result = subprocess.run(['which', 'xvfb-run'], capture_output=True)
-                    if result.returncode == 0:
-                        # xvfb-run is available, configure pdfkit to use it
-                        config = pdfkit.configuration(wkhtmltopdf='xvfb-run -a wkhtmltopdf')
-                        print("Using xvfb-run for headless PDF generation")
-                except:
-                    pass  # Use default configuration
-                
-                if config:
-                    pdfkit.from_file(html_path, pdf_path, options=options, configuration=config)
-                else:
-                    pdfkit.from_file(html_path, pdf_path, options=options)
+                # wkhtmltopdf on the renderer process, which keeps one Xvfb display up between reports
+                render_pdf('pdfkit', pdf_path, html_path=html_path)
                     
             except OSError as e:
                 if "wkhtmltopdf" in str(e):
@@ -315,16 +227,11 @@ def generate_report(report_name, address_filters=None):
                 
                 # Try generating without inventory as emergency fallback
                 print("Generating fallback PDF without inventory due to small file size...")
-                fallback_html = (intro_html + 
-                            '<div style="page-break-after: always;"></div>' + 
-                            comparison_html + 
-                            '<div style="page-break-after: always;"></div>' + 
-                            ytd_ppsf_html + 
-                            '<div style="page-break-after: always;"></div>' + 
-                            chart_table_html)
-                
                 fallback_path = os.path.join(OUTPUT_DIR, f"{report_name}-no-inventory-{datetime.now().strftime('%Y%m%d-%H%M%S')}.pdf")
-                WeasyHTML(string=fallback_html, base_url=OUTPUT_DIR).write_pdf(fallback_path)
+                fallback_html_path = os.path.join(OUTPUT_DIR, f'{report_name}_no_inventory.html')
+                with open(fallback_html_path, 'w') as f:
+                    f.write(basic_html)
+                render_pdf(pdf_engine, fallback_path, html=basic_html, html_path=fallback_html_path, base_url=OUTPUT_DIR)
                 fallback_size = os.path.getsize(fallback_path)
                 print(f"Fallback PDF without inventory: {fallback_size} bytes")
         else:
@@ -338,28 +245,18 @@ def generate_report(report_name, address_filters=None):
         # Try to generate a basic PDF without inventory as fallback
         try:
             print("Attempting fallback PDF generation without inventory...")
-            basic_html = (intro_html + 
-                        '<div style="page-break-after: always;"></div>' + 
-                        comparison_html + 
-                        '<div style="page-break-after: always;"></div>' + 
-                        ytd_ppsf_html + 
-                        '<div style="page-break-after: always;"></div>' + 
-                        chart_table_html)
-            
             fallback_path = os.path.join(OUTPUT_DIR, f"{report_name}-fallback-{datetime.now().strftime('%Y%m%d-%H%M%S')}.pdf")
-            if pdf_generator == 'weasyprint':
+            if pdf_engine == 'weasyprint':
                 try:
-                    from weasyprint import HTML as WeasyHTML
-                    WeasyHTML(string=basic_html, base_url=OUTPUT_DIR).write_pdf(fallback_path)
+                    render_pdf('weasyprint', fallback_path, html=basic_html, base_url=OUTPUT_DIR)
                 except Exception as weasy_fallback_error:
                     print(f"WeasyPrint fallback also failed: {weasy_fallback_error}")
                     print("Trying pdfkit for fallback...")
                     try:
-                        import pdfkit
                         basic_html_path = os.path.join(OUTPUT_DIR, f'{report_name}_basic.html')
                         with open(basic_html_path, 'w') as f:
                             f.write(basic_html)
-                        pdfkit.from_file(basic_html_path, fallback_path)
+                        render_pdf('pdfkit', fallback_path, html_path=basic_html_path)
                     except:
                         print("All PDF generation failed. Returning HTML file")
                         return html_path
@@ -368,8 +265,7 @@ def generate_report(report_name, address_filters=None):
                 basic_html_path = os.path.join(OUTPUT_DIR, f'{report_name}_basic.html')
                 with open(basic_html_path, 'w') as f:
                     f.write(basic_html)
-                import pdfkit
-                pdfkit.from_file(basic_html_path, fallback_path)
+                render_pdf('pdfkit', fallback_path, html_path=basic_html_path)
             
             print(f"Fallback PDF generated: {fallback_path}")
             pdf_path = fallback_path
@@ -378,21 +274,149 @@ def generate_report(report_name, address_filters=None):
             print(f"Fallback PDF generation also failed: {fallback_error}")
             return None
 
-    # Step 8: Upload to Dropbox
-    final_path = pdf_path
+    return pdf_path
+
+def upload_report(pdf_path, report_name):
+    """Upload the PDF to Dropbox; returns the Dropbox path, or the local path if the upload fails"""
     try:
         dropbox_path = save_report_to_dropbox(pdf_path, report_name)
         print(f"Report uploaded to Dropbox: {dropbox_path}")
-        final_path = dropbox_path
+        return dropbox_path
     except Exception as e:
         print(f"Failed to upload to Dropbox: {e}")
+        return pdf_path
+
+# Report stages in dependency order. Each stage's output is memoized on disk under the hash
+# of its inputs, params and source files (see pipeline.run_stage), so a run after a template-only
+# change reuses the data load and sections and starts at render_html.
+REPORT_PIPELINE = {
+    # comp_cache already keeps the frame per scrape; the stage is keyed by the frame's content
+    'load_data': {'memo': False},
+    # The YTD, weekly and rent history windows end today, so the day is part of the key
+    'sections': {
+        'inputs': ['load_data'],
+        'params': ['ytd_segments', 'report_date'],
+        'sources': ['data_processor.py', 'sections.py', 'charts.py'],
+        'valid': charts_exist,
+    },
+    # Live deal data, fetched every run; unchanged units still hit the render_html cache
+    'inventory': {'memo': False},
+    'render_html': {
+        'inputs': ['sections', 'inventory'],
+        'params': ['report_date'],
+        'sources': ['templates', 'generate_report.py'],
+    },
+    'pdf': {
+        'inputs': ['render_html'],
+        'params': ['report_name', 'pdf_engine'],
+        'sources': ['pdf_renderer.py'],
+        'valid': lambda path: path is not None and os.path.exists(path),
+    },
+    'upload': {'inputs': ['pdf'], 'params': ['report_name'], 'memo': False},
+}
+
+def generate_report(report_name, address_filters=None, report_id=None, progress=None, data=None):
+    """
+    Generate a PDF report
+    
+    Args:
+        report_name: Name of the report
+        report_id: Existing reports record to complete (queued jobs); a new one is created if None
+        progress: Optional callback called with each stage name as it starts (see jobs.REPORT_STAGES);
+                  it may raise to stop the report between stages
+        address_filters: Optional list of address filters for YTD PPSF charts
+                        Format: [
+                            {'name': 'Full Market Data', 'filter': {}},
+                            {'name': '3 Sutton Place', 'filter': {'address': '3 Sutton Place'}},
+                            {'name': '5 Sutton Place', 'filter': {'address': '5 Sutton Place'}},
+                            {'name': 'Other Buildings', 'filter': {'address': 'Other'}}
+                        ]
+                        If None, the YTD PPSF charts use the amenity segments
+        data: Precomputed section data (see batch.generate_reports); skips loading and computing
+    """
+    report_start = time.perf_counter()
+    timings = {}
+
+    def on_stage(name):
+        if progress and name in REPORT_STAGES:
+            progress(name)
+
+    # Step 1: Create DB record
+    connection = None
+    if report_id is None:
+        try:
+            db_result = get_db_connection()
+            if db_result["status"] == "connected":
+                connection = db_result["connection"]
+                result = create_report_record(connection, None, report_name, 'generating')
+                if result['status'] == 'success':
+                    report_id = result['report_id']
+                    print(f"Created report record with ID: {report_id}")
+                else:
+                    print(f"Failed to create report record: {result['message']}")
+        except Exception as e:
+            print(f"Failed to connect to database: {e}")
+
+    run = new_run(REPORT_PIPELINE, {
+        'ytd_segments': address_segments(address_filters) if address_filters else None,
+        'report_date': datetime.now().strftime('%B %d, %Y'),
+        'report_name': report_name,
+        'pdf_engine': get_pdf_generator(),
+    }, on_stage)
+
+    def compute_report_sections(comp_data, ytd_segments=None, report_date=None):
+        # Step 3: Compute the sections - on section threads, charts in the chart pool
+        sections, section_timings = compute_sections(comp_data, ytd_segments=ytd_segments, include_inventory=False)
+        timings.update(section_timings)
+        print(f"Report sections computed in {section_timings['sections_wall']}s: {section_timings}")
+        return sections
+
+    if data is None:
+        # Step 2: Load StreetEasy data and create comp_data (cached per scrape run_date)
+        run_stage(run, 'load_data', load_comp_data)
+        run_stage(run, 'sections', compute_report_sections)
+    else:
+        provide(run, 'sections', {name: value for name, value in data.items() if name != 'inventory_data'})
+        if 'inventory_data' in data:
+            provide(run, 'inventory', data['inventory_data'])
+    run_stage(run, 'inventory', get_inventory_data)
+
+    html = run_stage(run, 'render_html', render_report_html)
+    html_path = debug_html_path(report_name)
+    with open(html_path, 'w') as f:
+        f.write(html['full'])
+    print(f"Debug HTML saved to: {html_path}")
+
+    # Step 7: Convert HTML to PDF with error handling
+    pdf_path = run_stage(run, 'pdf', render_report_pdf)
+    if pdf_path is None or pdf_path == html_path:
+        # The PDF failed (None) or no engine is installed (the HTML path): nothing to upload
         final_path = pdf_path
+    else:
+        # Step 8: Upload to Dropbox
+        final_path = run_stage(run, 'upload', upload_report)
+
+    for name, stage_run in run['stages'].items():
+        timings[name] = stage_run['seconds']
+    timings['stages'] = run['stages']
+    timings['total'] = round(time.perf_counter() - report_start, 3)
+    print(f"Report timings: {timings}")
 
-    # Step 9: Update DB record
+    # Step 9: Update DB record, on every outcome so the record never stays at an in-progress stage
+    if isinstance(report_id, int) and connection is None:
+        try:
+            db_result = get_db_connection()
+            if db_result["status"] == "connected":
+                connection = db_result["connection"]
+        except Exception as e:
+            print(f"Failed to connect to database: {e}")
     if report_id and connection:
         try:
-            update_result = update_report_record(connection, None, report_id, 'completed', final_path)
+            update_result = update_report_record(connection, None, report_id, 'completed' if final_path else 'failed', final_path)
             print(f"Updated report record: {update_result}")
+            timings_result = update_report_record(connection, None, report_id, timings=timings)
+            if timings_result['status'] != 'success':
+                print(f"Failed to record report timings: {timings_result['message']}")
         except Exception as e:
             print(f"Failed to update report record: {e}")
         finally:
@@ -403,20 +427,40 @@ def generate_report(report_name, address_filters=None):
 # Add Flask endpoint
 from flask import request, jsonify, send_file
 from . import reports_bp
+from .jobs import submit_report, submit_batch, job_status, cancel_report
+from .report_data import get_report_data, refresh_in_background
 
 @reports_bp.route('/generate', methods=['GET', 'POST'])
 def generate_report_endpoint():
-    """Simple endpoint to generate reports"""
+    """
+    Queue a report and return its report_id right away; poll /reports/status/<report_id>.
+    Pass wait=true to generate synchronously and get the file path in the response.
+    """
     try:
         # Get report name from query params or JSON
         if request.method == 'POST':
-            data = request.get_json() or {}
+            data = request.get_json(silent=True) or {}
             report_name = data.get('report_name', 'market_report')
+            address_filters = data.get('address_filters')
+            wait = str(data.get('wait', 'false')).lower() == 'true'
         else:
             report_name = request.args.get('report_name', 'market_report')
+            address_filters = None
+            wait = request.args.get('wait', 'false').lower() == 'true'
+
+        if not wait:
+            result = submit_report(report_name, address_filters)
+            return jsonify({
+                "status": "queued",
+                "message": "Report queued",
+                "report_id": result['job']['report_id'],
+                "report_name": report_name,
+                "status_url": f"/reports/status/{result['job']['report_id']}",
+                "job": result['job'],
+            }), 202
         
         # Generate the report
-        result_path = generate_report(report_name)
+        result_path = generate_report(report_name, address_filters)
         
         if result_path:
             return jsonify({
@@ -437,6 +481,77 @@ def generate_report_endpoint():
             "message": str(e)
         }), 500
 
+@reports_bp.route('/batch', methods=['POST'])
+def generate_batch_endpoint():
+    """
+    Queue several reports that share one data load and sections pass.
+    Body: {"reports": [{"report_name": "...", "address_filters": [...]}, ...]}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        report_specs = data.get('reports') or []
+        if not report_specs or any(not spec.get('report_name') for spec in report_specs):
+            return jsonify({"status": "error", "message": "reports must be a non-empty list with a report_name each"}), 400
+
+        jobs = submit_batch(report_specs)
+        return jsonify({
+            "status": "queued",
+            "message": f"{len(jobs)} reports queued",
+            "report_ids": [job['report_id'] for job in jobs],
+            "jobs": jobs,
+        }), 202
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@reports_bp.route('/status/<report_id>', methods=['GET'])
+def report_status_endpoint(report_id):
+    """Stage-level progress of a queued/running/finished report"""
+    try:
+        result = job_status(report_id)
+        if result['status'] != 'success':
+            return jsonify(result), 404
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@reports_bp.route('/cancel/<report_id>', methods=['POST'])
+def cancel_report_endpoint(report_id):
+    """Cancel a queued report, or stop a running one after its current stage"""
+    try:
+        result = cancel_report(report_id)
+        return jsonify(result), 200 if result['status'] == 'success' else 409
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@reports_bp.route('/data', methods=['GET'])
+@reports_bp.route('/data/<section>', methods=['GET'])
+def report_data_endpoint(section=None):
+    """
+    Report sections as JSON (comparison_tables, ytd_ppsf, weekly_trends, general_metrics),
+    read from the cache computed after each scrape. 202 while the first computation runs.
+    """
+    try:
+        result = get_report_data(section)
+        if result['status'] == 'pending':
+            return jsonify(result), 202
+        if result['status'] != 'success':
+            return jsonify(result), 404
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@reports_bp.route('/data/refresh', methods=['POST'])
+def refresh_report_data_endpoint():
+    """Recompute the cached report data in the background (e.g. after a manual data fix)"""
+    try:
+        started = refresh_in_background(force_refresh=True)
+        return jsonify({
+            "status": "started" if started else "running",
+            "message": "Report data refresh started" if started else "A refresh is already running",
+        }), 202
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 @reports_bp.route('/download', methods=['GET'])
 def download_report_endpoint():
     """Download reports from Dropbox"""
@@ -0,0 +1,251 @@
+import os
+import time
+import uuid
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from Services.Database.Connect import get_db_connection
+from Services.Database.Data import create_report_record, update_report_record, get_report_record
+
+# Reports generated at once; further jobs wait in the executor queue
+REPORT_JOB_WORKERS = int(os.getenv('REPORT_JOB_WORKERS', '2'))
+
+# Finished jobs are kept in memory this long for /status, then only the reports table has them
+JOB_RETENTION_SECONDS = int(os.getenv('REPORT_JOB_RETENTION_SECONDS', '3600'))
+
+# Stages in the order generate_report reaches them; also written to reports.status
+REPORT_STAGES = ['queued', 'load_data', 'sections', 'render_html', 'pdf', 'upload', 'completed']
+FINAL_STATUSES = {'completed', 'failed', 'cancelled'}
+
+_executor = ThreadPoolExecutor(max_workers=REPORT_JOB_WORKERS, thread_name_prefix='report-job')
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class ReportCancelled(Exception):
+    """Raised at the next stage boundary of a job that has been cancelled"""
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+def _record_status(report_id, status, file_path=None):
+    """Mirror a job's status into the reports table; local (non-DB) jobs are skipped"""
+    if not isinstance(report_id, int):
+        return
+    try:
+        db_result = get_db_connection()
+        if db_result["status"] != "connected":
+            return
+        connection = db_result["connection"]
+        try:
+            update_report_record(connection, None, report_id, status, file_path)
+        finally:
+            connection.close()
+    except Exception as e:
+        print(f"Failed to record report {report_id} status '{status}': {e}")
+
+def _create_record(report_name):
+    """reports.report_id for a new job, or a local id when the database can't be reached"""
+    try:
+        db_result = get_db_connection()
+        if db_result["status"] == "connected":
+            connection = db_result["connection"]
+            try:
+                result = create_report_record(connection, None, report_name, 'queued')
+            finally:
+                connection.close()
+            if result['status'] == 'success':
+                return result['report_id']
+            print(f"Failed to create report record: {result['message']}")
+    except Exception as e:
+        print(f"Failed to connect to database: {e}")
+    return f'local-{uuid.uuid4().hex[:12]}'
+
+def _progress(job, stage):
+    if job['cancel'].is_set():
+        raise ReportCancelled(f"Report {job['report_id']} cancelled before {stage}")
+    with _jobs_lock:
+        job['stage'] = stage
+        job['stage_started_at'] = _now()
+        job['progress'] = round(REPORT_STAGES.index(stage) / (len(REPORT_STAGES) - 1), 2)
+    _record_status(job['report_id'], stage)
+
+def _finish(job, status, file_path=None, error=None):
+    with _jobs_lock:
+        job.update({
+            'status': status,
+            'stage': status,
+            'finished_at': _now(),
+            'file_path': file_path,
+            'error': error,
+            'updated': time.time(),
+        })
+        if status == 'completed':
+            job['progress'] = 1.0
+
+def _run_job(job, address_filters):
+    from .generate_report import generate_report
+
+    if job['cancel'].is_set():
+        return
+    with _jobs_lock:
+        job['status'] = 'running'
+        job['started_at'] = _now()
+
+    try:
+        file_path = generate_report(
+            job['report_name'], address_filters,
+            report_id=job['report_id'], progress=lambda stage: _progress(job, stage),
+        )
+    except ReportCancelled as e:
+        print(e)
+        _finish(job, 'cancelled')
+        _record_status(job['report_id'], 'cancelled')
+        return
+    except Exception as e:
+        print(f"Report job {job['report_id']} failed: {e}")
+        _finish(job, 'failed', error=str(e))
+        _record_status(job['report_id'], 'failed')
+        return
+
+    if file_path:
+        _finish(job, 'completed', file_path)  # generate_report wrote the completed record (PDF or HTML-only)
+    else:
+        _finish(job, 'failed', error='Report generation returned no file')
+        _record_status(job['report_id'], 'failed')
+
+def _run_batch(jobs, report_specs):
+    from .batch import generate_reports
+
+    live = [(job, spec) for job, spec in zip(jobs, report_specs) if not job['cancel'].is_set()]
+    if not live:
+        return
+    with _jobs_lock:
+        for job, _ in live:
+            job['status'] = 'running'
+            job['started_at'] = _now()
+
+    try:
+        summary = generate_reports(
+            [spec for _, spec in live],
+            report_ids=[job['report_id'] for job, _ in live],
+            progresses=[lambda stage, job=job: _progress(job, stage) for job, _ in live],
+        )
+    except Exception as e:
+        print(f"Report batch failed: {e}")
+        summary = {'reports': [{'error': str(e), 'file_path': None}] * len(live)}
+
+    for (job, _), result in zip(live, summary['reports']):
+        if result.get('exception') == 'ReportCancelled' or job['cancel'].is_set() and not result['file_path']:
+            _finish(job, 'cancelled')
+            _record_status(job['report_id'], 'cancelled')
+        elif result['file_path']:
+            _finish(job, 'completed', result['file_path'])
+        else:
+            _finish(job, 'failed', error=result.get('error') or 'Report generation returned no file')
+            _record_status(job['report_id'], 'failed')
+        job['batch'] = {key: value for key, value in summary.items() if key not in ('reports', 'section_timings')}
+
+def _prune_jobs():
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    with _jobs_lock:
+        for report_id in [rid for rid, job in _jobs.items() if job['status'] in FINAL_STATUSES and job['updated'] < cutoff]:
+            del _jobs[report_id]
+
+def _new_job(report_name):
+    report_id = _create_record(report_name)
+    job = {
+        'report_id': report_id,
+        'report_name': report_name,
+        'status': 'queued',
+        'stage': 'queued',
+        'progress': 0.0,
+        'queued_at': _now(),
+        'started_at': None,
+        'stage_started_at': None,
+        'finished_at': None,
+        'file_path': None,
+        'error': None,
+        'cancel': threading.Event(),
+        'future': None,
+        'updated': time.time(),
+    }
+    with _jobs_lock:
+        _jobs[str(report_id)] = job
+    return job
+
+def submit_report(report_name, address_filters=None):
+    """Queue a report and return its job state right away (including report_id)"""
+    _prune_jobs()
+    job = _new_job(report_name)
+    job['future'] = _executor.submit(_run_job, job, address_filters)
+    return job_status(job['report_id'])
+
+def submit_batch(report_specs):
+    """Queue a batch of reports that share one data load; returns each report's job state"""
+    _prune_jobs()
+    jobs = [_new_job(spec['report_name']) for spec in report_specs]
+    future = _executor.submit(_run_batch, jobs, report_specs)
+    for job in jobs:
+        job['future'] = future
+    return [job_status(job['report_id'])['job'] for job in jobs]
+
+def job_status(report_id):
+    """In-memory job state, falling back to the reports table for jobs run by another process"""
+    with _jobs_lock:
+        job = _jobs.get(str(report_id))
+        if job is not None:
+            job['updated'] = time.time()
+            state = {key: value for key, value in job.items() if key not in ('cancel', 'future', 'updated')}
+            state['stages'] = REPORT_STAGES
+            return {'status': 'success', 'job': state}
+
+    if not str(report_id).isdigit():
+        return {'status': 'error', 'message': f'Report {report_id} not found'}
+
+    db_result = get_db_connection()
+    if db_result["status"] != "connected":
+        return {'status': 'error', 'message': 'Database connection failed'}
+    connection = db_result["connection"]
+    try:
+        result = get_report_record(connection, None, int(report_id))
+    finally:
+        connection.close()
+    if result['status'] != 'success':
+        return result
+
+    record = result['report']
+    stage = record.get('status')
+    return {'status': 'success', 'job': {
+        'report_id': record['report_id'],
+        'report_name': record.get('name'),
+        'status': stage if stage in FINAL_STATUSES | {'queued'} else 'running',
+        'stage': stage,
+        'progress': round(REPORT_STAGES.index(stage) / (len(REPORT_STAGES) - 1), 2) if stage in REPORT_STAGES else None,
+        'file_path': record.get('file_path'),
+        'timings': record.get('timings'),
+        'stages': REPORT_STAGES,
+    }}
+
+def cancel_report(report_id):
+    """
+    Cancel a job: a queued job never starts, a running one stops at its next stage
+    boundary (a PDF conversion already in progress is allowed to finish first).
+    """
+    with _jobs_lock:
+        job = _jobs.get(str(report_id))
+        # A batch shares one future between its reports, so only a lone report's can be dropped outright
+        shared = job is not None and sum(1 for other in _jobs.values() if other['future'] is job['future']) > 1
+    if job is None:
+        return {'status': 'error', 'message': f'Report {report_id} is not running in this process'}
+    if job['status'] in FINAL_STATUSES:
+        return {'status': 'error', 'message': f"Report {report_id} already {job['status']}"}
+
+    job['cancel'].set()
+    if job['future'] is not None and not shared and job['future'].cancel():
+        _finish(job, 'cancelled')
+        _record_status(job['report_id'], 'cancelled')
+        return {'status': 'success', 'message': f'Report {report_id} cancelled before it started'}
+    return {'status': 'success', 'message': f'Report {report_id} will stop after its current stage'}
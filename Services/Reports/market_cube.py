@@ -0,0 +1,307 @@
+import os
+import sys
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from Services.Database.Connect import get_db_connection
+from Services.Database.Bulk import bulk_upsert, DEFAULT_CHUNK_SIZE
+from .comp_cache import version_run_date, load_comp_data
+from .data_processor import (
+    AMENITY_FLAGS, AMENITY_SEGMENTS, RENT_HISTORY_DAYS, add_amenity_flags, build_comparison_tables,
+    get_comparison_tables, ytd_ppsf_charts,
+)
+
+CUBE_TABLE = 'market_cube'
+
+# One cube row per combination of these; day is 'YYYY-MM-DD' of created_at ('' if unknown).
+# Days, not months, so the YTD PPSF can average forward-filled daily prices like the report.
+CUBE_DIMENSIONS = ['area', 'bedrooms', 'amenity_mask', 'no_fee', 'day']
+CUBE_KEY = ['run_date', 'cube_version'] + CUBE_DIMENSIONS
+
+# Measure -> comp_data column; each is stored as <measure>_sum and <measure>_count (non-null rows)
+CUBE_MEASURES = {
+    'price': 'listed_price',
+    'sqft': 'size_sqft',
+    'ppsf': 'ppsf',
+    'rent': 'listed_price',
+}
+
+# Measures that only count positive values: the rent history skips prices <= 0
+POSITIVE_MEASURES = {'rent'}
+
+# Bump when the cube's dimensions or measures change. The version also covers AMENITY_FLAGS,
+# since amenity_mask bit i means the i-th flag: adding a flag rebuilds the cube on next load.
+CUBE_FORMAT = 2
+CUBE_VERSION = hashlib.sha1(json.dumps([CUBE_FORMAT, list(AMENITY_FLAGS.items())]).encode()).hexdigest()[:12]
+
+# Scrape runs whose cubes are kept in the table
+CUBE_KEEP_RUNS = int(os.getenv('MARKET_CUBE_KEEP_RUNS', '30'))
+
+CREATE_CUBE_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {CUBE_TABLE} (
+    run_date DATE NOT NULL,
+    cube_version CHAR(12) NOT NULL,
+    area VARCHAR(100) NOT NULL,
+    bedrooms TINYINT NOT NULL,
+    amenity_mask TINYINT NOT NULL,
+    no_fee TINYINT NOT NULL,
+    day CHAR(10) NOT NULL,
+    data_version VARCHAR(32) NOT NULL,
+    listings INT NOT NULL,
+    price_sum DOUBLE NOT NULL,
+    price_count INT NOT NULL,
+    sqft_sum DOUBLE NOT NULL,
+    sqft_count INT NOT NULL,
+    ppsf_sum DOUBLE NOT NULL,
+    ppsf_count INT NOT NULL,
+    rent_sum DOUBLE NOT NULL,
+    rent_count INT NOT NULL,
+    PRIMARY KEY (run_date, cube_version, area, bedrooms, amenity_mask, no_fee, day)
+)
+"""
+
+CUBE_VALUES = ['listings'] + [f'{measure}_{stat}' for measure in CUBE_MEASURES for stat in ('sum', 'count')]
+CUBE_COLUMNS = CUBE_DIMENSIONS + CUBE_VALUES
+
+_cache = {'version': None, 'cube': None}
+_cache_lock = threading.Lock()
+
+
+def build_market_cube(comp_data):
+    """Aggregate a preprocessed comp frame into one row per CUBE_DIMENSIONS combination"""
+    if 'amenity_mask' not in comp_data.columns:
+        comp_data = add_amenity_flags(comp_data)
+
+    created_at = pd.to_datetime(comp_data['created_at'], errors='coerce') if 'created_at' in comp_data.columns else pd.Series(pd.NaT, index=comp_data.index)
+    frame = pd.DataFrame({
+        'area': comp_data['areaName'].astype(object).fillna('') if 'areaName' in comp_data.columns else '',
+        'bedrooms': comp_data['bedrooms'].astype('int8'),
+        'amenity_mask': comp_data['amenity_mask'].astype('int8'),
+        'no_fee': pd.to_numeric(comp_data['is_no_fee'], errors='coerce').fillna(0).astype('int8') if 'is_no_fee' in comp_data.columns else np.int8(0),
+        'day': created_at.dt.normalize(),
+    }, index=comp_data.index)
+    for measure, col in CUBE_MEASURES.items():
+        values = pd.to_numeric(comp_data[col], errors='coerce').astype('float64')  # sums in float64, not the float32 columns
+        if measure in POSITIVE_MEASURES:
+            values = values.where(values > 0)
+        frame[f'{measure}_sum'] = values
+        frame[f'{measure}_count'] = values.notna().astype('int32')
+
+    grouped = frame.groupby(CUBE_DIMENSIONS, dropna=False, sort=True)
+    cube = grouped.sum(min_count=0)
+    cube['listings'] = grouped.size()
+    cube = cube.reset_index()
+    cube['day'] = cube['day'].dt.strftime('%Y-%m-%d').fillna('')
+    return cube[CUBE_COLUMNS]
+
+def cube_segment_mask(cube, segment):
+    """
+    segment_mask for cube rows: 'require' amenity flags, 'areas' and 'no_fee' are cube
+    dimensions. Address segments need the listing rows, so they raise ValueError.
+    """
+    if 'filter_func' in segment or 'addresses' in segment or 'exclude_addresses' in segment:
+        raise ValueError(f"Segment '{segment['title']}' filters by address, which the market cube doesn't have")
+    mask = np.ones(len(cube), dtype=bool)
+    flag_bits = {flag: bit for bit, flag in enumerate(AMENITY_FLAGS)}
+    for flag, wanted in segment.get('require', {}).items():
+        if flag not in flag_bits:
+            raise ValueError(f"Unknown amenity flag '{flag}' (see AMENITY_FLAGS)")
+        mask &= ((cube['amenity_mask'].to_numpy() >> flag_bits[flag]) & 1).astype(bool) == wanted
+    if 'areas' in segment:
+        mask &= cube['area'].isin(segment['areas']).to_numpy()
+    if 'no_fee' in segment:
+        mask &= cube['no_fee'].to_numpy() == int(bool(segment['no_fee']))
+    return mask
+
+def _average(sums, counts):
+    return sums / counts.where(counts > 0)
+
+def cube_bedroom_stats(cube, segment):
+    """data_processor.bedroom_stats for a segment, from the cube"""
+    totals = cube[cube_segment_mask(cube, segment)].groupby('bedrooms')[CUBE_VALUES].sum()
+    totals = totals[totals['listings'] > 0]
+    return pd.DataFrame({
+        'avg_price': _average(totals['price_sum'], totals['price_count']),
+        'avg_sqft': _average(totals['sqft_sum'], totals['sqft_count']),
+        'avg_ppsf': _average(totals['ppsf_sum'], totals['ppsf_count']),
+        'count': totals['listings'],
+    })
+
+def cube_comparison_tables(cube, segments=None):
+    """get_comparison_tables answered from the cube"""
+    return build_comparison_tables(segments or AMENITY_SEGMENTS, lambda segment: cube_bedroom_stats(cube, segment))
+
+def cube_monthly_ppsf(cube, segments, end_date=None):
+    """
+    monthly_ppsf_by_segment from the cube, computed the way get_ytd_ppsf_data does: per bedroom
+    type, the average positive price of listings created each day of the last RENT_HISTORY_DAYS
+    days, forward-filled over days without listings, over that bedroom type's average sqft in
+    the segment; then the mean of those daily values per (segment number, year, month).
+    """
+    end_date = pd.Timestamp(end_date if end_date is not None else datetime.now().date()).normalize()
+    window = pd.date_range(end_date - pd.Timedelta(days=RENT_HISTORY_DAYS), end_date, freq='D')
+
+    series = []
+    for i, segment in enumerate(segments):
+        rows = cube[cube_segment_mask(cube, segment) & cube['bedrooms'].isin([0, 1, 2, 3, 4]).to_numpy()]
+        sqft = rows.groupby('bedrooms')[['sqft_sum', 'sqft_count']].sum()
+        avg_sqft = _average(sqft['sqft_sum'], sqft['sqft_count'])
+        avg_sqft = avg_sqft[avg_sqft > 0]
+
+        priced = rows[(rows['day'] != '') & (rows['rent_count'] > 0) & rows['bedrooms'].isin(avg_sqft.index).to_numpy()]
+        if priced.empty:
+            continue
+        daily = priced.groupby(['day', 'bedrooms'])[['rent_sum', 'rent_count']].sum()
+        prices = (daily['rent_sum'] / daily['rent_count']).unstack('bedrooms')
+        prices.index = pd.to_datetime(prices.index)
+        prices = prices.reindex(window).ffill()  # days before the window are dropped first, as in the report
+
+        ppsf = (prices / avg_sqft.reindex(prices.columns)).stack()
+        ppsf = ppsf[ppsf > 0]
+        if ppsf.empty:
+            continue
+        days = ppsf.index.get_level_values(0)
+        monthly = ppsf.groupby([days.year, days.month]).mean()
+        series.append(pd.Series(monthly.to_numpy(), index=pd.MultiIndex.from_arrays(
+            [np.full(len(monthly), i), monthly.index.get_level_values(0), monthly.index.get_level_values(1)],
+            names=['segment', 'year', 'month'])))
+    if not series:
+        return pd.Series(dtype=float, index=pd.MultiIndex.from_arrays([[], [], []], names=['segment', 'year', 'month']))
+    return pd.concat(series)
+
+def cube_ytd_ppsf(cube, segments=None):
+    """get_ytd_ppsf_data (charts and tables) answered from the cube"""
+    segments = segments or AMENITY_SEGMENTS
+    return ytd_ppsf_charts(cube_monthly_ppsf(cube, segments), segments)
+
+def ensure_cube_table(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(CREATE_CUBE_TABLE)
+        connection.commit()
+    finally:
+        cursor.close()
+
+def write_market_cube(connection, run_date, cube, data_version='', chunk_size=DEFAULT_CHUNK_SIZE):
+    """Replace the stored cube for a run_date and drop runs beyond CUBE_KEEP_RUNS; returns rows written"""
+    ensure_cube_table(connection)
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"DELETE FROM {CUBE_TABLE} WHERE run_date = %s", (run_date,))
+        cursor.execute(
+            f"""
+            DELETE FROM {CUBE_TABLE} WHERE run_date NOT IN (
+                SELECT run_date FROM (
+                    SELECT DISTINCT run_date FROM {CUBE_TABLE} ORDER BY run_date DESC LIMIT %s
+                ) AS recent
+            )
+            """,
+            (max(CUBE_KEEP_RUNS - 1, 0),)
+        )
+        connection.commit()
+    finally:
+        cursor.close()
+    rows = cube.assign(run_date=run_date, cube_version=CUBE_VERSION, data_version=data_version)[CUBE_KEY + ['data_version'] + CUBE_VALUES]
+    return bulk_upsert(connection, CUBE_TABLE, rows, CUBE_KEY, chunk_size)
+
+def read_market_cube(connection, run_date, data_version=''):
+    """
+    The stored cube for a run_date, or None if it wasn't built, was built by another
+    CUBE_VERSION, or from an earlier scrape of the same day (another data_version)
+    """
+    ensure_cube_table(connection)
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            f"SELECT {', '.join(CUBE_COLUMNS)} FROM {CUBE_TABLE} WHERE run_date = %s AND cube_version = %s AND data_version = %s",
+            (run_date, CUBE_VERSION, data_version)
+        )
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    if not rows:
+        return None
+    cube = pd.DataFrame(rows, columns=CUBE_COLUMNS)
+    cube[['bedrooms', 'amenity_mask', 'no_fee']] = cube[['bedrooms', 'amenity_mask', 'no_fee']].astype('int8')
+    sums = [col for col in CUBE_VALUES if col.endswith('_sum')]
+    cube[sums] = cube[sums].astype('float64')
+    return cube
+
+def _stored_cube(version, comp_data, force_refresh):
+    """The version's cube from the market_cube table, else built from comp_data and stored"""
+    connection = None
+    db_result = get_db_connection()
+    if db_result["status"] == "connected":
+        connection = db_result["connection"]
+    try:
+        cube = None
+        if connection is not None and not force_refresh:
+            try:
+                cube = read_market_cube(connection, version_run_date(version), version)
+            except Exception as e:
+                print(f"Could not read market cube: {e}")
+        if cube is not None:
+            print(f"Market cube loaded for version {version}: {len(cube)} rows")
+            return cube
+
+        started = datetime.now()
+        cube = build_market_cube(comp_data)
+        print(f"Market cube built for version {version}: {len(cube)} rows in {(datetime.now() - started).total_seconds():.2f}s")
+        if connection is not None and len(cube):
+            try:
+                write_market_cube(connection, version_run_date(version), cube, version)
+            except Exception as e:
+                print(f"Could not store market cube: {e}")
+        return cube
+    finally:
+        if connection is not None:
+            connection.close()
+
+def market_cube_for(comp_data, force_refresh=False):
+    """
+    The market cube of a comp frame. Frames from load_comp_data carry their data version
+    (attrs['version']); that cube is kept in memory and in the market_cube table, so it is
+    built once per scrape. Frames without a version (e.g. synthetic ones) are aggregated on the spot.
+    The cube holds per-day totals with no date window, so the version alone keys it; queries
+    such as cube_ytd_ppsf apply today's window when they are called.
+    """
+    version = comp_data.attrs.get('version')
+    if version is None:
+        return build_market_cube(comp_data)
+
+    with _cache_lock:
+        if not force_refresh and _cache['cube'] is not None and _cache['version'] == version:
+            return _cache['cube']
+        cube = _stored_cube(version, comp_data, force_refresh)
+        _cache['version'] = version
+        _cache['cube'] = cube
+        return cube
+
+def load_market_cube(force_refresh=False):
+    """The market cube for the latest scrape (see market_cube_for)"""
+    return market_cube_for(load_comp_data(force_refresh=force_refresh), force_refresh)
+
+def get_cube_comparison_tables(comp_data, custom_filters=None):
+    """
+    get_comparison_tables from the comp frame's market cube. Segments the cube can't answer
+    (address filters, legacy filter functions) use the listing rows instead.
+    """
+    custom_filters = custom_filters or AMENITY_SEGMENTS
+    if any('filter_func' in segment or 'addresses' in segment or 'exclude_addresses' in segment for segment in custom_filters):
+        return get_comparison_tables(comp_data, custom_filters)
+    return cube_comparison_tables(market_cube_for(comp_data), custom_filters)
+
+if __name__ == "__main__":
+    # python3 -m Services.Reports.market_cube [--rebuild]
+    cube = load_market_cube(force_refresh='--rebuild' in sys.argv)
+    ytd = cube_ytd_ppsf(cube)
+    print(json.dumps({
+        'rows': len(cube),
+        'comparison_tables': cube_comparison_tables(cube),
+        'ytd_ppsf': [{'title': chart['title'], 'table_rows': chart['table_rows']} for chart in ytd['charts']],
+    }, indent=2, default=str))
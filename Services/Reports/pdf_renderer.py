@@ -0,0 +1,145 @@
+import os
+import shutil
+import subprocess
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Long-lived renderer processes; 0 renders in the calling process
+PDF_RENDERER_WORKERS = int(os.getenv('PDF_RENDERER_WORKERS', '1'))
+
+# Display used for the renderer's own Xvfb server when wkhtmltopdf needs X
+XVFB_DISPLAY = os.getenv('PDF_XVFB_DISPLAY', ':99')
+
+PDFKIT_OPTIONS = {
+    'page-size': 'A4',
+    'orientation': 'Landscape',
+    'margin-top': '0in',
+    'margin-right': '0in',
+    'margin-bottom': '0in',
+    'margin-left': '0in',
+    'encoding': "UTF-8",
+    'no-outline': None,
+    'enable-local-file-access': None,
+    'print-media-type': None
+}
+
+# Per-process engine state, filled once by _warm_engine and reused for every job
+_engine = {}
+_pool = {'executor': None, 'engine': None}
+_pool_lock = threading.Lock()
+
+
+def _start_xvfb():
+    """
+    Start one Xvfb server for the life of this process instead of one per report
+    (what `xvfb-run wkhtmltopdf` does). Returns the display, or None if X isn't needed/available.
+    The server outlives renderer restarts; a later renderer finds the display taken and reuses it.
+    """
+    if os.environ.get('DISPLAY') or not shutil.which('Xvfb'):
+        return os.environ.get('DISPLAY')
+    process = subprocess.Popen(
+        ['Xvfb', XVFB_DISPLAY, '-screen', '0', '1280x1024x24', '-nolisten', 'tcp'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    _engine['xvfb'] = process
+    os.environ['DISPLAY'] = XVFB_DISPLAY
+    return XVFB_DISPLAY
+
+def _warm_engine(engine):
+    """Load the rendering engine once: imports, fonts, and (for wkhtmltopdf) the X display"""
+    if _engine.get('name') == engine:
+        return _engine
+
+    _engine.clear()
+    _engine['name'] = engine
+    if engine == 'weasyprint':
+        from weasyprint import HTML
+        from weasyprint.text.fonts import FontConfiguration
+        _engine['html'] = HTML
+        _engine['font_config'] = FontConfiguration()
+        _engine['image_cache'] = {}  # Chart PNGs/CSS images shared across reports
+        # A throwaway render pulls in fonts, the UA stylesheet and the layout code
+        HTML(string='<p>warm</p>').write_pdf(font_config=_engine['font_config'])
+    elif engine == 'pdfkit':
+        import pdfkit
+        _engine['pdfkit'] = pdfkit
+        display = _start_xvfb()
+        if display is None and shutil.which('xvfb-run'):
+            # No Xvfb binary to keep running, so fall back to a server per report
+            _engine['config'] = pdfkit.configuration(wkhtmltopdf='xvfb-run -a wkhtmltopdf')
+        else:
+            _engine['config'] = pdfkit.configuration()
+    else:
+        raise ValueError(f"Unknown PDF engine: {engine}")
+    return _engine
+
+def render_pdf_in_process(engine, pdf_path, html=None, html_path=None, base_url=None):
+    """Render one report with the (warm) engine of the current process; returns pdf_path"""
+    state = _warm_engine(engine)
+    if engine == 'weasyprint':
+        document = state['html'](string=html, base_url=base_url) if html is not None else state['html'](filename=html_path, base_url=base_url)
+        try:
+            document.write_pdf(pdf_path, font_config=state['font_config'], cache=state['image_cache'])
+        except TypeError:
+            # WeasyPrint < 53 has no image cache argument
+            document.write_pdf(pdf_path, font_config=state['font_config'])
+    else:
+        if html_path is None:
+            raise ValueError("pdfkit renders from a file; html_path is required")
+        state['pdfkit'].from_file(html_path, pdf_path, options=PDFKIT_OPTIONS, configuration=state['config'])
+    return pdf_path
+
+def _process_context():
+    # The pool starts from a report job thread while section and chart threads run, so never
+    # plain fork (the child can inherit a lock another thread holds). forkserver forks from a
+    # clean server that has this module preloaded; spawn starts from a bare interpreter.
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+def _executor(engine):
+    with _pool_lock:
+        if _pool['executor'] is not None and _pool['engine'] != engine:
+            _pool['executor'].shutdown()
+            _pool['executor'] = None
+        if _pool['executor'] is None:
+            _pool['executor'] = ProcessPoolExecutor(
+                max_workers=PDF_RENDERER_WORKERS, mp_context=_process_context(),
+                initializer=_warm_engine, initargs=(engine,),
+            )
+            _pool['engine'] = engine
+        return _pool['executor']
+
+def start_renderer(engine):
+    """Start the renderer pool ahead of the first report so it is warm when needed"""
+    if PDF_RENDERER_WORKERS > 0:
+        _executor(engine).submit(_warm_engine, engine)
+
+def shutdown_renderer():
+    with _pool_lock:
+        if _pool['executor'] is not None:
+            _pool['executor'].shutdown(wait=False)
+            _pool['executor'] = None
+            _pool['engine'] = None
+    xvfb = _engine.pop('xvfb', None)
+    if xvfb is not None:
+        xvfb.terminate()
+
+def render_pdf(engine, pdf_path, html=None, html_path=None, base_url=None):
+    """
+    Render a report PDF on the long-lived renderer pool, which keeps the engine,
+    fonts and images loaded between reports. Falls back to rendering in-process if
+    the pool is disabled or a renderer process dies.
+    """
+    if PDF_RENDERER_WORKERS <= 0:
+        return render_pdf_in_process(engine, pdf_path, html, html_path, base_url)
+    try:
+        return _executor(engine).submit(render_pdf_in_process, engine, pdf_path, html, html_path, base_url).result()
+    except BrokenProcessPool as e:
+        print(f"PDF renderer process died ({e}), restarting it and rendering in-process")
+        shutdown_renderer()
+        return render_pdf_in_process(engine, pdf_path, html, html_path, base_url)
@@ -0,0 +1,195 @@
+import os
+import glob
+import json
+import time
+import pickle
+import hashlib
+import resource
+
+import pandas as pd
+
+REPORTS_DIR = os.path.dirname(__file__)
+
+# Memoized stage outputs, one pickle per (stage, input hash)
+PIPELINE_CACHE_DIR = os.getenv('REPORT_PIPELINE_DIR', os.path.join(REPORTS_DIR, 'cache', 'pipeline'))
+
+# Outputs kept per stage; older ones are removed when a new one is written
+PIPELINE_CACHE_KEEP = int(os.getenv('REPORT_PIPELINE_KEEP', '5'))
+
+# REPORT_PIPELINE_MEMO=0 recomputes every stage (timings are still recorded)
+PIPELINE_MEMO = os.getenv('REPORT_PIPELINE_MEMO', '1') == '1'
+
+_source_hashes = {}
+
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def peak_rss_mb():
+    """Peak RSS since the last reset_peak_rss (VmHWM; ru_maxrss where /proc isn't available)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass  # ru_maxrss can't be reset; peaks are then process-wide
+
+def source_hash(path):
+    """Content hash of a source file or template directory (relative to Services/Reports), cached by mtime"""
+    full_path = os.path.join(REPORTS_DIR, path)
+    files = sorted(glob.glob(os.path.join(full_path, '*'))) if os.path.isdir(full_path) else [full_path]
+    digest = hashlib.sha1()
+    for file_path in files:
+        mtime = os.path.getmtime(file_path)
+        cached = _source_hashes.get(file_path)
+        if cached is None or cached[0] != mtime:
+            with open(file_path, 'rb') as f:
+                cached = _source_hashes[file_path] = (mtime, hashlib.sha1(f.read()).hexdigest())
+        digest.update(os.path.basename(file_path).encode())
+        digest.update(cached[1].encode())
+    return digest.hexdigest()
+
+def content_key(value):
+    """Hash of a stage output, for stages whose inputs can't name their result (e.g. no run_date)"""
+    if isinstance(value, pd.DataFrame):
+        return hashlib.sha1(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes()).hexdigest()
+    return hashlib.sha1(pickle.dumps(value)).hexdigest()
+
+def stage_key(name, spec, input_keys, params):
+    """
+    Hash of everything a stage's output depends on: its version, the keys of its input
+    stages, its params and its source files. None if a param wasn't given (keyed by content instead).
+    """
+    if any(param not in params for param in spec.get('params', [])):
+        return None
+    payload = {
+        'stage': name,
+        'version': spec.get('version', 1),
+        'inputs': input_keys,
+        'params': params,
+        'sources': {path: source_hash(path) for path in spec.get('sources', [])},
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def _memo_path(name, key):
+    return os.path.join(PIPELINE_CACHE_DIR, f'{name}_{key}.pkl')
+
+def _read_memo(name, key, valid=None):
+    path = _memo_path(name, key)
+    if not os.path.exists(path):
+        return False, None
+    try:
+        with open(path, 'rb') as f:
+            value = pickle.load(f)
+    except Exception as e:
+        print(f"Could not read stage output {path}: {e}")
+        return False, None
+    if valid is not None and not valid(value):
+        return False, None
+    os.utime(path)  # Recently used outputs survive pruning
+    return True, value
+
+def _write_memo(name, key, value):
+    os.makedirs(PIPELINE_CACHE_DIR, exist_ok=True)
+    path = _memo_path(name, key)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Could not write stage output {path}: {e}")
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    outputs = sorted(glob.glob(os.path.join(PIPELINE_CACHE_DIR, f'{name}_*.pkl')), key=os.path.getmtime, reverse=True)
+    for old_path in outputs[PIPELINE_CACHE_KEEP:]:
+        os.remove(old_path)
+
+def new_run(pipeline, params=None, on_stage=None):
+    """
+    State for one pipeline run. pipeline maps stage name -> spec, in dependency order:
+        {'inputs': [upstream stages, passed positionally], 'params': [run params, passed by keyword],
+         'sources': [files/dirs whose content the output depends on], 'version': int,
+         'memo': False to always run it, 'valid': callable(output) -> bool checked on a cache hit}
+    on_stage is called with each stage name as it starts.
+    """
+    for name, spec in pipeline.items():
+        for upstream in spec.get('inputs', []):
+            if upstream not in pipeline or list(pipeline).index(upstream) > list(pipeline).index(name):
+                raise ValueError(f"Stage '{name}' input '{upstream}' must be declared before it")
+    return {'pipeline': pipeline, 'params': params or {}, 'on_stage': on_stage, 'outputs': {}, 'keys': {}, 'stages': {}}
+
+def provide(run, name, value):
+    """Use a precomputed output for a stage (e.g. batch-shared sections), keyed by its content"""
+    run['outputs'][name] = value
+    run['keys'][name] = content_key(value)
+    run['stages'][name] = {'seconds': 0.0, 'cached': False, 'provided': True, 'key': run['keys'][name][:12]}
+    return value
+
+def run_stage(run, name, func):
+    """
+    Run one declared stage with func(*input outputs, **params), or load its memoized output
+    when nothing it depends on has changed. Records wall time and memory for the stage.
+    """
+    spec = run['pipeline'][name]
+    if run['on_stage']:
+        run['on_stage'](name)
+    if name in run['outputs']:
+        return run['outputs'][name]
+
+    inputs = spec.get('inputs', [])
+    params = {param: run['params'][param] for param in spec.get('params', []) if param in run['params']}
+    key = stage_key(name, spec, [run['keys'][upstream] for upstream in inputs], params)
+    memo = PIPELINE_MEMO and spec.get('memo', True) and key is not None
+
+    start = time.perf_counter()
+    reset_peak_rss()
+    rss_before = current_rss_mb()
+    cached, result = _read_memo(name, key, spec.get('valid')) if memo else (False, None)
+    if not cached:
+        result = func(*[run['outputs'][upstream] for upstream in inputs], **params)
+        if memo:
+            _write_memo(name, key, result)
+    seconds = time.perf_counter() - start
+    rss_after = current_rss_mb()
+
+    if key is None or not spec.get('memo', True):
+        key = content_key(result)
+    run['outputs'][name] = result
+    run['keys'][name] = key
+    run['stages'][name] = {
+        'seconds': round(seconds, 3),
+        'cached': cached,
+        'key': key[:12],
+        'rss_mb': round(rss_after, 1) if rss_after is not None else None,
+        'rss_delta_mb': round(rss_after - rss_before, 1) if None not in (rss_after, rss_before) else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+    print(f"Stage {name}: {'cached' if cached else 'ran'} in {seconds:.3f}s")
+    return result
+
+def clear_pipeline_cache(stage=None):
+    pattern = f'{stage}_*.pkl' if stage else '*.pkl'
+    removed = 0
+    for path in glob.glob(os.path.join(PIPELINE_CACHE_DIR, pattern)):
+        os.remove(path)
+        removed += 1
+    return removed
@@ -0,0 +1,179 @@
+import os
+import json
+import math
+import threading
+from datetime import datetime, date
+
+import numpy as np
+import pandas as pd
+
+from .comp_cache import CACHE_DIR, get_data_version, load_comp_data, clear_comp_cache
+from .sections import COMP_SECTIONS, section_kwargs, timed_section
+from .data_processor import report_rent_history
+from .market_cube import market_cube_for
+
+# Sections served as JSON to the dashboard (the inventory page reads live deal data, so it isn't cached)
+DATA_SECTIONS = list(COMP_SECTIONS)
+
+# Bump when a section's output shape changes so an old file isn't served
+REPORT_DATA_FORMAT = 1
+
+_cache = {'payload': None, 'mtime': None, 'refreshing': False}
+_cache_lock = threading.Lock()
+
+
+def _data_path():
+    return os.path.join(CACHE_DIR, f'report_data_v{REPORT_DATA_FORMAT}.json')
+
+def json_safe(value):
+    """Section output as plain JSON: numpy scalars unboxed, NaN -> None, tuple keys nested"""
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            if isinstance(key, tuple):
+                # e.g. weekly_trends.color_map[(bed, week)] -> color_map[bed][week]
+                node = result
+                for part in key[:-1]:
+                    node = node.setdefault(str(part), {})
+                node[str(key[-1])] = json_safe(item)
+            else:
+                result[str(key)] = json_safe(item)
+        return result
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.isoformat()
+    if value is pd.NaT:
+        return None
+    return value
+
+def build_report_data(comp_data, version=None):
+    """Compute the dashboard sections from a comp frame (one shared rent history, in-process)"""
+    timings = {}
+    _, rent_history, timings['rent_history'] = timed_section('rent_history', report_rent_history, comp_data)
+    sections = {}
+    for name in DATA_SECTIONS:
+        _, sections[name], timings[name] = timed_section(name, COMP_SECTIONS[name], comp_data, **section_kwargs(name, rent_history))
+    return {
+        'version': version,
+        'as_of': date.today().isoformat(),
+        'computed_at': datetime.now().isoformat(timespec='seconds'),
+        'listings': len(comp_data),
+        'timings': timings,
+        'sections': json_safe(sections),
+    }
+
+def _write(payload):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _data_path()
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def refresh_report_data(force_refresh=False):
+    """Recompute the market cube and the sections for the latest scrape and replace the cached JSON"""
+    if force_refresh:
+        clear_comp_cache()
+    try:
+        version = get_data_version()
+    except Exception as e:
+        print(f"Could not check latest StreetEasy data version: {e}")
+        version = None
+    comp_data = load_comp_data(force_refresh=force_refresh)
+    try:
+        # The scrape's market cube, stored for reuse; the comparison tables are read off it
+        market_cube_for(comp_data, force_refresh=force_refresh)
+    except Exception as e:
+        print(f"Could not build market cube: {e}")
+    payload = build_report_data(comp_data, version)
+    _write(payload)
+    with _cache_lock:
+        _cache['payload'] = payload
+        _cache['mtime'] = os.path.getmtime(_data_path())
+    print(f"Report data refreshed for version {version}: {payload['timings']}")
+    return payload
+
+def _refresh_worker(force_refresh):
+    try:
+        refresh_report_data(force_refresh)
+    except Exception as e:
+        print(f"Report data refresh failed: {e}")
+    finally:
+        with _cache_lock:
+            _cache['refreshing'] = False
+
+def refresh_in_background(force_refresh=True):
+    """Start a refresh thread unless one is already running; returns whether one was started"""
+    with _cache_lock:
+        if _cache['refreshing']:
+            return False
+        _cache['refreshing'] = True
+    thread = threading.Thread(target=_refresh_worker, args=(force_refresh,))
+    thread.daemon = True
+    thread.start()
+    return True
+
+def _cached_payload():
+    """
+    The latest computed payload. Memory is reused while the file is unchanged; a refresh by
+    another worker process replaces the file, and the new mtime makes this one re-read it.
+    """
+    path = _data_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return _cache['payload']
+
+    with _cache_lock:
+        if _cache['payload'] is not None and _cache['mtime'] == mtime:
+            return _cache['payload']
+    try:
+        with open(path) as f:
+            payload = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not read report data cache {path}: {e}")
+        return _cache['payload']
+    with _cache_lock:
+        _cache['payload'] = payload
+        _cache['mtime'] = mtime
+    return payload
+
+def get_report_data(section=None):
+    """
+    Cached section data for the dashboard; never computes in the request. When nothing has
+    been computed yet a background refresh is started and a 'pending' status is returned.
+    Sections computed on an earlier day are served while a background refresh moves their
+    YTD, weekly and rent history windows to today.
+    """
+    if section is not None and section not in DATA_SECTIONS:
+        return {'status': 'error', 'message': f"Unknown section '{section}'", 'sections': DATA_SECTIONS}
+
+    payload = _cached_payload()
+    if payload is None:
+        refresh_in_background(force_refresh=False)
+        return {'status': 'pending', 'message': 'Report data is being computed, try again shortly'}
+    if payload.get('as_of') != date.today().isoformat():
+        refresh_in_background(force_refresh=False)
+
+    result = {
+        'status': 'success',
+        'version': payload['version'],
+        'as_of': payload.get('as_of'),
+        'computed_at': payload['computed_at'],
+        'refreshing': _cache['refreshing'],
+    }
+    if section is None:
+        result['sections'] = payload['sections']
+    else:
+        result['section'] = section
+        result['data'] = payload['sections'][section]
+    return result
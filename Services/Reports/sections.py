@@ -0,0 +1,87 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .data_processor import get_ytd_ppsf_data, get_weekly_trends, calculate_general_metrics, get_inventory_data, report_rent_history
+from .market_cube import get_cube_comparison_tables
+
+# Sections computed from comp_data, on threads sharing the one frame; their charts are drawn in the chart pool.
+# The comparison tables are read off the scrape's market cube.
+COMP_SECTIONS = {
+    'comparison_tables': get_cube_comparison_tables,
+    'ytd_ppsf': get_ytd_ppsf_data,
+    'weekly_trends': get_weekly_trends,
+    'general_metrics': calculate_general_metrics,
+}
+
+# Sections that slice the shared report_rent_history instead of rebuilding their own
+RENT_HISTORY_SECTIONS = {'ytd_ppsf', 'weekly_trends'}
+
+# Sections that rewrite comp_data columns, so they get their own copy when run alongside the others
+COPY_SECTIONS = {'general_metrics'}
+
+# Section threads; REPORT_WORKERS=0 computes every section in sequence on the calling thread
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', str(len(COMP_SECTIONS))))
+
+
+def timed_section(name, func, *args, **kwargs):
+    """Run one section and return (name, result, seconds spent inside it)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return name, result, round(time.perf_counter() - start, 3)
+
+def section_kwargs(name, rent_history, ytd_segments=None):
+    kwargs = {'rent_history': rent_history} if name in RENT_HISTORY_SECTIONS else {}
+    if name == 'ytd_ppsf' and ytd_segments is not None:
+        kwargs['custom_filters'] = ytd_segments
+    return kwargs
+
+def compute_sections_sequential(comp_data, rent_history=None, timings=None, ytd_segments=None, include_inventory=True):
+    data = {}
+    timings = {} if timings is None else timings
+    for name, func in COMP_SECTIONS.items():
+        _, data[name], timings[name] = timed_section(name, func, comp_data, **section_kwargs(name, rent_history, ytd_segments))
+    if include_inventory:
+        _, data['inventory_data'], timings['inventory_data'] = timed_section('inventory_data', get_inventory_data)
+    return data, timings
+
+def compute_sections(comp_data, workers=None, ytd_segments=None, include_inventory=True):
+    """
+    Compute every report section, returning (data, timings).
+
+    The comp sections and the inventory DB fetch run on threads over the same comp_data, so
+    nothing is pickled or forked from the (multithreaded) web worker; the chart drawing
+    they hand off runs in the chart pool. timings holds
+    seconds per section plus 'sections_wall' for the whole step. The daily rent history
+    every chart section needs is built once up front ('rent_history') and shared.
+    ytd_segments replaces the amenity segments of the YTD PPSF charts (e.g. address_segments).
+    include_inventory=False leaves out the inventory page (the report pipeline runs it as its own stage).
+    """
+    workers = REPORT_WORKERS if workers is None else workers
+    start = time.perf_counter()
+
+    timings = {}
+    _, rent_history, timings['rent_history'] = timed_section('rent_history', report_rent_history, comp_data, ytd_segments)
+
+    if workers <= 0:
+        data, timings = compute_sections_sequential(comp_data, rent_history, timings, ytd_segments, include_inventory)
+        timings['sections_wall'] = round(time.perf_counter() - start, 3)
+        return data, timings
+
+    data = {}
+    with ThreadPoolExecutor(max_workers=workers + int(include_inventory)) as pool:
+        if include_inventory:
+            inventory_future = pool.submit(timed_section, 'inventory_data', get_inventory_data)
+        futures = [
+            pool.submit(timed_section, name, func, comp_data.copy() if name in COPY_SECTIONS else comp_data,
+                        **section_kwargs(name, rent_history, ytd_segments))
+            for name, func in COMP_SECTIONS.items()
+        ]
+        for future in futures:
+            name, data[name], timings[name] = future.result()
+
+        if include_inventory:
+            _, data['inventory_data'], timings['inventory_data'] = inventory_future.result()
+
+    timings['sections_wall'] = round(time.perf_counter() - start, 3)
+    return data, timings
@@ -0,0 +1,178 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Area -> (share of listings, median asking rent per sqft per month)
+AREA_PROFILES = {
+    'Upper East Side': (0.11, 5.4),
+    'Upper West Side': (0.09, 5.7),
+    'Midtown': (0.06, 6.6),
+    'Chelsea': (0.05, 7.1),
+    'East Village': (0.06, 6.3),
+    'Financial District': (0.06, 6.4),
+    'Harlem': (0.08, 4.1),
+    'Washington Heights': (0.06, 3.5),
+    'Williamsburg': (0.07, 6.0),
+    'Greenpoint': (0.04, 5.3),
+    'East Williamsburg': (0.03, 4.9),
+    'Bushwick': (0.06, 4.3),
+    'Bedford-Stuyvesant': (0.06, 4.0),
+    'Crown Heights': (0.05, 3.8),
+    'Long Island City': (0.05, 6.1),
+    'Astoria': (0.07, 4.1),
+}
+
+# Bedrooms -> (share of listings, median sqft); 5 is dropped by create_comp_data like real 5+ beds
+BEDROOM_PROFILES = {
+    0: (0.16, 480),
+    1: (0.36, 680),
+    2: (0.27, 920),
+    3: (0.13, 1180),
+    4: (0.05, 1450),
+    5: (0.03, 1800),
+}
+
+# In-unit amenity -> (share of listings in buildings without a doorman, with one, rent premium)
+UNIT_AMENITIES = {
+    'washer_dryer': (0.15, 0.45, 0.06),
+    'dishwasher': (0.40, 0.80, 0.02),
+    'balcony': (0.10, 0.20, 0.04),
+    'terrace': (0.04, 0.10, 0.08),
+}
+
+# Building amenity -> share of buildings
+BUILDING_AMENITIES = {
+    'elevator': 0.45,
+    'laundry': 0.55,
+    'live_in_super': 0.30,
+    'virtual_doorman': 0.15,
+    'gym': 0.20,
+}
+DOORMAN_SHARE = 0.18
+
+# Yearly market growth and the summer peak of the seasonal swing (day of year)
+ANNUAL_GROWTH = 0.035
+SEASONAL_AMPLITUDE = 0.03
+SEASONAL_PEAK_DAY = 212
+
+STATUSES = ['RENTED', 'DELISTED', 'IN_CONTRACT']
+LISTINGS_PER_BUILDING = 12
+
+
+def market_index(dates, start):
+    """Rent level relative to `start`: steady growth plus a summer peak"""
+    years = (dates - start).days.to_numpy() / 365.0
+    season = np.sin(2 * np.pi * (dates.dayofyear.to_numpy() - SEASONAL_PEAK_DAY + 91.25) / 365.0)
+    return np.exp(ANNUAL_GROWTH * years + SEASONAL_AMPLITUDE * season)
+
+def _choice(rng, profiles, size):
+    keys = list(profiles)
+    shares = np.array([profiles[key][0] for key in keys])
+    return np.asarray(keys, dtype=object if isinstance(keys[0], str) else None)[rng.choice(len(keys), size, p=shares / shares.sum())]
+
+def _amenity_text(flags, names):
+    """Comma-separated amenity names per row from a (rows x names) bool matrix, via a lookup per bit combination"""
+    codes = (flags * (1 << np.arange(len(names)))).sum(axis=1)
+    combos = np.array([','.join(name for bit, name in enumerate(names) if code >> bit & 1) for code in range(1 << len(names))], dtype=object)
+    return combos[codes]
+
+def synthetic_streeteasy_listings(listings=100000, months=14, seed=0, run_date=None):
+    """
+    StreetEasy listings shaped like the get_streeteasy_data query result (every scalar a
+    string, '' when missing), at any scale.
+
+    Listings are spread over the last `months` months with more of them in summer, and
+    asking rents follow area, bedroom count, size, amenities and a growing, seasonal market.
+    Units are grouped into buildings that share building amenities; doorman buildings carry
+    more in-unit amenities. Each listing's price history is its asking rent when created
+    and 3% cuts for every month it sat on the market, so current prices trail the market
+    for stale listings. About 2% of rows miss bedrooms or sqft, as scraped rows do.
+    """
+    rng = np.random.default_rng(seed)
+    run_date = pd.Timestamp(run_date or pd.Timestamp.now()).normalize()
+    start = run_date - pd.DateOffset(months=months)
+
+    # Buildings: area and building amenities drawn once, shared by their units
+    buildings = max(1, listings // LISTINGS_PER_BUILDING)
+    building_area = _choice(rng, AREA_PROFILES, buildings)
+    building_doorman = rng.random(buildings) < DOORMAN_SHARE
+    building_flags = rng.random((buildings, len(BUILDING_AMENITIES))) < np.array(list(BUILDING_AMENITIES.values()))
+    building_flags[:, 0] |= building_doorman  # doorman buildings have elevators
+    building_text = _amenity_text(np.column_stack([building_flags, building_doorman]), list(BUILDING_AMENITIES) + ['doorman'])
+
+    building = rng.integers(0, buildings, listings)
+    area = building_area[building]
+    doorman = building_doorman[building]
+
+    bedrooms = _choice(rng, BEDROOM_PROFILES, listings).astype('int64')
+    median_sqft = np.array([profile[1] for profile in BEDROOM_PROFILES.values()])[bedrooms]
+    size_sqft = np.round(median_sqft * rng.lognormal(0, 0.15, listings))
+
+    unit_shares = np.where(doorman[:, None], [share[1] for share in UNIT_AMENITIES.values()], [share[0] for share in UNIT_AMENITIES.values()])
+    unit_flags = rng.random((listings, len(UNIT_AMENITIES))) < unit_shares
+    premium = 1 + unit_flags @ np.array([amenity[2] for amenity in UNIT_AMENITIES.values()]) + doorman * 0.08
+
+    # Listing dates: daily weights follow the season, so summer months list more units
+    days = pd.date_range(start, run_date, freq='D')
+    weights = market_index(days, start) ** 8
+    created_at = days[rng.choice(len(days), listings, p=weights / weights.sum())] + pd.to_timedelta(rng.integers(0, 86400, listings), unit='s')
+
+    area_ppsf = pd.Series({name: profile[1] for name, profile in AREA_PROFILES.items()})[area].to_numpy()
+    # Bigger units rent for less per sqft
+    size_factor = (size_sqft / 700) ** -0.15
+    listed_price = np.round(area_ppsf * size_sqft * size_factor * premium * market_index(created_at, start) * rng.lognormal(0, 0.08, listings), -1)
+
+    # Price history: time on market, then a 3% cut with 35% odds for every 30 days listed
+    age_days = (run_date - created_at.normalize()).days.to_numpy()
+    days_on_market = np.minimum(np.round(rng.exponential(28, listings)), age_days).astype('int64')
+    cuts = rng.binomial(days_on_market // 30, 0.35)
+    current_price = np.round(listed_price * 0.97 ** cuts, -1)
+    active = days_on_market >= age_days
+    status = np.where(active, 'ACTIVE', rng.choice(STATUSES, listings, p=[0.7, 0.2, 0.1]))
+
+    is_no_fee = rng.random(listings) < np.where(doorman, 0.8, 0.45)
+    free_months = np.where(is_no_fee & (rng.random(listings) < 0.3), rng.choice([1, 2], listings, p=[0.8, 0.2]), 0)
+    lease_term = rng.choice([12, 12, 12, 18, 24], listings)
+    net_rent = np.round(current_price * (lease_term - free_months) / lease_term)
+
+    missing_bedrooms = rng.random(listings) < 0.01
+    missing_sqft = rng.random(listings) < 0.01
+
+    def text(values, blank=None):
+        values = np.asarray(values).astype(str)
+        return np.where(blank, '', values) if blank is not None else values
+
+    df = pd.DataFrame({
+        'address': text(building + 1) + ' ' + np.asarray(area, dtype=str) + ' Street',
+        'unit': text(rng.integers(1, 20, listings)) + np.array(list('ABCDEF'))[rng.integers(0, 6, listings)],
+        'source': np.where(rng.random(listings) < 0.9, 'streeteasy', 'vector'),
+        'building': text(building + 1),
+        'streeteasy_id': text(np.arange(listings) + 1000000),
+        'created_at': created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'listed_at': created_at.strftime('%Y-%m-%d'),
+        'last_run_date': run_date.strftime('%Y-%m-%d'),
+        'areaName': area,
+        'bedrooms': text(bedrooms, missing_bedrooms),
+        'bathrooms': text(np.maximum(1, bedrooms - (rng.random(listings) < 0.5))),
+        'size_sqft': text(size_sqft, missing_sqft),
+        'amenities': _amenity_text(unit_flags, list(UNIT_AMENITIES)),
+        'building_amenities': building_text[building],
+        'is_no_fee': text(is_no_fee.astype(int)),
+        'free_months': text(free_months),
+        'lease_term': text(lease_term),
+        'net_rent': text(net_rent),
+        'current_listed_price': text(current_price),
+        'current_days_on_market': text(days_on_market),
+        'current_status': status,
+    })
+    return df
+
+if __name__ == "__main__":
+    # python3 -m Services.Reports.synthetic [listings] [out.csv]
+    listings = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    df = synthetic_streeteasy_listings(listings)
+    if len(sys.argv) > 2:
+        df.to_csv(sys.argv[2], index=False)
+    else:
+        print(df.head(10).to_string())
@@ -0,0 +1,266 @@
+import ast
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from Services.Streeteasy.normalize import normalize_rentals, encode_json_columns
+from Services.Database.Bulk import bulk_upsert, ensure_unique_key, DEFAULT_CHUNK_SIZE
+from Services.Database.Units import build_unit_index
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+SAMPLE_PAYLOAD = os.path.join(FIXTURES_DIR, 'rentals_sample.json')
+
+# Stand-in for DESCRIBE streeteasy_units when benchmarking without a database
+OFFLINE_DB_COLUMNS = {
+    'address': 'varchar(255)', 'unit': 'varchar(50)', 'amenities': 'json', 'building_amenities': 'json',
+    'source': 'varchar(50)', 'id': 'varchar(50)', 'created_at': 'datetime', 'listed_at': 'datetime',
+    'price_history': 'json', 'description': 'text', 'listed_price': 'double', 'days_on_market': 'int',
+    'size_sqft': 'double', 'views_count': 'int', 'leads_count': 'int', 'saves_count': 'int',
+    'shares_count': 'int', 'status': 'varchar(50)', 'bathrooms': 'double', 'bedrooms': 'double',
+    'building': 'json', 'free_months': 'double', 'lease_term': 'double', 'total_featured_impressions': 'int',
+    'areaName': 'varchar(100)', 'longitude': 'double', 'latitude': 'double', 'is_no_fee': 'tinyint(1)',
+    'unit_id': 'int', 'run_date': 'date',
+}
+
+
+def load_payload(path=SAMPLE_PAYLOAD):
+    """Load the `rentals` items from a recorded Highlights response"""
+    with open(path) as f:
+        return json.load(f)['data']['rentals']
+
+def scale_payload(rentals, listings):
+    """Repeat a recorded payload up to `listings` items, giving each copy a unique id"""
+    scaled = []
+    while len(scaled) < listings:
+        for item in rentals[:listings - len(scaled)]:
+            copy = dict(item)
+            copy['id'] = str(len(scaled) + 1)
+            scaled.append(copy)
+    return scaled
+
+def legacy_normalize(rentals):
+    """The pre-normalizer path: repr the nested dicts, regex them back out per row, literal_eval the JSON"""
+    df = pd.DataFrame(rentals)
+
+    addresses = []
+    units = []
+    for _, row in df.iterrows():
+        address_str = str(row['address'])
+        pretty_address_match = re.search(r"'pretty_address': '([^']*)'", address_str)
+        unit_match = re.search(r"'unit': '([^']*)'", address_str)
+        addresses.append(pretty_address_match.group(1) if pretty_address_match else None)
+        units.append(unit_match.group(1).replace('#', '').strip() if unit_match else None)
+    df['address'] = addresses
+    df['unit'] = units
+
+    for column in ['amenities', 'agents', 'building', 'listing_traffics', 'price_history']:
+        df[column] = df[column].astype(str)
+    df['price_history'] = df['price_history'].apply(lambda val: json.dumps(ast.literal_eval(val)))
+    return df
+
+def time_call(func, *args, repeat=3):
+    """Best-of-N wall time in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench_normalize(listings=5000, payload_path=SAMPLE_PAYLOAD):
+    rentals = scale_payload(load_payload(payload_path), listings)
+
+    legacy = time_call(legacy_normalize, rentals)
+    typed = time_call(lambda items: encode_json_columns(normalize_rentals(items)), rentals)
+
+    result = {
+        'benchmark': 'normalize',
+        'listings': listings,
+        'legacy_seconds': round(legacy, 4),
+        'normalizer_seconds': round(typed, 4),
+        'speedup': round(legacy / typed, 2) if typed else None,
+    }
+    print(json.dumps(result))
+    return result
+
+def bench_upsert(row_counts=(10000, 100000, 1000000), chunk_size=DEFAULT_CHUNK_SIZE, block_rows=10000):
+    """
+    Time bulk_upsert into a scratch copy of streeteasy_units (needs a local database via DB_* env vars).
+
+    Rows are generated and written in blocks of block_rows so a 1M-row run never holds 1M rows in memory.
+    On a database without streeteasy_units (e.g. a fresh `docker run -e MYSQL_ROOT_PASSWORD=...
+    -p 3306:3306 mysql:8`) the scratch table is created from OFFLINE_DB_COLUMNS instead.
+    Prints one JSON line per size with rows_per_second.
+    """
+    from Services.Database.Connect import get_db_connection
+    from Services.Streeteasy.scrape_streeteasy import get_db_columns_and_types, prepare_batch, UPSERT_KEY
+
+    db_result = get_db_connection()
+    if db_result["status"] != "connected":
+        raise Exception("Database connection failed")
+    connection = db_result["connection"]
+
+    cursor = connection.cursor()
+    cursor.execute("DROP TABLE IF EXISTS streeteasy_units_bench")
+    cursor.execute(
+        "SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'streeteasy_units'"
+    )
+    if cursor.fetchone()[0]:
+        cursor.execute("CREATE TABLE streeteasy_units_bench LIKE streeteasy_units")
+    else:
+        columns = ', '.join(f"{col} {col_type}" for col, col_type in OFFLINE_DB_COLUMNS.items())
+        cursor.execute(f"CREATE TABLE streeteasy_units_bench (row_id INT AUTO_INCREMENT PRIMARY KEY, {columns})")
+    connection.commit()
+    cursor.close()
+    ensure_unique_key(connection, 'streeteasy_units_bench', 'uniq_streeteasy_listing_run', UPSERT_KEY)
+
+    db_columns = get_db_columns_and_types(connection, 'streeteasy_units_bench')
+    no_units = build_unit_index(pd.DataFrame(columns=['unit_id', 'address', 'unit']))
+    template = prepare_batch(load_payload(), no_units, db_columns, time.strftime('%Y-%m-%d'))
+    template = pd.concat([template] * (block_rows // len(template) + 1), ignore_index=True).iloc[:block_rows]
+
+    results = []
+    for row_count in row_counts:
+        elapsed = 0.0
+        for start in range(0, row_count, block_rows):
+            block = template.iloc[:min(block_rows, row_count - start)].copy()
+            block['id'] = [str(start + i + 1) for i in range(len(block))]
+
+            begin = time.perf_counter()
+            bulk_upsert(connection, 'streeteasy_units_bench', block, UPSERT_KEY, chunk_size)
+            elapsed += time.perf_counter() - begin
+
+        result = {
+            'benchmark': 'upsert',
+            'rows': row_count,
+            'chunk_size': chunk_size,
+            'seconds': round(elapsed, 2),
+            'rows_per_second': round(row_count / elapsed) if elapsed else None,
+        }
+        print(json.dumps(result))
+        results.append(result)
+
+    cursor = connection.cursor()
+    cursor.execute("DROP TABLE IF EXISTS streeteasy_units_bench")
+    connection.commit()
+    cursor.close()
+    connection.close()
+    return results
+
+def bench_scrape(listings=2000, latency=0.0, error_rate=0.0, recording_dir=None):
+    """
+    End-to-end scrape + ingest against replayed responses instead of StreetEasy.
+
+    Without recording_dir a recording is synthesized from the fixture payload. Each batch is
+    run through prepare_batch and row conversion, everything up to the INSERT; bench_upsert
+    times the write itself against a scratch table.
+    """
+    from Services.Streeteasy import replay, scrape_streeteasy
+    from Services.Database.Bulk import dataframe_rows
+    from Services.Streeteasy.scrape_streeteasy import prepare_batch
+
+    work_dir = tempfile.mkdtemp(prefix='streeteasy_replay_')
+    if recording_dir is None:
+        recording_dir = replay.build_recording(scale_payload(load_payload(), listings), os.path.join(work_dir, 'recording'))
+    csv_path = os.path.join(work_dir, 'snapshot.csv')
+    snapshot_dir = os.path.join(work_dir, 'parquet')
+
+    adapter = replay.replay_from(recording_dir, latency=latency, error_rate=error_rate, seed=0)
+    stats = {'rows': 0}
+    try:
+        begin = time.perf_counter()
+        no_units = build_unit_index(pd.DataFrame(columns=['unit_id', 'address', 'unit']))
+        run_date = time.strftime('%Y-%m-%d')
+
+        def ingest(batch_number, rentals, normalized):
+            df = prepare_batch(rentals, no_units, OFFLINE_DB_COLUMNS, run_date, normalized=normalized)
+            stats['rows'] += len(dataframe_rows(df))
+
+        scrape_streeteasy.scrape_streeteasy(on_batch=ingest, csv_path=csv_path, snapshot_dir=snapshot_dir)
+        elapsed = time.perf_counter() - begin
+    finally:
+        replay.stop_replay()
+
+    result = {
+        'benchmark': 'scrape',
+        'listings': listings,
+        'latency': latency,
+        'error_rate': error_rate,
+        'requests': adapter.requests_served,
+        'errors_injected': adapter.errors_injected,
+        'rows': stats['rows'],
+        'seconds': round(elapsed, 2),
+        'listings_per_second': round(stats['rows'] / elapsed, 1) if elapsed else None,
+    }
+    print(json.dumps(result))
+    return result
+
+def bench_snapshot_load(days=365, listings_per_day=1000, base_dir=None):
+    """
+    Time load_snapshots over `days` daily partitions of the scaled fixture payload: the full
+    history, a column subset, the last 30 days, and a pushed-down bedrooms filter.
+    """
+    import pyarrow.dataset as ds
+    from Services.Streeteasy import snapshots
+
+    base_dir = base_dir or os.path.join(tempfile.mkdtemp(prefix='streeteasy_snapshots_'), 'parquet')
+    day_frame = normalize_rentals(scale_payload(load_payload(), listings_per_day))
+    end = pd.Timestamp(time.strftime('%Y-%m-%d'))
+    begin = time.perf_counter()
+    for offset in range(days):
+        run_date = (end - pd.Timedelta(days=offset)).strftime('%Y-%m-%d')
+        snapshots.write_snapshot_batch(day_frame, run_date, 'bench', 1, base_dir)
+    write_seconds = time.perf_counter() - begin
+
+    columns = ['id', 'areaName', 'bedrooms', 'listed_price', 'size_sqft', 'run_date']
+    last_month = end - pd.Timedelta(days=29)
+    loads = {
+        'all_columns': lambda: snapshots.load_snapshots(base_dir=base_dir),
+        'report_columns': lambda: snapshots.load_snapshots(columns, base_dir=base_dir),
+        'last_30_days': lambda: snapshots.load_snapshots(columns, start_date=last_month, base_dir=base_dir),
+        'bedrooms_filter': lambda: snapshots.load_snapshots(columns, where=ds.field('bedrooms') <= 1, base_dir=base_dir),
+    }
+
+    result = {
+        'benchmark': 'snapshot_load',
+        'days': days,
+        'rows': days * len(day_frame),
+        'write_seconds': round(write_seconds, 2),
+    }
+    for name, load in loads.items():
+        begin = time.perf_counter()
+        rows = len(load())
+        result[f'{name}_seconds'] = round(time.perf_counter() - begin, 3)
+        result[f'{name}_rows'] = rows
+    print(json.dumps(result))
+    return result
+
+if __name__ == "__main__":
+    # python3 -m Services.Streeteasy.benchmarks normalize [listings] [payload.json]
+    # python3 -m Services.Streeteasy.benchmarks upsert [chunk_size]
+    # python3 -m Services.Streeteasy.benchmarks scrape [listings] [latency] [error_rate]
+    # python3 -m Services.Streeteasy.benchmarks snapshots [days] [listings_per_day]
+    command = sys.argv[1] if len(sys.argv) > 1 else 'normalize'
+    if command == 'snapshots':
+        bench_snapshot_load(
+            days=int(sys.argv[2]) if len(sys.argv) > 2 else 365,
+            listings_per_day=int(sys.argv[3]) if len(sys.argv) > 3 else 1000,
+        )
+    elif command == 'upsert':
+        bench_upsert(chunk_size=int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_CHUNK_SIZE)
+    elif command == 'scrape':
+        bench_scrape(
+            listings=int(sys.argv[2]) if len(sys.argv) > 2 else 2000,
+            latency=float(sys.argv[3]) if len(sys.argv) > 3 else 0.0,
+            error_rate=float(sys.argv[4]) if len(sys.argv) > 4 else 0.0,
+        )
+    else:
+        listings = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+        payload_path = sys.argv[3] if len(sys.argv) > 3 else SAMPLE_PAYLOAD
+        bench_normalize(listings, payload_path)
@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Point this at a mounted volume on Railway so a journal survives a redeploy
+JOURNAL_DIR = os.getenv('STREETEASY_JOURNAL_DIR', os.path.join(REPO_DIR, 'Logs', 'streeteasy_runs'))
+JOURNAL_FILE = os.path.join(JOURNAL_DIR, 'journal.json')
+PENDING_DIR = os.path.join(JOURNAL_DIR, 'pending')
+
+# The main thread records fetched batches while the DB writer thread records inserts
+_journal_lock = threading.Lock()
+
+
+def _write_json(path, data):
+    """Write JSON atomically so a crash mid-write never leaves a truncated file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def _pending_path(batch_number):
+    return os.path.join(PENDING_DIR, f'batch_{batch_number:05d}.json')
+
+def save_journal(journal):
+    journal['updated_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    _write_json(JOURNAL_FILE, journal)
+
+def new_journal():
+    """Start a fresh run journal, discarding any previous run's checkpoints"""
+    shutil.rmtree(JOURNAL_DIR, ignore_errors=True)
+    os.makedirs(PENDING_DIR, exist_ok=True)
+
+    journal = {
+        'run_id': time.strftime('%Y%m%d-%H%M%S'),
+        'run_date': time.strftime('%Y-%m-%d'),  # part of the streeteasy_units upsert key
+        'status': 'collecting',
+        'agents': {},               # agent_id -> listing ids collected for that agent
+        'listing_ids': None,        # all ids in batch order, set once collection is done
+        'fetched_batches': [],      # detail batches fetched (saved to pending/ until inserted)
+        'failed_fetches': [],       # detail batches whose request failed; fetched again on resume
+        'inserted_batches': [],     # detail batches committed to streeteasy_units
+        'started_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    save_journal(journal)
+    return journal
+
+def load_journal():
+    """Return the last unfinished run journal, or None if there is nothing to resume"""
+    if not os.path.exists(JOURNAL_FILE):
+        return None
+
+    try:
+        with open(JOURNAL_FILE) as f:
+            journal = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ Could not read scrape journal: {e}")
+        return None
+
+    if journal.get('status') == 'completed':
+        return None
+
+    os.makedirs(PENDING_DIR, exist_ok=True)
+    return journal
+
+def record_agent_ids(journal, agent_id, listing_ids):
+    with _journal_lock:
+        journal['agents'][str(agent_id)] = listing_ids
+        save_journal(journal)
+
+def record_listing_ids(journal, listing_ids):
+    with _journal_lock:
+        journal['listing_ids'] = listing_ids
+        journal['status'] = 'fetching'
+        save_journal(journal)
+
+def record_batch_fetched(journal, batch_number, rentals):
+    """Persist a fetched batch as a pending insert before it is handed to the writer"""
+    with _journal_lock:
+        _write_json(_pending_path(batch_number), rentals)
+        if batch_number not in journal['fetched_batches']:
+            journal['fetched_batches'].append(batch_number)
+        if batch_number in journal.setdefault('failed_fetches', []):
+            journal['failed_fetches'].remove(batch_number)
+        save_journal(journal)
+
+def record_batch_fetch_failed(journal, batch_number):
+    """Note a batch whose request failed, so the run isn't marked completed without it"""
+    with _journal_lock:
+        if batch_number not in journal.setdefault('failed_fetches', []):
+            journal['failed_fetches'].append(batch_number)
+        save_journal(journal)
+
+def record_batch_inserted(journal, batch_number):
+    with _journal_lock:
+        if os.path.exists(_pending_path(batch_number)):
+            os.remove(_pending_path(batch_number))
+        if batch_number not in journal['inserted_batches']:
+            journal['inserted_batches'].append(batch_number)
+        save_journal(journal)
+
+def pending_batches(journal):
+    """Yield (batch_number, rentals) for batches that were fetched but never inserted"""
+    for batch_number in sorted(journal['fetched_batches']):
+        if batch_number in journal['inserted_batches']:
+            continue
+        path = _pending_path(batch_number)
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            yield batch_number, json.load(f)
+
+def finish_journal(journal, status):
+    """Mark the run finished; a 'completed' run clears its pending inserts"""
+    with _journal_lock:
+        journal['status'] = status
+        if status == 'completed':
+            shutil.rmtree(PENDING_DIR, ignore_errors=True)
+        save_journal(journal)
@@ -0,0 +1,158 @@
+import json
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+
+# Scalar fields copied straight from each `rentals` item
+SCALAR_FIELDS = [
+    'id', 'source', 'created_at', 'listed_at', 'description', 'listed_price', 'days_on_market',
+    'size_sqft', 'views_count', 'leads_count', 'saves_count', 'shares_count', 'status',
+    'bathrooms', 'bedrooms', 'anyrooms', 'has_historical_activity', 'is_no_fee',
+    'actual_is_collect_your_own_fee',
+]
+
+# Nested building fields flattened to building_<field>
+BUILDING_FIELDS = [
+    'active_listings_count', 'active_rentals_count', 'building_class_description',
+    'building_classification', 'building_type', 'floor_count', 'title', 'year_built',
+]
+
+NUMERIC_FIELDS = [
+    'listed_price', 'days_on_market', 'size_sqft', 'views_count', 'leads_count', 'saves_count',
+    'shares_count', 'bathrooms', 'bedrooms', 'anyrooms', 'latitude', 'longitude',
+    'free_months', 'lease_term', 'building_active_listings_count', 'building_active_rentals_count',
+    'building_floor_count', 'building_year_built',
+]
+
+# Columns holding lists/dicts - stored as JSON text in streeteasy_units
+JSON_COLUMNS = ['amenities', 'building_amenities', 'agents', 'price_history', 'listing_traffics', 'building']
+
+TRAFFIC_FIELDS = ['views', 'search_impressions', 'featured_impressions']
+
+# Listings with an agent on this email domain are ours (is_vector)
+VECTOR_EMAIL_DOMAIN = '@vectorny.com'
+
+
+def _field(items, key):
+    return [item.get(key) for item in items]
+
+def _nested(objs, key):
+    return [obj.get(key) if obj else None for obj in objs]
+
+def _names(lists):
+    return [[entry['name'] for entry in values if entry.get('name')] if values else [] for values in lists]
+
+def _clean_unit(units):
+    return [unit.replace('#', '').strip() if unit else None for unit in units]
+
+def traffic_totals(traffics):
+    """Sum listing_traffics per listing in one pass over all rows of the batch"""
+    lengths = np.fromiter((len(t) if t else 0 for t in traffics), dtype=np.int64, count=len(traffics))
+    totals = pd.DataFrame(0, index=range(len(traffics)), columns=TRAFFIC_FIELDS, dtype='int64')
+
+    if lengths.sum() == 0:
+        return totals
+
+    daily = pd.DataFrame.from_records(chain.from_iterable(t for t in traffics if t), columns=TRAFFIC_FIELDS)
+    daily = daily.apply(pd.to_numeric, errors='coerce').fillna(0)
+    daily['listing'] = np.repeat(np.arange(len(traffics)), lengths)
+
+    sums = daily.groupby('listing')[TRAFFIC_FIELDS].sum()
+    totals.loc[sums.index, TRAFFIC_FIELDS] = sums.astype('int64').values
+    return totals
+
+def normalize_rentals(rentals):
+    """
+    Map a batch of GraphQL `rentals` items straight into a flat, typed DataFrame.
+
+    Nested objects are read directly from the decoded JSON column by column, so
+    nothing is stringified and parsed back. List fields stay Python lists; use
+    encode_json_columns before writing them to the database.
+    """
+    rentals = [item for item in rentals if item]
+    if not rentals:
+        return pd.DataFrame()
+
+    df = pd.DataFrame({field: _field(rentals, field) for field in SCALAR_FIELDS})
+
+    addresses = _field(rentals, 'address')
+    df['address'] = _nested(addresses, 'pretty_address')
+    df['unit'] = _clean_unit(_nested(addresses, 'unit'))
+
+    df['amenities'] = _names(_field(rentals, 'amenities'))
+    df['agents'] = _field(rentals, 'agents')
+    df['price_history'] = _field(rentals, 'price_history')
+    df['listing_traffics'] = _field(rentals, 'listing_traffics')
+    df['featured_details'] = _field(rentals, 'featured_details')
+    df['areaName'] = _nested(_field(rentals, 'area'), 'name')
+
+    concessions = _field(rentals, 'concessions')
+    df['free_months'] = _nested(concessions, 'free_months')
+    df['lease_term'] = _nested(concessions, 'lease_term')
+
+    buildings = _field(rentals, 'building')
+    df['building'] = buildings
+    df['building_amenities'] = _names(_nested(buildings, 'amenities'))
+    df['latitude'] = _nested(buildings, 'front_lat')
+    df['longitude'] = _nested(buildings, 'front_lon')
+    for field in BUILDING_FIELDS:
+        column = field if field.startswith('building_') else f'building_{field}'
+        df[column] = _nested(buildings, field)
+
+    totals = traffic_totals(df['listing_traffics'].tolist())
+    df['total_views'] = totals['views'].values
+    df['total_search_impressions'] = totals['search_impressions'].values
+    df['total_featured_impressions'] = totals['featured_impressions'].values
+    df['total_impressions'] = df['total_search_impressions'] + df['total_featured_impressions']
+
+    df['listed_price'] = df['listed_price'].replace(r'[$,]', '', regex=True)
+    for column in NUMERIC_FIELDS:
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    df['id'] = df['id'].astype(str)
+    for column in ['created_at', 'listed_at']:
+        # Keep New York wall-clock time, which is what the offsets in the payload encode
+        df[column] = pd.to_datetime(df[column], errors='coerce', utc=True).dt.tz_convert('America/New_York').dt.tz_localize(None)
+
+    return df
+
+def derive_metrics(df, as_of=None):
+    """
+    Add the metrics streeteasy_units stores alongside the raw fields, vectorized over a batch:
+
+    - net_rent: net effective rent, listed_price * (lease_term - free_months) / lease_term
+      when there is a concession, otherwise listed_price
+    - ctr: total_views / total_impressions (NULL with no impressions)
+    - calc_dom: days from listed_at to as_of (the run date; today by default)
+    - is_vector: 1 if any listing agent has a Vector email address
+    """
+    df = df.copy()
+    as_of = pd.Timestamp(as_of if as_of is not None else pd.Timestamp.now().normalize())
+
+    lease_term = df['lease_term'].astype(float)
+    free_months = df['free_months'].fillna(0).astype(float)
+    listed_price = df['listed_price'].astype(float)
+    has_concession = (free_months > 0) & (lease_term > free_months)
+    df['net_rent'] = listed_price.where(~has_concession, listed_price * (lease_term - free_months) / lease_term).round(2)
+
+    impressions = df['total_impressions'].astype(float)
+    df['ctr'] = (df['total_views'] / impressions.where(impressions > 0)).round(4)
+
+    listed_at = pd.to_datetime(df['listed_at'], errors='coerce').dt.normalize()
+    df['calc_dom'] = (as_of - listed_at).dt.days.clip(lower=0).astype('Int64')
+
+    df['is_vector'] = [
+        int(any(VECTOR_EMAIL_DOMAIN in str(agent.get('email') or '').lower() for agent in agents if agent))
+        if agents else 0
+        for agents in df['agents']
+    ]
+    return df
+
+def encode_json_columns(df, columns=JSON_COLUMNS):
+    """Serialize list/dict columns to JSON text (None stays NULL)"""
+    df = df.copy()
+    for column in columns:
+        if column in df.columns:
+            df[column] = [json.dumps(value) if value is not None else None for value in df[column]]
+    return df
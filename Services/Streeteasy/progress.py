@@ -0,0 +1,154 @@
+import fcntl
+import json
+import os
+import threading
+import time
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Shared through the filesystem so every gunicorn worker sees the same run, wherever it was started from
+PROGRESS_FILE = os.getenv('STREETEASY_PROGRESS_FILE', os.path.join(REPO_DIR, 'Logs', 'streeteasy_progress.json'))
+LOCK_FILE = os.getenv('STREETEASY_LOCK_FILE', os.path.join(REPO_DIR, 'Logs', 'streeteasy_scrape.lock'))
+MAX_ERRORS = 50
+
+_progress = {}
+_progress_lock = threading.Lock()
+_run_lock_handle = None
+
+
+def _now():
+    return time.strftime('%Y-%m-%d %H:%M:%S')
+
+def _write_progress():
+    os.makedirs(os.path.dirname(PROGRESS_FILE) or '.', exist_ok=True)
+    tmp_path = f"{PROGRESS_FILE}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(_progress, f)
+    os.replace(tmp_path, PROGRESS_FILE)
+
+def _update_rates():
+    """Recompute listings/sec and the ETA from the fetch phase so far"""
+    fetch_started = _progress.get('fetch_started_at')
+    fetched_now = _progress['batches_fetched'] - _progress.get('batches_skipped', 0)
+    if not fetch_started or fetched_now <= 0:
+        return
+
+    elapsed = time.time() - fetch_started
+    _progress['listings_per_second'] = round(_progress['listings_fetched'] / elapsed, 2) if elapsed else None
+
+    remaining = max(_progress['batches_total'] - _progress['batches_fetched'], 0)
+    eta_seconds = round(remaining * elapsed / fetched_now)
+    _progress['eta_seconds'] = eta_seconds
+    _progress['eta'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time() + eta_seconds))
+
+def acquire_run_lock():
+    """Take the cross-process scrape lock; returns False if another scrape holds it"""
+    global _run_lock_handle
+    os.makedirs(os.path.dirname(LOCK_FILE) or '.', exist_ok=True)
+    handle = open(LOCK_FILE, 'w')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+
+    _run_lock_handle = handle
+    return True
+
+def release_run_lock():
+    """Release the scrape lock (the OS also drops it if the process dies)"""
+    global _run_lock_handle
+    if _run_lock_handle is None:
+        return
+    try:
+        fcntl.flock(_run_lock_handle, fcntl.LOCK_UN)
+    finally:
+        _run_lock_handle.close()
+        _run_lock_handle = None
+
+def start_progress(resume=False):
+    with _progress_lock:
+        _progress.clear()
+        _progress.update({
+            'status': 'running',
+            'message': 'Scraping resumed' if resume else 'Scraping started',
+            'phase': 'starting',
+            'run_id': None,
+            'agent': None,
+            'page': None,
+            'agents_done': 0,
+            'agents_total': 0,
+            'listings_collected': 0,
+            'batches_total': 0,
+            'batches_fetched': 0,
+            'batches_skipped': 0,
+            'batches_written': 0,
+            'listings_fetched': 0,
+            'rows_written': 0,
+            'listings_per_second': None,
+            'eta_seconds': None,
+            'eta': None,
+            'errors': [],
+            'started_at': _now(),
+            'timestamp': _now(),
+        })
+        _write_progress()
+
+def update_progress(**fields):
+    """Set progress fields; counters ending in _add are added instead (e.g. rows_written_add=10)"""
+    with _progress_lock:
+        if not _progress:
+            return
+        for key, value in fields.items():
+            if key.endswith('_add'):
+                key = key[:-len('_add')]
+                _progress[key] = _progress.get(key, 0) + value
+            else:
+                _progress[key] = value
+
+        if fields.get('phase') == 'fetching' and not _progress.get('fetch_started_at'):
+            _progress['fetch_started_at'] = time.time()
+
+        _update_rates()
+        _progress['timestamp'] = _now()
+        _write_progress()
+
+def add_error(message):
+    with _progress_lock:
+        if not _progress:
+            return
+        _progress['errors'] = (_progress['errors'] + [{'message': message, 'timestamp': _now()}])[-MAX_ERRORS:]
+        _progress['timestamp'] = _now()
+        _write_progress()
+
+def finish_progress(status, message):
+    with _progress_lock:
+        if not _progress:
+            return
+        _progress.update({
+            'status': status,
+            'message': message,
+            'phase': 'done' if status == 'completed' else _progress.get('phase'),
+            'eta_seconds': 0 if status == 'completed' else None,
+            'finished_at': _now(),
+            'timestamp': _now(),
+        })
+        _write_progress()
+
+def read_progress():
+    """Current progress for any worker, without consuming it"""
+    try:
+        with open(PROGRESS_FILE) as f:
+            progress = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {"status": "idle", "message": "No scrape has run yet", "timestamp": _now()}
+
+    # A 'running' file whose lock is free means the process died mid-run
+    if progress.get('status') == 'running' and _run_lock_handle is None and acquire_run_lock():
+        release_run_lock()
+        progress['status'] = 'interrupted'
+        progress['message'] = 'Scrape stopped before finishing - start it again with resume=true'
+
+    progress.pop('fetch_started_at', None)
+    return progress
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import random
+import time
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.models import Response
+
+from Services.Streeteasy import scrape_streeteasy
+
+
+GRAPHQL_PREFIX = 'https://api-internal.streeteasy.com/'
+
+# Live adapter and delays replaced by replay_from, put back by stop_replay
+_saved = {}
+
+
+def request_key(body):
+    """Stable key for a GraphQL request: operation name + variables (query text is ignored)"""
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    payload = json.loads(body or '{}')
+    canonical = json.dumps({'operationName': payload.get('operationName'), 'variables': payload.get('variables')}, sort_keys=True)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+def _json_response(request, status_code, payload):
+    response = Response()
+    response.status_code = status_code
+    response._content = json.dumps(payload).encode('utf-8')
+    response.headers['Content-Type'] = 'application/json'
+    response.encoding = 'utf-8'
+    response.url = request.url
+    response.request = request
+    return response
+
+def save_exchange(directory, body, status_code, payload):
+    """Write one request/response pair as <key>.json"""
+    os.makedirs(directory, exist_ok=True)
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    exchange = {'request': json.loads(body or '{}'), 'status_code': status_code, 'response': payload}
+    with open(os.path.join(directory, f'{request_key(body)}.json'), 'w') as f:
+        json.dump(exchange, f)
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Sends requests for real and saves every GraphQL exchange to `directory`"""
+
+    def __init__(self, directory, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        try:
+            save_exchange(self.directory, request.body, response.status_code, response.json())
+        except ValueError:
+            pass  # Non-JSON responses (e.g. bot challenges) aren't worth replaying
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Answers GraphQL requests from a recording directory instead of the network.
+
+    latency adds a fixed delay per request; error_rate is the chance of answering 503
+    instead of the recording, to exercise the scraper's error paths.
+    """
+
+    def __init__(self, directory, latency=0.0, error_rate=0.0, seed=None):
+        super().__init__()
+        self.directory = directory
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests_served = 0
+        self.errors_injected = 0
+
+    def send(self, request, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        self.requests_served += 1
+
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors_injected += 1
+            return _json_response(request, 503, {'errors': [{'message': 'Injected replay error'}]})
+
+        path = os.path.join(self.directory, f'{request_key(request.body)}.json')
+        if not os.path.exists(path):
+            return _json_response(request, 404, {'errors': [{'message': 'No recording for this request'}]})
+
+        with open(path) as f:
+            exchange = json.load(f)
+        return _json_response(request, exchange['status_code'], exchange['response'])
+
+    def close(self):
+        pass
+
+
+def record_to(directory):
+    """Record every StreetEasy GraphQL exchange the scraper makes from now on"""
+    adapter = RecordingAdapter(directory)
+    scrape_streeteasy.http_session.mount(GRAPHQL_PREFIX, adapter)
+    return adapter
+
+def replay_from(directory, latency=0.0, error_rate=0.0, seed=None, rate_limit=False):
+    """
+    Serve the scraper's GraphQL calls from a recording.
+
+    Unless rate_limit is True the scraper's politeness delays are switched off, since
+    nothing is being rate limited. Call stop_replay() to restore live behaviour.
+    """
+    if not _saved:
+        _saved.update({
+            'adapter': scrape_streeteasy.http_session.adapters.get(GRAPHQL_PREFIX),
+            'agent_delay_range': scrape_streeteasy.AGENT_DELAY_RANGE,
+            'request_delays': scrape_streeteasy.REQUEST_DELAYS,
+        })
+    adapter = ReplayAdapter(directory, latency, error_rate, seed)
+    scrape_streeteasy.http_session.mount(GRAPHQL_PREFIX, adapter)
+    if not rate_limit:
+        scrape_streeteasy.AGENT_DELAY_RANGE = (0, 1)
+        scrape_streeteasy.REQUEST_DELAYS = [0]
+    return adapter
+
+def stop_replay():
+    """Undo replay_from: the adapter and delays in place before it are restored"""
+    if not _saved:
+        return
+    if _saved['adapter'] is None:
+        scrape_streeteasy.http_session.adapters.pop(GRAPHQL_PREFIX, None)
+    else:
+        scrape_streeteasy.http_session.mount(GRAPHQL_PREFIX, _saved['adapter'])
+    scrape_streeteasy.AGENT_DELAY_RANGE = _saved['agent_delay_range']
+    scrape_streeteasy.REQUEST_DELAYS = _saved['request_delays']
+    _saved.clear()
+
+def build_recording(rentals, directory, agent_ids=None, page_size=50, batch_size=None):
+    """
+    Write a replayable recording for a list of `rentals` items (e.g. a scaled fixture payload).
+
+    Listings are dealt out to the agents round-robin, paginated page_size per page,
+    and the detail requests are recorded in the batches the scraper will ask for.
+    """
+    agent_ids = agent_ids or scrape_streeteasy.AGENT_IDS
+    batch_size = batch_size or scrape_streeteasy.DETAIL_BATCH_SIZE
+    by_id = {str(item['id']): item for item in rentals}
+
+    agent_listings = {agent_id: [] for agent_id in agent_ids}
+    for i, item in enumerate(rentals):
+        agent_listings[agent_ids[i % len(agent_ids)]].append(str(item['id']))
+
+    all_ids = []
+    for agent_id in agent_ids:
+        ids = agent_listings[agent_id]
+        pages = [ids[i:i + page_size] for i in range(0, len(ids), page_size)] or [[]]
+        for page_number, page_ids in enumerate(pages, start=1):
+            body = json.dumps({
+                'operationName': 'getPaginatedListings',
+                'variables': {'id': agent_id, 'listingType': 'rental', 'page': page_number},
+            })
+            save_exchange(directory, body, 200, {'data': {'agent_active_listings_paginated': {
+                'items': [{'id': listing_id} for listing_id in page_ids],
+                'page_info': {'current_page': page_number, 'total_pages': len(pages), 'has_next_page': page_number < len(pages)},
+            }}})
+        all_ids.extend(ids)
+
+    for i in range(0, len(all_ids), batch_size):
+        batch_ids = all_ids[i:i + batch_size]
+        body = json.dumps({'operationName': 'Highlights', 'variables': {'listing_ids': [int(val) for val in batch_ids]}})
+        save_exchange(directory, body, 200, {'data': {'rentals': [by_id[listing_id] for listing_id in batch_ids]}})
+
+    return directory
+
+if __name__ == "__main__":
+    # python3 -m Services.Streeteasy.replay record <dir>      live scrape, saving every response
+    # python3 -m Services.Streeteasy.replay build <dir> [n]   synthesize a recording from the fixture
+    import sys
+    from Services.Streeteasy.benchmarks import load_payload, scale_payload
+
+    command, directory = sys.argv[1], sys.argv[2]
+    if command == 'record':
+        record_to(directory)
+        scrape_streeteasy.scrape_streeteasy(csv_path=os.path.join(directory, 'snapshot.csv'))
+    elif command == 'build':
+        listings = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+        build_recording(scale_payload(load_payload(), listings), directory)
+        print(f"Wrote recording for {listings} listings to {directory}")
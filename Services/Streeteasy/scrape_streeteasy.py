@@ -3,16 +3,29 @@ import time
 import numpy as np
 import pandas as pd
 import json
-import re
-import ast
 from Services.Database.Connect import get_db_connection
 from Services.Database.Data import run_query_system
+from Services.Database.Bulk import bulk_upsert, ensure_unique_key, ensure_index, ensure_column, DEFAULT_CHUNK_SIZE
+from Services.Database.Units import load_unit_index, resolve_units, unmatched_report
+from Services.Streeteasy import journal as run_journal
+from Services.Streeteasy import progress
+from Services.Streeteasy import snapshots
+from Services.Streeteasy import traffic
+from Services.Streeteasy.normalize import normalize_rentals, derive_metrics, encode_json_columns, TRAFFIC_FIELDS
 import os
+import sys
 import threading
 import queue
 
 
 url = "https://api-internal.streeteasy.com/graphql"
+
+# All GraphQL calls go through this session so a recording/replay adapter can be mounted on it
+http_session = requests.Session()
+
+# Seconds to wait before each agent and between requests, to stay under StreetEasy's rate limit
+AGENT_DELAY_RANGE = (6, 12)
+REQUEST_DELAYS = [15, 16, 19, 25]
 cookies = {
     '_actor': 'eyJpZCI6IkdGd3E5R09hZXFMeE95dzMwY1ExZ1E9PSJ9--4ac1bcd3d25ac5f9ce9277186c92865e7ff35cb0',
     '_se_t': '1548e115-aa92-4424-b6ab-4396acfe2a0f',
@@ -112,7 +125,8 @@ def convert_column_types(df, db_columns):
             elif 'json' in db_type:
                 df[column] = df[column]
             else:
-                df[column] = df[column].astype(str)
+                # Keep NULLs as NULL rather than the strings 'None'/'nan'
+                df[column] = df[column].astype(str).where(df[column].notna(), None)
     return df
 
 # Drop columns not in DB table
@@ -134,24 +148,149 @@ def clean_list_column(df, column_name):
     return df
 
 
-def scrape_streeteasy():    
-    agents = ['lunzer', '685']
-    agent_ids = [348933, 348649, 365551, 348650, 348652, 360856, 360857, 360860, 369098]
+AGENT_IDS = [348933, 348649, 365551, 348650, 348652, 360856, 360857, 360860, 369098]
+DETAIL_BATCH_SIZE = 100
+WRITE_QUEUE_SIZE = 2
+CSV_SNAPSHOT_PATH = 'Streeteasy Data.csv'
+
+# A listing is stored once per run; re-running or resuming the same day updates it in place
+UPSERT_KEY = ['id', 'run_date']
+
+# Bumped by MySQL whenever an upsert inserts or changes a row, so readers can tell a same-day
+# rescrape apart; indexed with run_date so MAX() of either is a single index lookup
+VERSION_COLUMN = ('updated_at', 'TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP')
+VERSION_INDEXES = {'idx_streeteasy_run_date': ['run_date'], 'idx_streeteasy_updated_at': ['updated_at']}
+
+AGENT_LISTINGS_QUERY = """
+    query getPaginatedListings($id: ID!, $listingType: String, $page: Int) {
+    agent_active_listings_paginated(input: {id: $id, listing_type: $listingType, page: $page}) {
+        items {
+        id
+        }
+        page_info {
+        current_page
+        total_pages
+        has_next_page
+        }
+    }
+    }
+"""
+
+LISTING_DETAILS_QUERY = '''query Highlights($listing_ids: [ID!]!) {
+    rentals(ids: $listing_ids) {
+        price_history { date description price }
+        address   { pretty_address unit }
+        amenities { name }
+        agents    { name email }
+        source
+        id
+        created_at
+        listed_at
+        description
+        listed_price
+        days_on_market
+        dynamic_insight
+        size_sqft
+
+        views_count
+    
+        leads_count
+        saves_count
+        shares_count
+
+        status
+
+        __typename
+        bathrooms
+        bedrooms
+
+        comparable_listings { id address { pretty_address } bedrooms bathrooms listed_price}
+        interesting_changes { type value when }
+        has_historical_activity
+        anyrooms
+        featured_details {
+            clicks
+            id
+            ends_at
+            location
+            is_homepage_featured_listing
+        }
+        images (max_count: 10) {
+            url
+        }
+        listing_traffics (days: TRAFFIC_DAYS) {
+            date featured_impressions id search_impressions views
+        }
+        concessions{
+            free_months
+            lease_term
+        }
+        floorplans{
+        url
+        }
+        area{
+            
+            name
+        
+        }
+        building{
+            active_listings_count 
+            active_rentals_count
+            front_lat
+            front_lon
+            amenities{
+                name
+            }
+            building_class_description
+            building_classification
+            building_type
+            floor_count
+
+            title
+            year_built
+        }
+        actual_is_collect_your_own_fee
+        is_no_fee
+        
+    }
+}'''
+
+
+def listing_details_query(traffic_days=traffic.FULL_HISTORY_DAYS):
+    return LISTING_DETAILS_QUERY.replace('TRAFFIC_DAYS', str(int(traffic_days)))
+
+
+def collect_listing_ids(agent_ids=AGENT_IDS, journal=None):
+    """
+    Page through each agent's active rentals and return every listing id.
+
+    With a journal, agents collected by an earlier attempt are reused instead of re-fetched.
+    """
     all_ids = []
     agent_totals = {}  # Track totals per agent
 
     print("\n🔍 Starting StreetEasy scrape...")
     print("━" * 50)
+    progress.update_progress(phase='collecting', agents_total=len(agent_ids))
 
     for agent_id in agent_ids:
+        if journal is not None and str(agent_id) in journal['agents']:
+            listing_ids = journal['agents'][str(agent_id)]
+            agent_totals[agent_id] = len(listing_ids)
+            all_ids.extend(listing_ids)
+            progress.update_progress(agent=agent_id, agents_done_add=1, listings_collected_add=len(listing_ids))
+            print(f"\n↩️ Agent {agent_id}: {len(listing_ids)} listings restored from checkpoint")
+            continue
+
         print(f"\n📊 Agent {agent_id}")
         print("─" * 30)
         page = 1
         has_next = True
-        agent_ids = []  # Track IDs for this agent
-        time.sleep(np.random.randint(6,12))
+        listing_ids = []  # Track IDs for this agent
+        time.sleep(np.random.randint(*AGENT_DELAY_RANGE))
         
         while has_next:
+            progress.update_progress(agent=agent_id, page=page)
             payload = {
                 "operationName": "getPaginatedListings",
                 "variables": {
@@ -159,26 +298,14 @@ def scrape_streeteasy():
                     "listingType": "rental",
                     "page": page
                 },
-                "query": """
-                    query getPaginatedListings($id: ID!, $listingType: String, $page: Int) {
-                    agent_active_listings_paginated(input: {id: $id, listing_type: $listingType, page: $page}) {
-                        items {
-                        id
-                        }
-                        page_info {
-                        current_page
-                        total_pages
-                        has_next_page
-                        }
-                    }
-                    }
-                """
+                "query": AGENT_LISTINGS_QUERY
             }
 
-            response = requests.post(url, headers=headers, cookies=cookies, json=payload)
+            response = http_session.post(url, headers=headers, cookies=cookies, json=payload)
             
             if response.status_code != 200:
                 print(f"❌ Page {page}: Failed with status {response.status_code}")
+                progress.add_error(f"Agent {agent_id} page {page}: status {response.status_code}")
                 break
             
             try:
@@ -187,21 +314,25 @@ def scrape_streeteasy():
                 page_info = data['data']['agent_active_listings_paginated']['page_info']
                 
                 ids_this_page = [item['id'] for item in items]
-                agent_ids.extend(ids_this_page)
+                listing_ids.extend(ids_this_page)
                 
                 print(f"✓ Page {page}/{page_info['total_pages']}: {len(ids_this_page)} listings")
                 
                 has_next = page_info['has_next_page']
                 page += 1
-                time.sleep(np.random.choice([15, 16,19,25]))
+                time.sleep(np.random.choice(REQUEST_DELAYS))
                 
             except (KeyError, requests.exceptions.JSONDecodeError) as e:
                 print(f"❌ Page {page}: Error processing data")
+                progress.add_error(f"Agent {agent_id} page {page}: could not parse response")
                 break
 
-        agent_totals[agent_id] = len(agent_ids)
-        all_ids.extend(agent_ids)
-        print(f"📈 Agent {agent_id}: {len(agent_ids)} total listings")
+        agent_totals[agent_id] = len(listing_ids)
+        all_ids.extend(listing_ids)
+        if journal is not None:
+            run_journal.record_agent_ids(journal, agent_id, listing_ids)
+        progress.update_progress(agents_done_add=1, listings_collected_add=len(listing_ids))
+        print(f"📈 Agent {agent_id}: {len(listing_ids)} total listings")
 
     print("\n" + "━" * 50)
     print("📊 Collection Summary:")
@@ -210,351 +341,398 @@ def scrape_streeteasy():
     print(f"📈 Total listings collected: {len(all_ids)}")
     print("━" * 50 + "\n")
 
-    final_df = pd.DataFrame()
-    grouped_ids = [all_ids[i:i + 100] for i in range(0, len(all_ids), 100)]
+    return all_ids
+
+def fetch_listing_batches(all_ids, batch_size=DETAIL_BATCH_SIZE, skip_batches=(), traffic_days=None, on_failed=None):
+    """
+    Yield (batch_number, total_batches, rentals) for each batch of listing ids.
+
+    The rate-limit sleep happens when the next batch is requested, so whatever the
+    caller does with a batch (e.g. handing it to the DB writer) overlaps the wait.
+    Batch numbers in skip_batches (already fetched by an earlier attempt) are not requested.
+    traffic_days ({listing_id: days}) limits how much listing_traffics history each batch
+    asks for; without it every listing gets the full history.
+    on_failed(batch_number) is called for a batch whose request fails or can't be parsed.
+    """
+    grouped_ids = [all_ids[i:i + batch_size] for i in range(0, len(all_ids), batch_size)]
     
     print("🔄 Fetching detailed listing data...")
     print("━" * 50)
+    progress.update_progress(phase='fetching', agent=None, page=None, batches_total=len(grouped_ids))
     
+    requested = 0
     for i, rental_ids in enumerate(grouped_ids):
+        if i + 1 in skip_batches:
+            print(f"↩️ Batch {i+1}/{len(grouped_ids)}: already fetched, skipping")
+            progress.update_progress(batches_fetched_add=1, batches_skipped_add=1)
+            continue
+
+        if requested > 0:
+            time.sleep(np.random.choice(REQUEST_DELAYS))
+        requested += 1
+
         json_data = {
             'operationName': 'Highlights',
             'variables': {
                 'listing_ids': [int(val) for val in rental_ids],  
             },
-            'query': '''query Highlights($listing_ids: [ID!]!) {
-                rentals(ids: $listing_ids) {
-                    price_history { date description price }
-                    address   { pretty_address unit }
-                    amenities { name }
-                    agents    { name email }
-                    source
-                    id
-                    created_at
-                    listed_at
-                    description
-                    listed_price
-                    days_on_market
-                    dynamic_insight
-                    size_sqft
-
-                    views_count
-                
-                    leads_count
-                    saves_count
-                    shares_count
-
-                    status
-
-                    __typename
-                    bathrooms
-                    bedrooms
-
-                    comparable_listings { id address { pretty_address } bedrooms bathrooms listed_price}
-                    interesting_changes { type value when }
-                    has_historical_activity
-                    anyrooms
-                    featured_details {
-                        clicks
-                        id
-                        ends_at
-                        location
-                        is_homepage_featured_listing
-                    }
-                    images (max_count: 10) {
-                        url
-                    }
-                    listing_traffics (days: 1000) {
-                        date featured_impressions id search_impressions views
-                    }
-                    concessions{
-                        free_months
-                        lease_term
-                    }
-                    floorplans{
-                    url
-                    }
-                    area{
-                        
-                        name
-                    
-                    }
-                    building{
-                        active_listings_count 
-                        active_rentals_count
-                        front_lat
-                        front_lon
-                        amenities{
-                            name
-                        }
-                        building_class_description
-                        building_classification
-                        building_type
-                        floor_count
-
-                        title
-                        year_built
-                    }
-                    actual_is_collect_your_own_fee
-                    is_no_fee
-                    
-                }
-            }''',
+            'query': listing_details_query(batch_traffic_days(rental_ids, traffic_days)),
         }
 
-        response = requests.post('https://api-internal.streeteasy.com/graphql', cookies=cookies, headers=headers, json=json_data)
+        response = http_session.post(url, cookies=cookies, headers=headers, json=json_data)
         
         if response.status_code != 200:
             print(f"❌ Batch {i+1}/{len(grouped_ids)}: Failed with status {response.status_code}")
+            progress.add_error(f"Batch {i+1}: status {response.status_code}")
+            if on_failed is not None:
+                on_failed(i + 1)
             continue
             
         try:
-            batch_data = response.json()
-            batch_df = pd.DataFrame(batch_data['data']['rentals'])
-            final_df = pd.concat([final_df, batch_df])
-            print(f"✓ Batch {i+1}/{len(grouped_ids)}: {len(batch_df)} listings processed")
+            rentals = response.json()['data']['rentals']
         except Exception as e:
             print(f"❌ Batch {i+1}/{len(grouped_ids)}: Error processing data")
+            progress.add_error(f"Batch {i+1}: could not parse response")
+            if on_failed is not None:
+                on_failed(i + 1)
             continue
-            
-        time.sleep(np.random.choice([15, 16,19,25]))
+
+        progress.update_progress(batches_fetched_add=1, listings_fetched_add=len(rentals))
+        yield i + 1, len(grouped_ids), rentals
+
+def batch_traffic_days(rental_ids, traffic_days=None):
+    """Days of traffic a batch needs - the most any listing in it needs"""
+    if traffic_days is None:
+        return traffic.FULL_HISTORY_DAYS
+    return max(traffic_days.get(str(val), traffic.FULL_HISTORY_DAYS) for val in rental_ids)
+
+def scrape_streeteasy(on_batch=None, csv_path=CSV_SNAPSHOT_PATH, journal=None, traffic_days=None, snapshot_dir=None):
+    """
+    Scrape all agent listings batch by batch.
+
+    Each batch is appended to the CSV snapshot, normalized once and written as a Parquet part of
+    the run's snapshot partition (under snapshot_dir, default snapshots.SNAPSHOT_DIR), then its raw
+    `rentals` items and normalized frame are passed to on_batch(batch_number, rentals, batch_df)
+    as soon as they arrive, so only one batch is held in memory at a time.
+    With a journal, every step is checkpointed and work from an earlier attempt is skipped.
+    With traffic_days ({listing_id: days}) only that much listing_traffics history is requested,
+    and listings are ordered by it so one new listing doesn't pull full history for a whole batch.
+    Returns the number of listings scraped.
+    """
+    if journal is not None and journal['listing_ids'] is not None:
+        all_ids = journal['listing_ids']
+        print(f"↩️ Resuming run {journal['run_id']}: {len(all_ids)} listings already collected")
+    else:
+        all_ids = collect_listing_ids(journal=journal)
+        if traffic_days is not None:
+            all_ids = sorted(all_ids, key=lambda val: traffic_days.get(str(val), traffic.FULL_HISTORY_DAYS))
+        if journal is not None:
+            run_journal.record_listing_ids(journal, all_ids)
+
+    skip_batches = set(journal['fetched_batches']) if journal is not None else set()
+
+    run_date = journal['run_date'] if journal is not None else time.strftime('%Y-%m-%d')
+    run_id = journal['run_id'] if journal is not None else time.strftime('%Y%m%d-%H%M%S')
+    snapshots.start_snapshot(run_date, run_id, snapshot_dir)
+
+    total_listings = 0
+    csv_columns = None
+    resuming_csv = bool(skip_batches) and os.path.exists(csv_path)
+    if resuming_csv:
+        csv_columns = list(pd.read_csv(csv_path, index_col=0, nrows=0).columns)
+
+    on_failed = (lambda batch_number: run_journal.record_batch_fetch_failed(journal, batch_number)) if journal is not None else None
+    for batch_number, total_batches, rentals in fetch_listing_batches(all_ids, skip_batches=skip_batches, traffic_days=traffic_days, on_failed=on_failed):
+        if journal is not None:
+            run_journal.record_batch_fetched(journal, batch_number, rentals)
+
+        batch_df = pd.DataFrame(rentals)
+
+        if csv_columns is None:
+            csv_columns = list(batch_df.columns)
+            batch_df.to_csv(csv_path, mode='w', header=True)
+        else:
+            batch_df.reindex(columns=csv_columns).to_csv(csv_path, mode='a', header=False)
+
+        normalized = normalize_rentals(rentals)
+        try:
+            snapshots.write_snapshot_batch(normalized, run_date, run_id, batch_number, snapshot_dir)
+        except Exception as e:
+            print(f"⚠️ Batch {batch_number}: could not write Parquet snapshot: {e}")
+            progress.add_error(f"Batch {batch_number}: Parquet snapshot failed: {e}")
+
+        total_listings += len(batch_df)
+        print(f"✓ Batch {batch_number}/{total_batches}: {len(batch_df)} listings processed")
+
+        if on_batch is not None:
+            on_batch(batch_number, rentals, normalized)
         
     print("\n" + "━" * 50)
-    print(f"💾 Final dataset: {len(final_df)} listings")
+    print(f"💾 Final dataset: {total_listings} listings")
     print("━" * 50 + "\n")
     
-    final_df.to_csv('Streeteasy Data.csv')
-    return final_df
-
-def fix_json_column(value):
-    try:
-        # Already valid Python object
-        if isinstance(value, (list, dict)):
-            return json.dumps(value)
+    return total_listings
 
-        if isinstance(value, str):
-            value = value.strip()
-            if not value:
-                return None
+def prepare_batch(rentals, unit_index, db_columns, run_date=None, traffic_totals=None, normalized=None):
+    """
+    Normalize one scraped batch, resolve it against the unit index and shape it for the streeteasy_units table.
 
-            # Replace smart quotes and standardize
-            value = value.replace("'","'").replace('"', '"')
+    normalized is the batch's normalize_rentals frame when the caller already has it (it is
+    modified in place); otherwise `rentals` is normalized here.
 
-            # Try converting single-quote JSON to double-quote
-            value = re.sub(r"'", '"', value)
+    traffic_totals (per listing_id, from listing_traffic_daily) replaces the totals summed from
+    the payload, which only cover the fetched window when traffic is fetched incrementally.
+    """
+    batch_df = normalize_rentals(rentals) if normalized is None else normalized
+    if len(batch_df) == 0:
+        return batch_df
 
-            # Remove trailing commas inside objects/arrays
-            value = re.sub(r",\s*([\]}])", r"\1", value)
+    if traffic_totals is not None and len(traffic_totals):
+        for field in TRAFFIC_FIELDS:
+            stored = batch_df['id'].map(traffic_totals[field])
+            batch_df[f'total_{field}'] = stored.fillna(batch_df[f'total_{field}']).astype('int64')
+        batch_df['total_impressions'] = batch_df['total_search_impressions'] + batch_df['total_featured_impressions']
 
-            # Try loading with json first
-            try:
-                parsed = json.loads(value)
-            except json.JSONDecodeError:
-                # Fall back to using ast.literal_eval which can handle single quotes etc.
-                parsed = ast.literal_eval(value)
-
-            return json.dumps(parsed)
+    batch_df = derive_metrics(batch_df, run_date)
 
-    except Exception as e:
-        print(f"⚠️ JSON error for value: {value} — {e}")
-        return None
+    if run_date is not None:
+        batch_df['run_date'] = run_date
 
-    return value
+    # Listings that don't resolve are still stored, with a NULL unit_id
+    batch_df = batch_df.dropna(subset=['address']).reset_index(drop=True)
+    batch_df['unit_id'] = resolve_units(unit_index, batch_df['address'], batch_df['unit'])
 
+    if len(batch_df) == 0:
+        return batch_df
 
-def eval_json(val):
-    try:
-        return json.dumps(ast.literal_eval(val))
-    except:
-        return None
+    # Filter columns to the table schema
+    batch_df = filter_csv_columns(batch_df, db_columns)
+    batch_df = encode_json_columns(batch_df)
+    batch_df = convert_column_types(batch_df, db_columns)
 
-def get_unit_df(db_connection):
-    """Get units - fixed to return the dataframe"""
-    # Create a cursor
-    cursor = db_connection.cursor(dictionary=True)
-
-    # Execute the query
-    query = "SELECT * FROM units"
-    cursor.execute(query)
-
-    # Fetch all results
-    units = cursor.fetchall()
+    # Select only available columns for insertion
+    expected_columns = ['address', 'unit', 'amenities', 'building_amenities', 'source', 'id', 'created_at', 'listed_at', 'price_history',
+        'description', 'listed_price', 'days_on_market', 'size_sqft', 'views_count', 'leads_count', 'saves_count',
+        'shares_count', 'status', 'bathrooms', 'bedrooms', 'building', 'free_months', 'lease_term', 
+        'total_featured_impressions', 'total_search_impressions', 'total_impressions', 'net_rent', 'is_vector', 'ctr', 'areaName', 'longitude',
+        'latitude', 'calc_dom', 'is_no_fee', 'unit_id', 'run_date']
+    
+    available_columns = [col for col in expected_columns if col in batch_df.columns]
+    return batch_df[available_columns]
 
-    # Close cursor (but don't close connection here since we need it later)
-    cursor.close()
+def write_batches(batch_queue, db_connection, unit_index, db_columns, stats, journal=None, chunk_size=DEFAULT_CHUNK_SIZE, last_traffic_dates=None):
+    """
+    DB writer thread - drains (batch_number, rentals, normalized) items until it receives None.
+    normalized is the batch's normalize_rentals frame, or None for batches replayed from the journal.
 
-    print(f"Retrieved {len(units)} units from database")
+    With last_traffic_dates (incremental traffic mode) each batch's new traffic days go to
+    listing_traffic_daily first, and the listing totals are then read back from that table.
+    """
+    run_date = (journal or {}).get('run_date') or time.strftime('%Y-%m-%d')
 
-    unit_df = pd.DataFrame(units)[['unit_id', 'address', 'unit']]
-    return unit_df  # This was missing!
+    while True:
+        item = batch_queue.get()
+        if item is None:
+            break
 
-def save_to_db():
-    """Main function - processes StreetEasy data directly without CSV intermediary"""
+        batch_number, rentals, normalized = item
+        try:
+            totals = None
+            if last_traffic_dates is not None:
+                traffic_written = traffic.write_traffic(db_connection, rentals, last_traffic_dates, chunk_size)
+                totals = traffic.get_traffic_totals(db_connection, [item['id'] for item in rentals if item])
+                stats['traffic_rows'] += traffic_written
+
+            prepared_df = prepare_batch(rentals, unit_index, db_columns, run_date, totals, normalized)
+            if len(prepared_df) == 0:
+                print(f"⚠️ Batch {batch_number}: no matching units")
+            else:
+                key_columns = [col for col in UPSERT_KEY if col in prepared_df.columns]
+                inserted = bulk_upsert(db_connection, 'streeteasy_units', prepared_df, key_columns, chunk_size)
+                stats['inserted'] += inserted
+                progress.update_progress(rows_written_add=inserted)
+                print(f"⬆️ Batch {batch_number}: uploaded {inserted} records ({stats['inserted']} total)")
+
+            if journal is not None:
+                run_journal.record_batch_inserted(journal, batch_number)
+            progress.update_progress(batches_written_add=1)
+        except Exception as e:
+            db_connection.rollback()
+            stats['failed_batches'] += 1
+            progress.add_error(f"Batch {batch_number}: upload failed - {e}")
+            print(f"❌ Batch {batch_number}: failed to upload - {e}")
+
+def save_to_db(resume=False, chunk_size=DEFAULT_CHUNK_SIZE, traffic_delta=True, snapshot_dir=None):
+    """
+    Main function - streams StreetEasy batches into the database as they are scraped.
+
+    Progress is journaled to disk; with resume=True an unfinished run picks up from its
+    last checkpoint (collected ids, fetched batches and pending inserts) instead of starting over.
+    Rows are upserted on (id, run_date) in chunks of chunk_size, each committed on its own.
+    With traffic_delta, daily traffic is kept in listing_traffic_daily and only the days since
+    each listing's last stored date are requested; otherwise full history is fetched every run.
+    snapshot_dir overrides where the run's Parquet snapshot is written.
+    Returns a summary dict, or None if the database is unreachable.
+    """
     
     # Get database connection
     db_result = get_db_connection()
     if db_result["status"] != "connected":
         print("❌ Database connection failed")
-        return
+        return None
     
     db_connection = db_result["connection"]
     
-    # Get units
-    unit_df = get_unit_df(db_connection)
-    
-    cursor = db_connection.cursor()
-
-    print("🔄 Starting StreetEasy data scrape...")
-    final_df = scrape_streeteasy()
-    
-    if len(final_df) == 0:
-        print("❌ No data to process")
-        cursor.close()
-        db_connection.close()
-        return
+    # Get units and the table schema once, before the writer thread takes over the connection
+    unit_index = load_unit_index(db_connection)
+    db_columns = get_db_columns_and_types(db_connection, 'streeteasy_units')
+    try:
+        ensure_unique_key(db_connection, 'streeteasy_units', 'uniq_streeteasy_listing_run', UPSERT_KEY)
+    except Exception as e:
+        print(f"⚠️ Could not add unique key on streeteasy_units{tuple(UPSERT_KEY)}, upserts will insert only: {e}")
+    try:
+        ensure_column(db_connection, 'streeteasy_units', *VERSION_COLUMN)
+        for key_name, key_columns in VERSION_INDEXES.items():
+            ensure_index(db_connection, 'streeteasy_units', key_name, key_columns)
+    except Exception as e:
+        print(f"⚠️ Could not add the streeteasy_units version column/indexes, report caches fall back to run_date: {e}")
 
-    # Process the data
-    print("🔧 Processing data...")
-    addresses = []
-    units = []
-    
-    for idx, row in final_df.iterrows():
+    last_traffic_dates = None
+    traffic_days = None
+    if traffic_delta:
         try:
-            address_str = str(row['address'])
-            if 'pretty_address' in address_str:
-                pretty_address_match = re.search(r"'pretty_address': '([^']*)'", address_str)
-                unit_match = re.search(r"'unit': '([^']*)'", address_str)
-                
-                if pretty_address_match:
-                    addresses.append(pretty_address_match.group(1))
-                else:
-                    addresses.append(None)
-                    
-                if unit_match:
-                    unit_val = unit_match.group(1).replace('#', '').strip()
-                    units.append(unit_val)
-                else:
-                    units.append(None)
-            else:
-                addresses.append(None)
-                units.append(None)
+            traffic.ensure_traffic_table(db_connection)
+            last_traffic_dates = traffic.get_last_traffic_dates(db_connection)
+            traffic_days = traffic.plan_traffic_days(last_traffic_dates.keys(), last_traffic_dates)
+            print(f"📉 Incremental traffic: {len(last_traffic_dates)} listings have stored history")
         except Exception as e:
-            addresses.append(None)
-            units.append(None)
-    
-    final_df['address'] = addresses
-    final_df['unit'] = units
-
-    # Format unit column for matching
-    unit_df_formatted = unit_df.copy()
-    unit_df_formatted['unit'] = unit_df_formatted['unit'].str.lstrip('0').str.strip()
-
-    # Merge with unit data
-    final_df = final_df.merge(
-        unit_df_formatted, 
-        how='left', 
-        on=['address', 'unit']
-    ).dropna(subset=['address'])
-
-    if len(final_df) == 0:
-        print("❌ No matching units found")
-        cursor.close()
+            print(f"⚠️ Could not use {traffic.TRAFFIC_TABLE}, fetching full traffic history: {e}")
+            last_traffic_dates = None
+            traffic_days = None
+
+    journal = run_journal.load_journal() if resume else None
+    if journal is None:
+        if resume:
+            print("ℹ️ No unfinished scrape to resume, starting a new run")
+        journal = run_journal.new_journal()
+    progress.update_progress(run_id=journal['run_id'])
+
+    # Bounded so the scraper never runs more than a couple of batches ahead of the DB
+    batch_queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+    stats = {'inserted': 0, 'failed_batches': 0, 'traffic_rows': 0}
+    writer = threading.Thread(target=write_batches, args=(batch_queue, db_connection, unit_index, db_columns, stats, journal, chunk_size, last_traffic_dates))
+    writer.start()
+
+    total_listings = 0
+    try:
+        # Batches fetched by an earlier attempt but never committed go first
+        for batch_number, rentals in run_journal.pending_batches(journal):
+            print(f"↩️ Batch {batch_number}: retrying pending insert")
+            batch_queue.put((batch_number, rentals, None))
+            total_listings += len(rentals)
+
+        print("🔄 Starting StreetEasy data scrape...")
+        total_listings += scrape_streeteasy(
+            on_batch=lambda batch_number, rentals, normalized: batch_queue.put((batch_number, rentals, normalized)),
+            journal=journal,
+            traffic_days=traffic_days,
+            snapshot_dir=snapshot_dir,
+        )
+    except Exception:
+        run_journal.finish_journal(journal, 'failed')
+        raise
+    finally:
+        batch_queue.put(None)
+        writer.join()
         db_connection.close()
-        return
-
-    # Process listed_price
-    if 'listed_price' in final_df.columns:
-        final_df['listed_price'] = final_df['listed_price'].astype(str).str.replace('$','').str.replace(',','')
-
-    # Get database schema and filter columns
-    db_columns = get_db_columns_and_types(db_connection, 'streeteasy_units')
-    final_df = filter_csv_columns(final_df, db_columns)
-    final_df = convert_column_types(final_df, db_columns)
-
-    # Process price_history if exists
-    if 'price_history' in final_df.columns:
-        final_df['price_history'] = final_df['price_history'].apply(eval_json)
-
-    # Select only available columns for insertion
-    expected_columns = ['address', 'unit', 'amenities', 'building_amenities', 'source', 'id', 'created_at', 'listed_at', 'price_history',
-        'description', 'listed_price', 'days_on_market', 'size_sqft', 'views_count', 'leads_count', 'saves_count',
-        'shares_count', 'status', 'bathrooms', 'bedrooms', 'building', 'free_months', 'lease_term', 
-        'total_featured_impressions', 'net_rent', 'is_vector', 'ctr', 'areaName', 'longitude',
-        'latitude', 'calc_dom', 'is_no_fee', 'unit_id']
-    
-    available_columns = [col for col in expected_columns if col in final_df.columns]
-    final_df = final_df[available_columns]
-
-    # Build insert query
-    columns = ', '.join(final_df.columns)
-    placeholders = ', '.join(['%s'] * len(final_df.columns))
-    query = f"INSERT INTO streeteasy_units ({columns}) VALUES ({placeholders})"
-
-    # Prepare data for insertion
-    data_to_insert = []
-    for _, row in final_df.iterrows():
-        row_data = []
-        for col in final_df.columns:
-            value = row[col]
-            if pd.isna(value):
-                row_data.append(None)
-            else:
-                row_data.append(value)
-        data_to_insert.append(tuple(row_data))
 
-    print(f"⬆️ Uploading {len(data_to_insert)} records to database...")
-    cursor.executemany(query, data_to_insert)
-    db_connection.commit()
-    
-    print(f"✅ Successfully uploaded {len(data_to_insert)} records to streeteasy_units table")
-    
-    cursor.close()
-    db_connection.close()
+    # Batches that failed to fetch or to insert are retried by a resume, so the run isn't completed yet
+    failed_fetches = len(journal.get('failed_fetches', []))
+    if stats['failed_batches'] or failed_fetches:
+        run_journal.finish_journal(journal, 'incomplete')
+    else:
+        run_journal.finish_journal(journal, 'completed')
+
+    summary = {
+        'listings': total_listings,
+        'inserted': stats['inserted'],
+        'traffic_rows': stats['traffic_rows'],
+        'failed_batches': stats['failed_batches'],
+        'failed_fetches': failed_fetches,
+        'unmatched_units': unmatched_report(unit_index),
+    }
 
-# Global status queue for communication between threads
-status_queue = queue.Queue()
+    if total_listings == 0:
+        print("❌ No data to process")
+        return summary
+
+    if stats['failed_batches']:
+        print(f"⚠️ {stats['failed_batches']} batches failed to upload - rerun with resume to retry them")
+    if failed_fetches:
+        print(f"⚠️ {failed_fetches} batches failed to fetch - rerun with resume to retry them")
+    print(f"✅ Successfully uploaded {stats['inserted']} records to streeteasy_units table")
+    if summary['unmatched_units']['unmatched_keys']:
+        print(f"⚠️ {summary['unmatched_units']['unmatched_rows']} listings matched no unit ({summary['unmatched_units']['unmatched_keys']} distinct address/unit keys)")
+    if last_traffic_dates is not None:
+        print(f"📉 Stored {stats['traffic_rows']} new traffic days in {traffic.TRAFFIC_TABLE}")
+    return summary
+
+def refresh_report_data():
+    """Rebuild the market cube and the dashboard's cached report sections from the new scrape (in the background)"""
+    try:
+        from Services.Reports.report_data import refresh_in_background
+        refresh_in_background(force_refresh=True)
+    except Exception as e:
+        print(f"⚠️ Could not start report data refresh: {e}")
 
-def scrape_with_status():
-    """Run the scraper and update status in the queue"""
+def scrape_with_status(resume=False):
+    """Run the scraper, recording progress, and release the run lock when done"""
     try:
-        status_queue.put({"status": "started", "message": "Scraping started", "timestamp": time.strftime('%Y-%m-%d %H:%M:%S')})
-        save_to_db()
-        status_queue.put({"status": "completed", "message": "Scraping completed successfully", "timestamp": time.strftime('%Y-%m-%d %H:%M:%S')})
+        summary = save_to_db(resume=resume)
+        if summary is None:
+            progress.finish_progress("error", "Database connection failed")
+        elif summary['failed_batches'] or summary['failed_fetches']:
+            progress.finish_progress("incomplete", f"{summary['failed_batches']} batches failed to upload, {summary['failed_fetches']} failed to fetch - start again with resume=true")
+        else:
+            progress.finish_progress("completed", f"Scraping completed successfully - {summary['inserted']} records uploaded")
+        if summary is not None and summary['inserted']:
+            refresh_report_data()
     except Exception as e:
-        status_queue.put({"status": "error", "message": str(e), "timestamp": time.strftime('%Y-%m-%d %H:%M:%S')})
+        progress.add_error(str(e))
+        progress.finish_progress("error", str(e))
+    finally:
+        progress.release_run_lock()
+
+def start_scrape(resume=False):
+    """
+    Start the scraper in a background thread and return immediately.
+
+    Only one scrape runs at a time across all workers; a second call joins the
+    running one and gets its progress back instead of starting another.
+    """
+    if not progress.acquire_run_lock():
+        status = progress.read_progress()
+        status.update({"joined": True, "message": "A scrape is already running - returning its progress"})
+        return status
+
+    progress.start_progress(resume=resume)
 
-def start_scrape():
-    """Start the scraper in a background thread and return immediately"""
-    # Clear any old status
-    while not status_queue.empty():
-        status_queue.get()
-    
     # Start the scraper in a background thread
-    thread = threading.Thread(target=scrape_with_status)
+    thread = threading.Thread(target=scrape_with_status, args=(resume,))
     thread.daemon = True  # Thread will exit when main program exits
     thread.start()
     
     # Return initial status
     return {
         "status": "started",
-        "message": "Scraping started in background",
+        "message": "Scraping resumed in background" if resume else "Scraping started in background",
         "timestamp": time.strftime('%Y-%m-%d %H:%M:%S')
     }
 
 def get_scrape_status():
-    """Get the current status of the scraping process"""
-    try:
-        # Get the latest status without blocking
-        status = status_queue.get_nowait()
-        return status
-    except queue.Empty:
-        # If no status update, return running status
-        return {
-            "status": "running",
-            "message": "Scraping in progress",
-            "timestamp": time.strftime('%Y-%m-%d %H:%M:%S')
-        }
+    """Get the current progress of the scraping process (any worker, any number of pollers)"""
+    return progress.read_progress()
 
 if __name__ == "__main__":
-    # For direct script execution, run normally
-    save_to_db()
\ No newline at end of file
+    # For direct script execution, run normally (pass --resume to continue an unfinished run)
+    save_to_db(resume='--resume' in sys.argv)
\ No newline at end of file
@@ -0,0 +1,163 @@
+import datetime
+import glob
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# One directory per scrape day: <SNAPSHOT_DIR>/run_date=YYYY-MM-DD/part-<run_id>-<batch>.parquet.
+# Anchored to the repo so app.py, `python -m` and gunicorn runs share one dataset, wherever they start
+SNAPSHOT_DIR = os.getenv('STREETEASY_SNAPSHOT_DIR', os.path.join(REPO_DIR, 'data', 'streeteasy_snapshots'))
+
+PARTITIONING = ds.partitioning(pa.schema([('run_date', pa.date32())]), flavor='hive')
+
+_name = pa.struct([('name', pa.string())])
+
+# Explicit schema so every batch writes identical types (a batch of all-null values
+# would otherwise infer a `null` column and clash with the rest of the dataset)
+SNAPSHOT_SCHEMA = pa.schema([
+    ('id', pa.string()),
+    ('source', pa.string()),
+    ('created_at', pa.timestamp('us')),
+    ('listed_at', pa.timestamp('us')),
+    ('description', pa.string()),
+    ('listed_price', pa.float64()),
+    ('days_on_market', pa.float64()),
+    ('size_sqft', pa.float64()),
+    ('views_count', pa.float64()),
+    ('leads_count', pa.float64()),
+    ('saves_count', pa.float64()),
+    ('shares_count', pa.float64()),
+    ('status', pa.string()),
+    ('bathrooms', pa.float64()),
+    ('bedrooms', pa.float64()),
+    ('anyrooms', pa.float64()),
+    ('has_historical_activity', pa.bool_()),
+    ('is_no_fee', pa.bool_()),
+    ('actual_is_collect_your_own_fee', pa.bool_()),
+    ('address', pa.string()),
+    ('unit', pa.string()),
+    ('areaName', pa.string()),
+    ('amenities', pa.list_(pa.string())),
+    ('building_amenities', pa.list_(pa.string())),
+    ('agents', pa.list_(pa.struct([('name', pa.string()), ('email', pa.string())]))),
+    ('price_history', pa.list_(pa.struct([
+        ('date', pa.string()), ('description', pa.string()), ('price', pa.float64()),
+    ]))),
+    ('listing_traffics', pa.list_(pa.struct([
+        ('date', pa.string()), ('id', pa.string()), ('views', pa.int64()),
+        ('search_impressions', pa.int64()), ('featured_impressions', pa.int64()),
+    ]))),
+    ('featured_details', pa.list_(pa.struct([
+        ('id', pa.string()), ('clicks', pa.int64()), ('ends_at', pa.string()),
+        ('location', pa.string()), ('is_homepage_featured_listing', pa.bool_()),
+    ]))),
+    ('building', pa.struct([
+        ('title', pa.string()),
+        ('active_listings_count', pa.float64()),
+        ('active_rentals_count', pa.float64()),
+        ('front_lat', pa.string()),
+        ('front_lon', pa.string()),
+        ('amenities', pa.list_(_name)),
+        ('building_class_description', pa.string()),
+        ('building_classification', pa.string()),
+        ('building_type', pa.string()),
+        ('floor_count', pa.float64()),
+        ('year_built', pa.float64()),
+    ])),
+    ('latitude', pa.float64()),
+    ('longitude', pa.float64()),
+    ('free_months', pa.float64()),
+    ('lease_term', pa.float64()),
+    ('building_active_listings_count', pa.float64()),
+    ('building_active_rentals_count', pa.float64()),
+    ('building_class_description', pa.string()),
+    ('building_classification', pa.string()),
+    ('building_type', pa.string()),
+    ('building_floor_count', pa.float64()),
+    ('building_title', pa.string()),
+    ('building_year_built', pa.float64()),
+    ('total_views', pa.int64()),
+    ('total_search_impressions', pa.int64()),
+    ('total_featured_impressions', pa.int64()),
+    ('total_impressions', pa.int64()),
+])
+
+
+def _partition_dir(run_date, base_dir=None):
+    return os.path.join(base_dir or SNAPSHOT_DIR, f'run_date={run_date}')
+
+def start_snapshot(run_date, run_id, base_dir=None):
+    """
+    Prepare the partition for a run. Parts left by an earlier run on the same day are
+    removed (the latest run of a day wins, like the streeteasy_units upsert); parts from
+    this run_id are kept so a resumed run adds to them.
+    """
+    partition = _partition_dir(run_date, base_dir)
+    os.makedirs(partition, exist_ok=True)
+    for path in glob.glob(os.path.join(partition, 'part-*.parquet')):
+        if not os.path.basename(path).startswith(f'part-{run_id}-'):
+            os.remove(path)
+
+def _to_table(df):
+    df = df.reindex(columns=SNAPSHOT_SCHEMA.names)
+    # Boolean columns can hold None; keep them as objects so pyarrow writes nulls
+    for field in SNAPSHOT_SCHEMA:
+        if pa.types.is_boolean(field.type):
+            df[field.name] = df[field.name].astype(object).where(df[field.name].notna(), None)
+    return pa.Table.from_pandas(df, schema=SNAPSHOT_SCHEMA, preserve_index=False)
+
+def write_snapshot_batch(df, run_date, run_id, batch_number, base_dir=None):
+    """Write one normalize_rentals batch frame as a Parquet part of the run_date partition; returns the path"""
+    if len(df) == 0:
+        return None
+
+    partition = _partition_dir(run_date, base_dir)
+    os.makedirs(partition, exist_ok=True)
+    name = f'part-{run_id}-{batch_number:05d}.parquet'
+    path = os.path.join(partition, name)
+    tmp_path = os.path.join(partition, f'.{name}.tmp')  # dot-prefixed files are ignored by the reader
+    pq.write_table(_to_table(df), tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+    return path
+
+def snapshot_dataset(base_dir=None):
+    return ds.dataset(
+        base_dir or SNAPSHOT_DIR, format='parquet', partitioning=PARTITIONING,
+        schema=SNAPSHOT_SCHEMA.append(pa.field('run_date', pa.date32())),
+    )
+
+def _as_date(value):
+    if value is None or isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        return value
+    return pd.Timestamp(value).date()
+
+def load_snapshots(columns=None, start_date=None, end_date=None, where=None, base_dir=None):
+    """
+    Load snapshot history as a DataFrame.
+
+    columns limits which columns are read from disk; start_date/end_date prune whole
+    run_date partitions; where is an extra pyarrow expression pushed down to the
+    row groups, e.g. `ds.field('bedrooms') <= 4`. List columns come back as arrays and
+    struct columns as dicts.
+    """
+    base_dir = base_dir or SNAPSHOT_DIR
+    if not os.path.isdir(base_dir):
+        return pd.DataFrame(columns=columns or SNAPSHOT_SCHEMA.names + ['run_date'])
+
+    expression = None
+    if start_date is not None:
+        expression = ds.field('run_date') >= _as_date(start_date)
+    if end_date is not None:
+        bound = ds.field('run_date') <= _as_date(end_date)
+        expression = bound if expression is None else expression & bound
+    if where is not None:
+        expression = where if expression is None else expression & where
+
+    table = snapshot_dataset(base_dir).to_table(columns=columns, filter=expression)
+    return table.to_pandas(date_as_object=False)
@@ -0,0 +1,108 @@
+import datetime
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from Services.Database.Bulk import bulk_upsert, DEFAULT_CHUNK_SIZE
+from Services.Streeteasy.normalize import TRAFFIC_FIELDS
+
+
+TRAFFIC_TABLE = 'listing_traffic_daily'
+TRAFFIC_KEY = ['listing_id', 'date']
+
+# What StreetEasy gives us for a listing we have no stored history for
+FULL_HISTORY_DAYS = 1000
+
+CREATE_TRAFFIC_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {TRAFFIC_TABLE} (
+    listing_id VARCHAR(50) NOT NULL,
+    date DATE NOT NULL,
+    views INT NOT NULL DEFAULT 0,
+    search_impressions INT NOT NULL DEFAULT 0,
+    featured_impressions INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (listing_id, date)
+)
+"""
+
+
+def ensure_traffic_table(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(CREATE_TRAFFIC_TABLE)
+        connection.commit()
+    finally:
+        cursor.close()
+
+def get_last_traffic_dates(connection):
+    """Latest stored traffic date per listing, as {listing_id: date}"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT listing_id, MAX(date) FROM {TRAFFIC_TABLE} GROUP BY listing_id")
+        return {str(listing_id): last_date for listing_id, last_date in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+def plan_traffic_days(listing_ids, last_dates, today=None):
+    """
+    How many days of traffic to request per listing: everything since the last stored
+    date (that day included, since it may have been stored part-way through), or the
+    full history for listings we have never stored.
+    """
+    today = today or datetime.date.today()
+    plan = {}
+    for listing_id in listing_ids:
+        last_date = last_dates.get(str(listing_id))
+        if last_date is None:
+            plan[str(listing_id)] = FULL_HISTORY_DAYS
+        else:
+            plan[str(listing_id)] = min(max((today - last_date).days + 1, 1), FULL_HISTORY_DAYS)
+    return plan
+
+def traffic_rows(rentals):
+    """Flatten the listing_traffics of a batch into one row per (listing_id, date)"""
+    rentals = [item for item in rentals if item]
+    traffics = [item.get('listing_traffics') or [] for item in rentals]
+    lengths = np.fromiter((len(t) for t in traffics), dtype=np.int64, count=len(traffics))
+    if lengths.sum() == 0:
+        return pd.DataFrame(columns=TRAFFIC_KEY + TRAFFIC_FIELDS)
+
+    rows = pd.DataFrame.from_records(chain.from_iterable(traffics), columns=['date'] + TRAFFIC_FIELDS)
+    rows.insert(0, 'listing_id', np.repeat([str(item['id']) for item in rentals], lengths))
+    rows['date'] = pd.to_datetime(rows['date'], errors='coerce').dt.date
+    rows[TRAFFIC_FIELDS] = rows[TRAFFIC_FIELDS].apply(pd.to_numeric, errors='coerce').fillna(0).astype('int64')
+    return rows.dropna(subset=['date']).drop_duplicates(TRAFFIC_KEY, keep='last')
+
+def new_traffic_rows(rows, last_dates):
+    """Keep only days on or after each listing's last stored date"""
+    if len(rows) == 0 or not last_dates:
+        return rows
+    last = pd.to_datetime(rows['listing_id'].map(last_dates))
+    return rows[last.isna() | (pd.to_datetime(rows['date']) >= last)]
+
+def write_traffic(connection, rentals, last_dates, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Upsert the new days of a batch's traffic; returns the number of rows written"""
+    rows = new_traffic_rows(traffic_rows(rentals), last_dates)
+    return bulk_upsert(connection, TRAFFIC_TABLE, rows, TRAFFIC_KEY, chunk_size)
+
+def get_traffic_totals(connection, listing_ids):
+    """Lifetime traffic totals per listing from the stored history, indexed by listing_id"""
+    if not listing_ids:
+        return pd.DataFrame(columns=TRAFFIC_FIELDS)
+
+    placeholders = ', '.join(['%s'] * len(listing_ids))
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            f"""
+            SELECT listing_id, SUM(views), SUM(search_impressions), SUM(featured_impressions)
+            FROM {TRAFFIC_TABLE} WHERE listing_id IN ({placeholders}) GROUP BY listing_id
+            """,
+            [str(listing_id) for listing_id in listing_ids]
+        )
+        totals = pd.DataFrame(cursor.fetchall(), columns=['listing_id'] + TRAFFIC_FIELDS)
+    finally:
+        cursor.close()
+
+    totals[TRAFFIC_FIELDS] = totals[TRAFFIC_FIELDS].astype('int64')
+    return totals.set_index('listing_id')
@@ -146,8 +146,11 @@ def after_request(response):
 @app.route('/api/streeteasy-scrape', methods=['GET'])
 def run_streeteasy_scrape():
     try:
+        # ?resume=true continues the last unfinished run from its checkpoint
+        resume = request.args.get('resume', '').lower() in ('1', 'true', 'yes')
+
         # Start the scraper in background and get initial status
-        status = start_scrape()
+        status = start_scrape(resume=resume)
         return jsonify(status), 200
     except Exception as e:
         return jsonify({
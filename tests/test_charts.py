@@ -0,0 +1,44 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from Services.Reports import charts
+
+
+@pytest.fixture(autouse=True)
+def in_process(monkeypatch):
+    monkeypatch.setattr(charts, 'CHART_WORKERS', 0)
+
+def ppsf_spec(i):
+    return {
+        'kind': 'ppsf', 'months': ['Jan', 'Feb', 'Mar'],
+        'current': [50 + i, 51 + i, None], 'prior': [48, 49 + i % 3, 47],
+        'current_year': 2026, 'prior_year': 2025, 'style': charts.CHART_STYLES['ppsf'],
+    }
+
+def price_trends_spec(i):
+    return {
+        'kind': 'price_trends', 'title': f'Chart {i}',
+        'series': [{'label': '1BR', 'dates': ['2026-01-01', '2026-02-01', '2026-03-01'], 'values': [3000 + i, 3100, 3050]}],
+        'style': charts.CHART_STYLES['price_trends'],
+    }
+
+def rendered(directory):
+    return {name: hashlib.sha1(open(os.path.join(directory, name), 'rb').read()).hexdigest() for name in os.listdir(directory)}
+
+
+def test_threads_draw_the_same_images(tmp_path, monkeypatch):
+    specs = [make(i) for i in range(12) for make in (ppsf_spec, price_trends_spec)]
+
+    monkeypatch.setattr(charts, 'CHART_CACHE_DIR', str(tmp_path / 'serial'))
+    for spec in specs:
+        charts.render_chart_file(spec)
+
+    # Section threads and concurrent report jobs share the per-kind figures
+    monkeypatch.setattr(charts, 'CHART_CACHE_DIR', str(tmp_path / 'threaded'))
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(charts.render_chart_file, specs))
+
+    assert rendered(tmp_path / 'threaded') == rendered(tmp_path / 'serial')
@@ -0,0 +1,43 @@
+import pytest
+
+from Services.Reports import charts
+from Services.Reports.data_processor import (
+    typed_streeteasy_frame, create_comp_data, preprocess_df, get_ytd_ppsf_data, get_comparison_tables,
+)
+from Services.Reports.market_cube import build_market_cube, cube_ytd_ppsf, cube_comparison_tables, market_cube_for
+from Services.Reports.synthetic import synthetic_streeteasy_listings
+
+
+@pytest.fixture(scope='module')
+def comp_data():
+    return preprocess_df(create_comp_data(typed_streeteasy_frame(synthetic_streeteasy_listings(20000, seed=3))))
+
+@pytest.fixture(autouse=True)
+def chart_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(charts, 'CHART_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(charts, 'CHART_WORKERS', 0)
+
+def table_values(chart, months):
+    """Current and prior year PPSF per month from a YTD chart's table rows (None for '-')"""
+    return [[None if row[month] == '-' else float(row[month].lstrip('$')) for month in months] for row in chart['table_rows'][:2]]
+
+
+def test_ytd_ppsf_matches_report(comp_data):
+    report = get_ytd_ppsf_data(comp_data)
+    cube = cube_ytd_ppsf(build_market_cube(comp_data))
+
+    assert [chart['title'] for chart in cube['charts']] == [chart['title'] for chart in report['charts']]
+    for report_chart, cube_chart in zip(report['charts'], cube['charts']):
+        for report_row, cube_row in zip(table_values(report_chart, report['months']), table_values(cube_chart, report['months'])):
+            for report_value, cube_value in zip(report_row, cube_row):
+                assert (report_value is None) == (cube_value is None)
+                if report_value is not None:
+                    assert cube_value == pytest.approx(report_value, abs=0.01)
+
+def test_comparison_tables_match_report(comp_data):
+    assert cube_comparison_tables(build_market_cube(comp_data)) == get_comparison_tables(comp_data)
+
+def test_unversioned_frame_builds_its_own_cube(comp_data):
+    subset = comp_data[comp_data['bedrooms'] == 1]
+    subset.attrs.pop('version', None)
+    assert market_cube_for(subset)['listings'].sum() == len(subset)
@@ -0,0 +1,98 @@
+import copy
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from Services.Streeteasy.normalize import normalize_rentals, derive_metrics
+
+SAMPLE_PAYLOAD = os.path.join(os.path.dirname(__file__), '..', 'Services', 'Streeteasy', 'fixtures', 'rentals_sample.json')
+RUN_DATE = '2025-06-14'
+
+
+@pytest.fixture
+def rentals():
+    with open(SAMPLE_PAYLOAD) as f:
+        return json.load(f)['data']['rentals']
+
+def derived(rentals, as_of=RUN_DATE):
+    return derive_metrics(normalize_rentals(rentals), as_of).set_index('id')
+
+
+def test_one_row_per_listing(rentals):
+    df = derived(rentals)
+    assert len(df) == len(rentals)
+    assert list(df.index) == [item['id'] for item in rentals]
+
+def test_address_and_unit(rentals):
+    row = derived(rentals).loc['4713964']
+    assert row['address'] == '2265 University Avenue'
+    assert row['unit'] == '2E'
+
+def test_area_name(rentals):
+    df = derived(rentals)
+    assert df.loc['4713964', 'areaName'] == 'University Heights'
+    assert df.loc['4766148', 'areaName'] == "Hell's Kitchen"
+
+def test_latitude_longitude(rentals):
+    df = derived(rentals)
+    assert df.loc['4713964', 'latitude'] == pytest.approx(40.86027527)
+    assert df.loc['4713964', 'longitude'] == pytest.approx(-73.90740967)
+    # Buildings without front coordinates stay missing
+    assert pd.isna(df.loc['4741748', 'latitude'])
+    assert pd.isna(df.loc['4741748', 'longitude'])
+
+def test_traffic_totals(rentals):
+    df = derived(rentals)
+    for item in rentals:
+        traffics = item['listing_traffics'] or []
+        row = df.loc[item['id']]
+        assert row['total_views'] == sum(day['views'] for day in traffics)
+        assert row['total_search_impressions'] == sum(day['search_impressions'] for day in traffics)
+        assert row['total_featured_impressions'] == sum(day['featured_impressions'] for day in traffics)
+        assert row['total_impressions'] == row['total_search_impressions'] + row['total_featured_impressions']
+
+def test_ctr(rentals):
+    df = derived(rentals)
+    row = df.loc['4713964']
+    assert row['ctr'] == pytest.approx(round(row['total_views'] / row['total_impressions'], 4))
+    # No traffic recorded yet: no impressions, so no click-through rate
+    assert df.loc['4766148', 'total_impressions'] == 0
+    assert pd.isna(df.loc['4766148', 'ctr'])
+
+def test_net_rent_without_concession(rentals):
+    df = derived(rentals)
+    assert df['free_months'].isna().all()
+    assert (df['net_rent'] == df['listed_price']).all()
+
+def test_free_months_and_lease_term(rentals):
+    rentals = copy.deepcopy(rentals)
+    rentals[0]['concessions'] = {'free_months': 1, 'lease_term': 12}
+    rentals[1]['concessions'] = {'free_months': 2, 'lease_term': 2}  # no paying months: not a concession
+    df = derived(rentals)
+
+    row = df.loc['4713964']
+    assert row['free_months'] == 1
+    assert row['lease_term'] == 12
+    assert row['net_rent'] == pytest.approx(round(2550 * 11 / 12, 2))
+    assert df.loc['4719764', 'net_rent'] == 2250
+
+def test_calc_dom(rentals):
+    df = derived(rentals)
+    assert df.loc['4713964', 'calc_dom'] == 57  # listed 2025-04-18
+    assert df.loc['4766148', 'calc_dom'] == 1   # listed 2025-06-13
+    # Listed after the run date counts as zero days, not negative
+    assert derived(rentals, '2025-06-01').loc['4766148', 'calc_dom'] == 0
+
+def test_is_vector(rentals):
+    rentals = copy.deepcopy(rentals)
+    rentals[0]['agents'] = [{'name': 'Outside Agent', 'email': 'agent@example.com'}]
+    rentals[1]['agents'] = [{'name': 'Outside Agent', 'email': 'agent@example.com'}, {'name': 'Agent 1', 'email': 'Agent1@VectorNY.com'}]
+    rentals[2]['agents'] = []
+    df = derived(rentals)
+
+    assert df.loc['4713964', 'is_vector'] == 0
+    assert df.loc['4719764', 'is_vector'] == 1
+    assert df.loc['4736338', 'is_vector'] == 0
+    assert (df.drop(['4713964', '4736338'])['is_vector'] == 1).all()
@@ -0,0 +1,27 @@
+import pytest
+
+from Services.Reports.data_processor import (
+    AMENITY_SEGMENTS, typed_streeteasy_frame, create_comp_data, preprocess_df, apply_segment, segment_label,
+    label_segments, process_segment_rent_history, segment_rent_history, process_streeteasy_rent_history,
+)
+from Services.Reports.synthetic import synthetic_streeteasy_listings
+
+
+@pytest.fixture(scope='module')
+def comp_data():
+    return preprocess_df(create_comp_data(typed_streeteasy_frame(synthetic_streeteasy_listings(5000, seed=1))))
+
+
+def test_unfiltered_segment_reuses_the_baseline(comp_data):
+    labelled = label_segments(comp_data)
+    filtered = [segment for segment in AMENITY_SEGMENTS if segment['require']]
+    # 'all' once, plus each filtering segment; the {'require': {}} segment is not stacked again
+    assert len(labelled) == len(comp_data) + sum(len(apply_segment(comp_data, segment)) for segment in filtered)
+    assert labelled.attrs['segment_aliases'] == {segment_label(AMENITY_SEGMENTS[0]): 'all'}
+
+def test_segment_histories_match_per_segment_computation(comp_data):
+    rent_history = process_segment_rent_history(label_segments(comp_data))
+    for segment in AMENITY_SEGMENTS:
+        expected = process_streeteasy_rent_history(apply_segment(comp_data, segment))
+        history = segment_rent_history(rent_history, segment_label(segment))
+        assert history.to_numpy() == pytest.approx(expected[history.columns].to_numpy(), nan_ok=True)
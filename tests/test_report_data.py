@@ -0,0 +1,31 @@
+from datetime import date, timedelta
+
+import pytest
+
+from Services.Reports import report_data
+
+
+@pytest.fixture
+def refreshes(monkeypatch):
+    calls = []
+    monkeypatch.setattr(report_data, 'refresh_in_background', lambda force_refresh=True: calls.append(force_refresh) or True)
+    return calls
+
+def serve(monkeypatch, as_of):
+    payload = {'version': 'run_date_20260101000000', 'as_of': as_of, 'computed_at': f'{as_of}T06:00:00', 'sections': {}}
+    monkeypatch.setattr(report_data, '_cached_payload', lambda: payload)
+    return report_data.get_report_data()
+
+
+def test_todays_payload_is_served_as_is(monkeypatch, refreshes):
+    result = serve(monkeypatch, date.today().isoformat())
+    assert result['status'] == 'success'
+    assert refreshes == []
+
+def test_earlier_days_payload_is_served_and_refreshed(monkeypatch, refreshes):
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    result = serve(monkeypatch, yesterday)
+    assert result['status'] == 'success'
+    assert result['as_of'] == yesterday
+    # Same scrape, so the comp frame and cube are reused; only the sections are recomputed
+    assert refreshes == [False]